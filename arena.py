@@ -0,0 +1,329 @@
+"""
+Self-play arena: AI players play many games against each other, to check that a change kept their strength.
+
+Players are given as specs: a name from PLAYERS and optional settings, e.g. "random", "minimax",
+"minimax:time=0.02,depth=6" or "mcts:playouts=5000". Each pair of games starts from the same random opening, a few random moves
+so that deterministic players don't play the same game every time, with the players swapping sides.
+The games are spread over a process pool, and each one is appended to a JSON lines file as soon as it
+ends, so a long run can be stopped and its results still reported. The report gives the wins, draws and
+losses of every pairing with a 95% Wilson interval of the score, the Elo difference it implies, the Elo
+of every player fitted to all the games, and the time the players took per move:
+    python arena.py play minimax random --games 1000 --output games.jsonl
+    python arena.py report games.jsonl
+
+To compare with an earlier version, play it against the same opponents at its own commit and report both
+files with --by-commit, which tells the players apart by the commit they were played at.
+"""
+import os
+import json
+import math
+import time
+import random
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+
+from benchmark import commit
+from board import Board
+from mcts_player import MctsPlayer, SearchTree
+from minimax_player import MiniMaxPlayer
+from opening_book import OpeningBook
+from random_player import RandomPlayer
+
+logging.basicConfig(level=os.environ.get("LOGLEVEL", "WARNING"))
+
+PLAYERS = {
+    "random": RandomPlayer,
+    "minimax": MiniMaxPlayer,
+    "mcts": MctsPlayer,
+}
+# The settings of a spec, with the names of the players' arguments
+SETTINGS = {"time": ("time_budget", float), "depth": ("max_depth", int), "playouts": ("playouts", int),
+            "batch": ("batch", int), "rollouts": ("rollouts", int)}
+# Random moves at the start of every game
+OPENING_MOVES = 2
+# A game can't be longer, every move sows at least one stone towards the big pits
+MAX_MOVES = 1000
+# The z of a 95% confidence interval
+Z_95 = 1.959964
+
+
+def parse_spec(spec: str) -> Tuple[type, dict]:
+    """
+    The class and the constructor arguments of the player spec, see the module's documentation.
+    """
+    name, _, settings = spec.partition(":")
+    if name not in PLAYERS:
+        raise ValueError(f"Unknown player {name}, use one of {', '.join(PLAYERS)}")
+    kwargs = {}
+    for setting in filter(None, settings.split(",")):
+        key, _, value = setting.partition("=")
+        if key not in SETTINGS:
+            raise ValueError(f"Unknown setting {key} of player {spec}, use one of {', '.join(SETTINGS)}")
+        argument, kind = SETTINGS[key]
+        kwargs[argument] = kind(value)
+    return PLAYERS[name], kwargs
+
+
+def create_player(spec: str, index: int, game_board: Board):
+    player_class, kwargs = parse_spec(spec)
+    if player_class is MiniMaxPlayer:
+        # The book would play the same first moves in every game
+        kwargs.setdefault("book", OpeningBook({}))
+    if player_class is MctsPlayer:
+        # Keeps its tree between its moves, like in a session
+        kwargs.setdefault("tree", SearchTree())
+    return player_class(index, game_board, **kwargs)
+
+
+def play_game(specs: Tuple[str, str], seed: int, opening_moves: int = OPENING_MOVES) -> dict:
+    """
+    Plays one game, in a worker process.
+    :param specs: The specs of player 0, who moves first, and player 1
+    :param seed: The seed of the opening moves and of the random players
+    :return: The game's record: final scores, moves and time spent moving of each player
+    """
+    random.seed(seed)
+    game_board = Board(nr_players=2)
+    players = [create_player(spec, index, game_board) for index, spec in enumerate(specs)]
+    moves = [0, 0]
+    seconds = [0.0, 0.0]
+    slowest = [0.0, 0.0]
+    turn = 0
+    for move_number in range(MAX_MOVES):
+        if game_board.game_over():
+            break
+        if move_number < opening_moves:
+            turn_passes = game_board.move(turn, random.choice(game_board.valid_pit_indexes(turn)))
+        else:
+            start = time.perf_counter()
+            turn_passes = players[turn].move()
+            elapsed = time.perf_counter() - start
+            moves[turn] += 1
+            seconds[turn] += elapsed
+            slowest[turn] = max(slowest[turn], elapsed)
+        if turn_passes:
+            turn = 1 - turn
+    else:
+        raise RuntimeError(f"Game {seed} of {specs} did not end in {MAX_MOVES} moves")
+    scores = [game_board.position.final_score(player) for player in range(2)]
+    return {
+        "players": list(specs),
+        "seed": seed,
+        "scores": scores,
+        "moves": moves,
+        "seconds": [round(value, 6) for value in seconds],
+        "slowest": [round(value, 6) for value in slowest],
+    }
+
+
+def play(first: str, second: str, games: int, output: str, workers: int = None, seed: int = 0,
+         opening_moves: int = OPENING_MOVES) -> int:
+    """
+    Plays the games between the players over a process pool, and appends them to the output file.
+    Game 2 * i and 2 * i + 1 have the same opening, with the players on swapped sides.
+    :return: The number of games played
+    """
+    parse_spec(first)
+    parse_spec(second)
+    version = commit()
+    played = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(output, "a") as output_file:
+        futures = [executor.submit(play_game, (first, second) if game % 2 == 0 else (second, first),
+                                   seed + game // 2, opening_moves)
+                   for game in range(games)]
+        for future in as_completed(futures):
+            record = future.result()
+            record["commit"] = version
+            output_file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            output_file.flush()
+            played += 1
+            if played % 100 == 0:
+                logging.info(f"Played {played} of {games} games")
+    return played
+
+
+def load(paths: List[str], by_commit: bool = False) -> List[dict]:
+    """
+    The games of the result files.
+    :param by_commit: Name the players after their spec and the commit they were played at
+    """
+    records = []
+    for path in paths:
+        with open(path) as results_file:
+            for line in results_file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if by_commit:
+                    record["players"] = [f"{spec}@{record.get('commit', 'unknown')}" for spec in record["players"]]
+                records.append(record)
+    return records
+
+
+def wilson_interval(score: float, games: int, z: float = Z_95) -> Tuple[float, float]:
+    """
+    The Wilson score interval of the share of points, with draws counted as half a win.
+    """
+    if games == 0:
+        return 0.0, 1.0
+    center = (score + z * z / (2 * games)) / (1 + z * z / games)
+    margin = z / (1 + z * z / games) * math.sqrt(score * (1 - score) / games + z * z / (4 * games * games))
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def elo_difference(score: float) -> float:
+    """
+    The Elo difference that gives the expected share of points, infinite for a score of 0 or 1.
+    """
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+def finite(value: float):
+    """
+    The value, or None if it is infinite, which JSON can't hold.
+    """
+    return value if math.isfinite(value) else None
+
+
+def format_elo(value, score: float) -> str:
+    if value is None:
+        return "+inf" if score >= 0.5 else "-inf"
+    return f"{value:+.0f}"
+
+
+def pairings(records: List[dict]) -> Dict[Tuple[str, str], dict]:
+    """
+    The wins, draws and losses of the first player of each pairing, in sorted order, against the second.
+    """
+    results = {}
+    for record in records:
+        players = record["players"]
+        pair = tuple(sorted(players))
+        result = results.setdefault(pair, {"wins": 0, "draws": 0, "losses": 0})
+        first = players.index(pair[0])
+        if pair[0] == pair[1] or record["scores"][first] == record["scores"][1 - first]:
+            result["draws"] += 1
+        elif record["scores"][first] > record["scores"][1 - first]:
+            result["wins"] += 1
+        else:
+            result["losses"] += 1
+    return results
+
+
+def fit_elo(results: Dict[Tuple[str, str], dict], anchor: str = None, iterations: int = 1000) -> Dict[str, float]:
+    """
+    The Elo of every player, fitted to all the games with the Bradley-Terry model. Every pairing
+    gets one extra draw, so that a player who won all its games still has a finite rating.
+    :param anchor: The player rated 0, by default the weakest one
+    """
+    players = sorted({player for pair in results for player in pair})
+    strength = {player: 1.0 for player in players}
+    points = {player: 0.0 for player in players}
+    for (first, second), result in results.items():
+        if first == second:
+            continue
+        points[first] += result["wins"] + (result["draws"] + 1) / 2
+        points[second] += result["losses"] + (result["draws"] + 1) / 2
+    for _ in range(iterations):
+        updated = {}
+        for player in players:
+            denominator = 0.0
+            for (first, second), result in results.items():
+                if first == second or player not in (first, second):
+                    continue
+                games = result["wins"] + result["draws"] + result["losses"] + 1
+                denominator += games / (strength[first] + strength[second])
+            updated[player] = points[player] / denominator if denominator else strength[player]
+        strength = updated
+    ratings = {player: 400 * math.log10(strength[player]) for player in players}
+    reference = ratings[anchor] if anchor in ratings else min(ratings.values(), default=0.0)
+    return {player: rating - reference for player, rating in ratings.items()}
+
+
+def move_times(records: List[dict]) -> Dict[str, dict]:
+    """
+    The mean and slowest time per move of every player, in seconds.
+    """
+    times = {}
+    for record in records:
+        for side, player in enumerate(record["players"]):
+            entry = times.setdefault(player, {"moves": 0, "seconds": 0.0, "slowest": 0.0})
+            entry["moves"] += record["moves"][side]
+            entry["seconds"] += record["seconds"][side]
+            entry["slowest"] = max(entry["slowest"], record["slowest"][side])
+    return {player: {"moves": entry["moves"],
+                     "mean": entry["seconds"] / entry["moves"] if entry["moves"] else 0.0,
+                     "slowest": entry["slowest"]}
+            for player, entry in times.items()}
+
+
+def report(records: List[dict], anchor: str = None) -> dict:
+    results = pairings(records)
+    for result in results.values():
+        games = result["wins"] + result["draws"] + result["losses"]
+        score = (result["wins"] + result["draws"] / 2) / games
+        low, high = wilson_interval(score, games)
+        result.update(games=games, score=score, score_interval=[low, high], elo=finite(elo_difference(score)),
+                      elo_interval=[finite(elo_difference(low)), finite(elo_difference(high))])
+    return {
+        "games": len(records),
+        "pairings": [{"players": list(pair), **result} for pair, result in sorted(results.items())],
+        "elo": fit_elo(results, anchor),
+        "move_times": move_times(records),
+    }
+
+
+def print_report(summary: dict):
+    print(f"{summary['games']} games")
+    for pairing in summary["pairings"]:
+        first, second = pairing["players"]
+        low, high = pairing["score_interval"]
+        elo_low, elo_high = pairing["elo_interval"]
+        print(f"{first} vs {second}: +{pairing['wins']} ={pairing['draws']} -{pairing['losses']}, "
+              f"score {pairing['score']:.3f} [{low:.3f}, {high:.3f}], "
+              f"Elo {format_elo(pairing['elo'], pairing['score'])} "
+              f"[{format_elo(elo_low, low)}, {format_elo(elo_high, high)}]")
+    print("Elo:")
+    for player, rating in sorted(summary["elo"].items(), key=lambda item: -item[1]):
+        times = summary["move_times"].get(player, {"mean": 0.0, "slowest": 0.0})
+        print(f"  {player:<40} {rating:+7.0f}   {times['mean'] * 1000:7.2f} ms/move, "
+              f"slowest {times['slowest'] * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play the Mancala AI players against each other")
+    commands = parser.add_subparsers(dest="command", required=True)
+    play_parser = commands.add_parser("play", help="Play games and append them to the results file")
+    play_parser.add_argument("first", help="Spec of a player, e.g. minimax:time=0.05,depth=8")
+    play_parser.add_argument("second", help="Spec of the other player")
+    play_parser.add_argument("--games", type=int, default=100, help="Number of games, half with each player first")
+    play_parser.add_argument("--workers", type=int, help="Processes playing the games, one per core by default")
+    play_parser.add_argument("--seed", type=int, default=0, help="Seed of the openings")
+    play_parser.add_argument("--opening-moves", type=int, default=OPENING_MOVES,
+                             help="Random moves at the start of each game")
+    play_parser.add_argument("--output", default="arena.jsonl", help="Results file, games are appended to it")
+    report_parser = commands.add_parser("report", help="Report the games of results files")
+    report_parser.add_argument("results", nargs="+", help="Results files")
+    report_parser.add_argument("--anchor", help="Player whose Elo is 0, the weakest one by default")
+    report_parser.add_argument("--by-commit", action="store_true", help="Tell players apart by commit")
+    report_parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+    if args.command == "play":
+        play(args.first, args.second, args.games, args.output, args.workers, args.seed, args.opening_moves)
+        print_report(report(load([args.output])))
+    else:
+        summary = report(load(args.results, args.by_commit), args.anchor)
+        if args.json:
+            print(json.dumps(summary, indent=2))
+        else:
+            print_report(summary)
+
+
+if __name__ == "__main__":
+    main()
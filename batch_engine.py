@@ -0,0 +1,190 @@
+"""
+Batch engine: many positions held in one NumPy array, each playing a move in the same vectorized step.
+
+The positions are the rows of a (K, 14) array of cells laid out like the engine's Position, with the player
+to move of each row. A step sows every row at once: where the stones of each move go is looked up in
+tables built from the engine's sowing(), so the moves are the same as Board.move_from's, and the extra
+turns, the captures and the end of the games are array masks. Rows whose game is over stay as they are,
+which lets random playouts of all the rows run until the last game ends. This is meant for the AIs and
+tools that need very many playouts, the game itself is still played with Board.
+"""
+import os
+import logging
+from typing import Optional
+
+import numpy as np
+
+from engine import Position, sowing, NR_CELLS, NR_PLAYERS, NUMBER_OF_PITS, PIT_OFFSET, BIG_PIT, TOTAL_STONES
+
+logging.basicConfig(level=os.environ.get("LOGLEVEL", "WARNING"))
+
+CELL_TYPE = np.int16
+
+
+def sowing_tables():
+    """
+    The engine's sowing() of every move as arrays: the stones each cell gets from the move, the cell
+    of its last stone, -1 for an empty pit, and the change in the stones of each player's pits.
+    All are indexed by player, pit and stones in the pit.
+    """
+    added = np.zeros((NR_PLAYERS, NUMBER_OF_PITS, TOTAL_STONES + 1, NR_CELLS), dtype=CELL_TYPE)
+    last = np.full((NR_PLAYERS, NUMBER_OF_PITS, TOTAL_STONES + 1), -1, dtype=np.int64)
+    side_deltas = np.zeros((NR_PLAYERS, NUMBER_OF_PITS, TOTAL_STONES + 1, NR_PLAYERS), dtype=CELL_TYPE)
+    for player in range(NR_PLAYERS):
+        for pit in range(NUMBER_OF_PITS):
+            for stones in range(1, TOTAL_STONES + 1):
+                drops, last[player, pit, stones], side_deltas[player, pit, stones] = sowing(player, pit, stones)
+                for cell, count in drops:
+                    added[player, pit, stones, cell] = count
+    return added, last, side_deltas
+
+
+ADDED, LAST, SIDE_DELTAS = sowing_tables()
+# The same tables with one row per move, which a single index array looks up much faster
+_MOVE_ADDED = ADDED.reshape(-1, NR_CELLS)
+_MOVE_LAST = LAST.reshape(-1)
+_MOVE_SIDE_DELTAS = SIDE_DELTAS.reshape(-1, NR_PLAYERS)
+
+_OFFSETS = np.array(PIT_OFFSET)
+_BIG_PITS = np.array(BIG_PIT)
+_PITS = [slice(PIT_OFFSET[player], PIT_OFFSET[player] + NUMBER_OF_PITS) for player in range(NR_PLAYERS)]
+
+
+class BatchPositions:
+    """
+    K positions, with the player to move in each. Like Position, the stones left in each player's pits
+    are kept up to date on every move, which makes the game over check cheap.
+    """
+
+    def __init__(self, cells: np.ndarray, players: np.ndarray):
+        """
+        :param cells: The (K, 14) stones, copied
+        :param players: The (K,) players to move, copied
+        """
+        self.cells = np.array(cells, dtype=CELL_TYPE).reshape(-1, NR_CELLS)
+        self.players = np.array(players, dtype=np.int64).reshape(-1)
+        assert len(self.players) == len(self.cells), "Every position needs its player to move"
+        assert self.cells.sum(axis=1).max(initial=0) <= TOTAL_STONES, f"At most {TOTAL_STONES} stones per position"
+        self.side_stones = np.stack([self.cells[:, _PITS[player]].sum(axis=1, dtype=CELL_TYPE)
+                                     for player in range(NR_PLAYERS)], axis=1)
+        self._rows = np.arange(len(self.cells))
+
+    @classmethod
+    def repeat(cls, position: Position, player: int, count: int) -> "BatchPositions":
+        """
+        count copies of the position, with the player to move.
+        """
+        return cls(np.tile(position.cells, (count, 1)), np.full(count, player))
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def pits(self, players: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        The (K, 6) stones in the pits of the given players of each row, by default the players to move.
+        """
+        players = self.players if players is None else players
+        return np.where(players[:, None] == 0, self.cells[:, _PITS[0]], self.cells[:, _PITS[1]])
+
+    def valid_moves(self) -> np.ndarray:
+        """
+        The (K, 6) mask of the pits the player to move of each row can play.
+        """
+        return self.pits() > 0
+
+    def terminal(self) -> np.ndarray:
+        """
+        The (K,) mask of the rows whose game is over: one of the players has no stones left in their pits.
+        """
+        return (self.side_stones[:, 0] == 0) | (self.side_stones[:, 1] == 0)
+
+    def apply(self, pits: np.ndarray, active: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Plays a move in each active row, like Position.apply: sows the stones, captures and switches
+        the player to move unless the last stone landed in the mover's big pit.
+        :param pits: The (K,) pits to play, from the movers' pits. They must be valid in the active rows.
+        :param active: The (K,) mask of the rows that move, by default all the rows that are not over
+        :return: The (K,) mask of the rows that got an extra turn
+        """
+        active = ~self.terminal() if active is None else np.asarray(active, dtype=bool)
+        players = self.players
+        cells = self.cells
+        # Cells are addressed in the flat array, row * 14 + cell
+        flat = cells.reshape(-1)
+        row_start = self._rows * NR_CELLS
+        source = row_start + _OFFSETS[players] + pits
+        stones = np.where(active, flat[source], 0)
+        assert stones[active].all(), "Only pits with stones can be played"
+        flat[source] -= stones
+        move = (players * NUMBER_OF_PITS + pits) * (TOTAL_STONES + 1) + stones
+        cells += _MOVE_ADDED.take(move, axis=0)
+        last = _MOVE_LAST.take(move)
+        side_stones = self.side_stones
+        side_stones += _MOVE_SIDE_DELTAS.take(move, axis=0)
+        big_pit = _BIG_PITS[players]
+        extra_turn = active & (last == big_pit)
+        # The last stone alone in one of the mover's pits takes the stones of the opposite pit with it
+        landed = flat[row_start + np.maximum(last, 0)]
+        capture = active & (last >= _OFFSETS[players]) & (last < big_pit) & (landed == 1)
+        if capture.any():
+            capture_start = row_start[capture]
+            opposite = capture_start + NR_CELLS - 2 - last[capture]
+            capture_rows = self._rows[capture]
+            capturer = players[capture]
+            side_stones[capture_rows, capturer] -= 1
+            side_stones[capture_rows, 1 - capturer] -= flat[opposite]
+            flat[capture_start + big_pit[capture]] += flat[opposite] + 1
+            flat[opposite] = 0
+            flat[capture_start + last[capture]] = 0
+        self.players = np.where(active & ~extra_turn, 1 - players, players)
+        return extra_turn
+
+    def random_moves(self, rng: np.random.Generator) -> np.ndarray:
+        """
+        A random valid move of the player to move of each row, pit 0 in the rows with none.
+        """
+        # A valid move drawn as 0.0 must still beat the empty pits
+        weights = np.where(self.valid_moves(), rng.random((len(self), NUMBER_OF_PITS), dtype=np.float32), -1.0)
+        return weights.argmax(axis=1)
+
+    def playout(self, rng: np.random.Generator) -> np.ndarray:
+        """
+        Plays random moves in all the rows until every game is over. The rows whose game is over are
+        dropped from the steps once there are enough of them, so the long games don't make every row move.
+        :return: The (K, 2) final scores, see final_scores()
+        """
+        batch = self.select(self._rows)
+        # The row of this batch each row of the smaller one is
+        playing = self._rows
+        while len(batch):
+            active = ~batch.terminal()
+            ended = len(batch) - np.count_nonzero(active)
+            if ended and ended >= len(batch) // 8:
+                self.cells[playing[~active]] = batch.cells[~active]
+                self.players[playing[~active]] = batch.players[~active]
+                self.side_stones[playing[~active]] = batch.side_stones[~active]
+                playing = playing[active]
+                batch = batch.select(active)
+            else:
+                batch.apply(batch.random_moves(rng), active)
+        return self.final_scores()
+
+    def select(self, rows: np.ndarray) -> "BatchPositions":
+        """
+        A batch of copies of the rows, given as indexes or as a mask.
+        """
+        return BatchPositions(self.cells[rows], self.players[rows])
+
+    def final_scores(self) -> np.ndarray:
+        """
+        The (K, 2) stones each player ends with once the stones left in the pits are collected,
+        like Position.final_score.
+        """
+        return self.cells[:, list(BIG_PIT)] + self.side_stones
+
+
+def random_playouts(position: Position, player: int, count: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    The final scores of count random games from the position, with the player to move.
+    """
+    return BatchPositions.repeat(position, player, count).playout(rng)
@@ -0,0 +1,298 @@
+"""
+Benchmarks of the engine and of the AI's search, on a fixed set of positions.
+
+perft counts the positions reached from each benchmark position in a number of moves, once with the
+engine's apply and undo and once with Board.move_from, which also checks that both agree and, against
+a saved result, that the rules did not change. The search is timed to each depth with a fresh
+transposition table and no opening book, and its memory is measured with tracemalloc. Random games are
+played one at a time with the engine and all at once with the batch engine. Timings are the best of a
+few runs. The results are written as JSON, and compared with the results of another commit
+to flag the slowdowns:
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from batch_engine import random_playouts
+from board import Board
+from engine import Position
+from endgame import default_database
+from minimax_player import MiniMaxPlayer
+from opening_book import OpeningBook
+
+logging.basicConfig(level=os.environ.get("LOGLEVEL", "WARNING"))
+
+# Name, cells and player to move. Reached with seeded random moves, from the opening to the endgame.
+POSITIONS = [
+    ("start", Position().cells, 0),
+    ("opening", [0, 4, 9, 9, 8, 8, 2, 8, 6, 0, 7, 0, 9, 2], 0),
+    ("middlegame", [7, 0, 3, 6, 1, 1, 8, 0, 2, 4, 15, 15, 5, 5], 0),
+    ("late", [6, 3, 8, 16, 1, 0, 9, 5, 0, 4, 2, 1, 4, 13], 0),
+    ("endgame", [0, 5, 2, 4, 18, 0, 24, 2, 1, 0, 0, 1, 1, 14], 1),
+]
+PERFT_DEPTH = 7
+SEARCH_DEPTH = 10
+PLAYOUTS = 20000
+# The pure Python playouts are much slower, fewer of them give as good a timing
+PYTHON_PLAYOUTS = 500
+REPEAT = 3
+# Slowdowns beyond this share of the old result are regressions
+THRESHOLD = 0.1
+# Shorter timings, and the rates measured with them, are too noisy to compare
+MIN_COMPARED_SECONDS = 0.005
+# The timing each rate was measured with
+RATE_SECONDS = {"nodes_per_second": "seconds", "board_moves_per_second": "board_seconds",
+                "playouts_per_second": "seconds"}
+
+
+def perft(position: Position, player: int, depth: int) -> int:
+    """
+    The number of positions reached in depth moves. An extra turn is a move too, and a finished game
+    counts as a position whatever the depth left.
+    """
+    if depth == 0 or position.is_terminal():
+        return 1
+    nodes = 0
+    for pit in position.valid_moves(player):
+        next_player = player if position.apply(player, pit) else 1 - player
+        nodes += perft(position, next_player, depth - 1)
+        position.undo()
+    return nodes
+
+
+def perft_board(cells: List[int], player: int, depth: int, board: Board = None) -> int:
+    """
+    perft() through Board.move_from, which has no undo, so each move starts from a copy of the cells.
+    """
+    board = board if board is not None else Board(nr_players=2)
+    board.position.set_cells(cells)
+    if depth == 0 or board.position.is_terminal():
+        return 1
+    nodes = 0
+    for pit in board.position.valid_moves(player):
+        board.position.set_cells(cells)
+        # move_from is False after an extra turn, the pit is always valid here
+        next_player = 1 - player if board.move_from(player, pit) else player
+        nodes += perft_board(board.position.cells[:], next_player, depth - 1, board)
+    return nodes
+
+
+def best_time(function: Callable, repeat: int):
+    """
+    Runs the function repeat times.
+    :return: The shortest time, in seconds, and the function's last result
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def searcher(cells: List[int], player: int, depth: int) -> MiniMaxPlayer:
+    board = Board(nr_players=2)
+    board.position.set_cells(cells)
+    return MiniMaxPlayer(player, board, time_budget=3600, max_depth=depth, book=OpeningBook({}))
+
+
+def bench_perft(depth: int, repeat: int) -> Dict[str, dict]:
+    results = {}
+    for name, cells, player in POSITIONS:
+        seconds, nodes = best_time(lambda: perft(Position(cells), player, depth), repeat)
+        board_seconds, board_nodes = best_time(lambda: perft_board(cells, player, depth), repeat)
+        assert board_nodes == nodes, f"perft of {name} is {nodes} with the engine but {board_nodes} with the board"
+        results[name] = {
+            "depth": depth,
+            "nodes": nodes,
+            "seconds": seconds,
+            "nodes_per_second": nodes / seconds,
+            "board_seconds": board_seconds,
+            "board_moves_per_second": nodes / board_seconds,
+        }
+        logging.info(f"perft({name}, {depth}) = {nodes} in {seconds:.3f}s")
+    return results
+
+
+def bench_search(max_depth: int, repeat: int) -> Dict[str, dict]:
+    """
+    The time to search each position to each depth, iterative deepening included.
+    """
+    results = {}
+    for name, cells, player in POSITIONS:
+        results[name] = {}
+        for depth in range(1, max_depth + 1):
+            players = []
+
+            def search():
+                players.append(searcher(cells, player, depth))
+                return players[-1].best_move()
+            seconds, move = best_time(search, repeat)
+            nodes = players[-1].nodes
+            results[name][str(depth)] = {
+                "move": move,
+                "nodes": nodes,
+                "cutoffs": players[-1].cutoffs,
+                "seconds": seconds,
+                "nodes_per_second": nodes / seconds,
+            }
+            logging.info(f"Searched {name} to depth {depth} in {seconds:.3f}s, {nodes} nodes")
+    return results
+
+
+def bench_memory(depth: int) -> Dict[str, dict]:
+    """
+    The memory a search to the depth allocates: the most it holds at once and what it keeps,
+    mostly the transposition table. Measured apart, tracemalloc slows everything down.
+    """
+    results = {}
+    for name, cells, player in POSITIONS:
+        search_player = searcher(cells, player, depth)
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            search_player.best_move()
+            after, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        results[name] = {"depth": depth, "peak_bytes": peak - before, "retained_bytes": after - before}
+    return results
+
+
+def python_playouts(position: Position, player: int, count: int, rng: random.Random):
+    for _ in range(count):
+        playout = Position(position.cells)
+        mover = player
+        while not playout.is_terminal():
+            if not playout.apply(mover, rng.choice(playout.valid_moves(mover))):
+                mover = 1 - mover
+
+
+def bench_playouts(count: int, repeat: int) -> Dict[str, dict]:
+    """
+    Random games from the start, one at a time with the engine and all at once with the batch engine.
+    """
+    python_seconds, _ = best_time(lambda: python_playouts(Position(), 0, PYTHON_PLAYOUTS, random.Random(0)), repeat)
+    batch_seconds, _ = best_time(lambda: random_playouts(Position(), 0, count, np.random.default_rng(0)), repeat)
+    return {
+        "python": {"playouts": PYTHON_PLAYOUTS, "seconds": python_seconds,
+                   "playouts_per_second": PYTHON_PLAYOUTS / python_seconds},
+        "batch": {"playouts": count, "seconds": batch_seconds, "playouts_per_second": count / batch_seconds},
+    }
+
+
+def commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(perft_depth: int = PERFT_DEPTH, search_depth: int = SEARCH_DEPTH, repeat: int = REPEAT,
+        playouts: int = PLAYOUTS) -> dict:
+    return {
+        "meta": {
+            "commit": commit(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "endgame_database": default_database() is not None,
+        },
+        "perft": bench_perft(perft_depth, repeat),
+        "search": bench_search(search_depth, repeat),
+        "memory": bench_memory(search_depth),
+        "playouts": bench_playouts(playouts, repeat),
+    }
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    values = {}
+    for key, value in results.items():
+        if key == "meta":
+            continue
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{prefix}{key}/"))
+        else:
+            values[prefix + key] = value
+    return values
+
+
+def compare(old: dict, new: dict, threshold: float = THRESHOLD) -> List[str]:
+    """
+    The regressions of the new results: a different perft count, rates that dropped or times
+    and memory that grew by more than the threshold. Results of only one side are not compared.
+    """
+    old_values = flatten(old)
+    new_values = flatten(new)
+    regressions = []
+    for key in sorted(old_values.keys() & new_values.keys()):
+        old_value, new_value = old_values[key], new_values[key]
+        group, metric = key.rsplit("/", 1)
+        timing = f"{group}/{RATE_SECONDS.get(metric, metric)}"
+        if timing.endswith("seconds") and timing in old_values and timing in new_values and \
+                max(old_values[timing], new_values[timing]) < MIN_COMPARED_SECONDS:
+            continue
+        if key.startswith("perft/") and metric == "nodes":
+            if new_value != old_value:
+                regressions.append(f"{key}: {old_value} -> {new_value}, the rules changed")
+        elif metric in RATE_SECONDS:
+            if new_value < old_value * (1 - threshold):
+                regressions.append(f"{key}: {old_value:.0f} -> {new_value:.0f} ({new_value / old_value - 1:+.0%})")
+        elif metric.endswith("seconds") or metric.endswith("_bytes"):
+            if new_value > old_value * (1 + threshold):
+                regressions.append(f"{key}: {old_value:.4g} -> {new_value:.4g} ({new_value / old_value - 1:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Mancala engine and AI search")
+    parser.add_argument("--perft-depth", type=int, default=PERFT_DEPTH, help="Moves counted by perft")
+    parser.add_argument("--search-depth", type=int, default=SEARCH_DEPTH, help="Deepest search to time")
+    parser.add_argument("--playouts", type=int, default=PLAYOUTS, help="Random games played by the batch engine")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="Runs of each timing, the best one is kept")
+    parser.add_argument("--output", help="Where to write the results, as JSON")
+    parser.add_argument("--compare", help="Results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="Slowdown that counts as a regression")
+    args = parser.parse_args()
+    results = run(args.perft_depth, args.search_depth, args.repeat, args.playouts)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+    for name, result in results["perft"].items():
+        print(f"perft {name:<10} {result['nodes']:>10} nodes {result['nodes_per_second']:>10.0f} nodes/s "
+              f"{result['board_moves_per_second']:>10.0f} board moves/s")
+    for name, depths in results["search"].items():
+        deepest = depths[str(args.search_depth)]
+        print(f"search {name:<10} depth {args.search_depth} in {deepest['seconds']:.3f}s "
+              f"{deepest['nodes_per_second']:>10.0f} nodes/s "
+              f"{results['memory'][name]['peak_bytes'] / 1024:>8.0f} KiB peak")
+    for engine_name, result in results["playouts"].items():
+        print(f"playouts {engine_name:<8} {result['playouts_per_second']:>10.0f} random games/s")
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(baseline, results, args.threshold)
+        print(f"Compared with {baseline['meta']['commit']}: {len(regressions)} regressions")
+        for regression in regressions:
+            print(f"  {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
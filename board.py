@@ -1,32 +1,55 @@
 import os
 import logging
-import dataclasses
-from typing import List
+from typing import List, Optional, Tuple
 
-STARTING_STONES = 6
-NUMBER_OF_PITS = 6
-NO_WINNER = None
+from engine import Position, STARTING_STONES, NUMBER_OF_PITS
 
+NO_WINNER = None
+# Set MANCALA_VALIDATE=1 to check that no stones are lost or created whenever the winner is computed.
+VALIDATE_STONES = os.environ.get("MANCALA_VALIDATE", "0") == "1"
 
 logging.basicConfig(level=os.environ.get("LOGLEVEL", "WARNING"))
 
 
-@dataclasses.dataclass
 class PlayerData:
-    big_pit: int = 0
-    pits: List[int] = dataclasses.field(default_factory=lambda: [STARTING_STONES] * NUMBER_OF_PITS)
+    """
+    A view of one player's pits and big pit, backed by the board's position.
+    """
+    __slots__ = ("position", "player")
+
+    def __init__(self, position: Position, player: int):
+        self.position = position
+        self.player = player
+
+    @property
+    def big_pit(self) -> int:
+        return self.position.big_pit(self.player)
+
+    @big_pit.setter
+    def big_pit(self, stones: int):
+        self.position.set_big_pit(self.player, stones)
+
+    @property
+    def pits(self) -> List[int]:
+        return self.position.pits(self.player)
+
+    @pits.setter
+    def pits(self, pits: List[int]):
+        self.position.set_pits(self.player, pits)
 
 
 class Board:
     """
     The class that manages the board state. Keeps track of all the pits, big pits
-    and the stones.
+    and the stones. The stones themselves live in a compact engine Position, the
+    board only adapts it to the players' view of the game.
     """
     def __init__(self, nr_players: int):
         self.nr_players = nr_players
-        self.players_data = []
-        for i in range(self.nr_players):
-            self.players_data.append(PlayerData())
+        self.position = Position()
+        self.players_data = [PlayerData(self.position, i) for i in range(self.nr_players)]
+        # The player and pit of the last move made on the board
+        self.last_move: Optional[Tuple[int, int]] = None
 
     def move(self, player: int, selected_pit: int) -> bool:
         """
@@ -35,7 +58,7 @@ class Board:
         :param selected_pit: The pit from which the stones are moved
         :return: the return value of move_from
         """
-        logging.info(f"Player {player} selected pit {selected_pit}")
+        logging.info("Player %s selected pit %s", player, selected_pit)
         return self.move_from(player, selected_pit)
 
     def move_from(self, player: int, pit: int) -> bool:
@@ -48,44 +71,9 @@ class Board:
         """
         if not self.is_valid_pit(pit) or not self.has_available_stones(self.players_data[player], pit):
             return False
-        available_stones = self.players_data[player].pits[pit]
-        original_player = player
-        self.players_data[player].pits[pit] = 0
-        while available_stones > 0:
-            if pit < NUMBER_OF_PITS - 1:
-                pit += 1
-                available_stones = self.add_stone(player, pit, available_stones)
-                logging.debug(f"Adding stone to pit {pit}. Available stones: {available_stones}")
-                # Landed on own empty pit with last stone, steal the stones from the opposite player's pit
-                if self.players_data[player].pits[pit] == 1 and available_stones == 0 and player == original_player:
-                    self.steal_stones(player, pit)
-            if self.reached_end(pit, available_stones):
-                pit = -1
-                available_stones = self.landed_on_own_big_pit(player, available_stones, player == original_player)
-                if available_stones != 0:
-                    logging.debug(f"Player {player} continues in opponent's pits")
-                    player = self.switch_player(player)
-                else:
-                    # Landed on own big pit with the last stone. We can go again
-                    return False
-        return True
-
-    @staticmethod
-    def reached_end(pit: int, available_stones: int) -> bool:
-        """
-        Checks if the end of the pits has been reached.
-        """
-        return pit == NUMBER_OF_PITS - 1 and available_stones > 0
-
-    def landed_on_own_big_pit(self, player: int, available_stones: int, own_pit: bool) -> int:
-        """
-        Adds a stone to the player's big pit and returns the number of remaining stones.
-        """
-
-        if own_pit:
-            self.players_data[player].big_pit += 1
-            available_stones -= 1
-        return available_stones
+        self.last_move = (player, pit)
+        # Landed on own big pit with the last stone. We can go again
+        return not self.position.apply(player, pit)
 
     @staticmethod
     def switch_player(player: int) -> int:
@@ -100,62 +88,48 @@ class Board:
         """
         return self.players_data[1 - player]
 
-    def steal_stones(self, player: int, pit: int):
-        """
-        Steals the stones from the opposite player's pit.
-        """
-        logging.info(f"Stealing stones from pit {pit}")
-        stones_to_steal = self.opponent(player).pits[NUMBER_OF_PITS - 1 - pit]
-        self.opponent(player).pits[NUMBER_OF_PITS - 1 - pit] = 0
-        self.players_data[player].pits[pit] = 0
-        self.players_data[player].big_pit += stones_to_steal + 1
-
     def collect_all_stones(self, player: int):
         """
         Collects all remaining stones from the player's pits.
         """
-        for i in range(0, NUMBER_OF_PITS):
-            self.players_data[player].big_pit += self.players_data[player].pits[i]
-            self.players_data[player].pits[i] = 0
+        self.position.collect(player)
 
     @property
     def winner(self) -> int:
         """
-        Checks if the game is over and returns the winner.
+        Checks if the game is over and returns the winner, without changing the board.
+        The winner is the player that ends with the most stones once the remaining
+        stones are collected, see finalize().
         """
-        all_stones_on_board = 0
-        for player_index in range(self.nr_players):
-            all_stones_on_board += self.players_data[player_index].big_pit
-            for pit in self.players_data[player_index].pits:
-                all_stones_on_board += pit
-
-        assert all_stones_on_board == self.nr_players * NUMBER_OF_PITS * STARTING_STONES, \
-            f"There was a problem in the stone moves! {self.nr_players * NUMBER_OF_PITS * STARTING_STONES} " \
-            f"expected stones on the board," \
-            f" {all_stones_on_board} stones on board. Player1 pits: " \
-            f"{self.players_data[0].pits} Player2 pits: {self.players_data[1].pits} Player1 big pit: " \
-            f"{self.players_data[0].big_pit} Player2 big pit: {self.players_data[1].big_pit}"
+        if VALIDATE_STONES:
+            self.position.validate(self.nr_players * NUMBER_OF_PITS * STARTING_STONES)
+        if not self.position.is_terminal():
+            return NO_WINNER
+        return max(range(self.nr_players), key=self.position.final_score)
 
-        if self.any_player_finished():
+    def finalize(self) -> int:
+        """
+        Ends the game if it is over by collecting the remaining stones of every player
+        into their big pits.
+        :return: The winner, or NO_WINNER if the game is not over yet.
+        """
+        winner = self.winner
+        if winner != NO_WINNER:
             for player_index in range(self.nr_players):
                 self.collect_all_stones(player_index)
-            return max(range(self.nr_players), key=lambda i: self.players_data[i].big_pit)
-        return NO_WINNER
+        return winner
 
     def game_over(self) -> bool:
         """
         Checks if the game is over.
         """
-        return self.winner != NO_WINNER
+        return self.position.is_terminal()
 
     def any_player_finished(self):
         """
         Checks if any player has finished the game.
         """
-        for player_index in range(self.nr_players):
-            if all(stones == 0 for stones in self.players_data[player_index].pits):
-                return True
-        return False
+        return self.position.is_terminal()
 
     def evaluate(self, player_index: int):
         """
@@ -165,16 +139,13 @@ class Board:
         :param player_index: the index of the player for which we evaluate the board
         """
         # simple algorithm, who has more points in the end
-        logging.debug(f"Evaluate time, player has {self.players_data[player_index].big_pit} stones in big pit "
-                      f"{self.players_data[player_index].pits} and opponent has "
-                      f"{self.players_data[1- player_index].big_pit} stones in big pit "
-                      f"{self.players_data[1 - player_index].big_pit}")
-        return self.players_data[player_index].big_pit - self.players_data[1 - player_index].big_pit
+        return self.position.big_pit(player_index) - self.position.big_pit(1 - player_index)
 
     def reset(self):
         """
         Resets the board to the initial state.
         """
+        self.last_move = None
         for player in self.players_data:
             player.big_pit = 0
             player.pits = [STARTING_STONES] * NUMBER_OF_PITS
@@ -184,7 +155,7 @@ class Board:
         Returns a list of valid pit indexes for the given player.
         :param player: The player for which the list of valid pit indexes is returned.
         """
-        return [i for i, stones in enumerate(self.players_data[player].pits) if stones > 0]
+        return self.position.valid_moves(player)
 
     @staticmethod
     def is_valid_pit(pit: int) -> bool:
@@ -205,17 +176,6 @@ class Board:
         """
         return player_data.pits[pit] != 0
 
-    def add_stone(self, player: int, pit: int, available_stones: int) -> int:
-        """
-        Adds a stone to the given pit.
-        :param player: The player that is making the move.
-        :param pit: The pit to which the stone is added.
-        :param available_stones: The number of available stones.
-        """
-        self.players_data[player].pits[pit] += 1
-        available_stones -= 1
-        return available_stones
-
     def __str__(self) -> str:
         str_rep = ""
         for index, player in enumerate(self.players_data):
@@ -0,0 +1,204 @@
+"""
+Endgame database: the perfect play value of every position with only a few stones left in the pits.
+
+How many more stones the player to move can win from a position only depends on the stones
+in the pits, not on the big pits. So the database keeps, for every way of spreading up to
+max_stones stones over the 12 pits, the difference between the stones the player to move and
+their opponent will still get with perfect play, as one signed byte. The positions are laid out
+by their rank in the combinatorial number system, so a lookup is a direct index in the file,
+which is memory mapped.
+
+Build it offline with:
+    python endgame.py --stones 10 --output endgame.db
+"""
+import os
+import sys
+import mmap
+import logging
+import argparse
+from functools import lru_cache
+from math import comb
+from pathlib import Path
+from typing import List, Optional
+
+from engine import Position, NUMBER_OF_PITS, BIG_PIT
+
+logging.basicConfig(level=os.environ.get("LOGLEVEL", "WARNING"))
+
+MAGIC = b"MNCLEGDB"
+VERSION = 1
+HEADER_SIZE = len(MAGIC) + 2
+ALL_PITS = 2 * NUMBER_OF_PITS
+DEFAULT_PATH = os.environ.get("ENDGAME_DB_PATH", str(Path(__file__).parent / "endgame.db"))
+UNKNOWN = -128
+
+
+def positions_up_to(stones: int) -> int:
+    """
+    The number of ways to spread up to the given number of stones over all the pits.
+    """
+    return comb(stones + ALL_PITS, ALL_PITS)
+
+
+def rank(pits: List[int]) -> int:
+    """
+    Index of the pit vector among all the pit vectors with at most as many stones.
+    Vectors are ordered by their number of stones first, then by their pits.
+    """
+    remaining = sum(pits)
+    index = positions_up_to(remaining - 1) if remaining else 0
+    parts = len(pits)
+    for stones in pits[:-1]:
+        # Vectors with fewer stones in this pit come first
+        index += comb(remaining + parts - 1, parts - 1) - comb(remaining - stones + parts - 1, parts - 1)
+        remaining -= stones
+        parts -= 1
+    return index
+
+
+def unrank(index: int) -> List[int]:
+    """
+    The pit vector at the given index, the inverse of rank().
+    """
+    remaining = 0
+    while positions_up_to(remaining) <= index:
+        remaining += 1
+    index -= positions_up_to(remaining - 1) if remaining else 0
+    pits = []
+    for parts in range(ALL_PITS, 1, -1):
+        stones = 0
+        while True:
+            # Vectors that have exactly this many stones in the pit
+            block = comb(remaining - stones + parts - 2, parts - 2)
+            if index < block:
+                break
+            index -= block
+            stones += 1
+        pits.append(stones)
+        remaining -= stones
+    pits.append(remaining)
+    return pits
+
+
+def pit_vectors(stones: int, parts: int = ALL_PITS):
+    """
+    Every way to put exactly the given number of stones in the pits, in rank() order.
+    """
+    if parts == 1:
+        yield [stones]
+        return
+    for first in range(stones + 1):
+        for rest in pit_vectors(stones - first, parts - 1):
+            yield [first] + rest
+
+
+def mover_pits(position: Position, player: int) -> List[int]:
+    """
+    The pits of the position seen from the player to move: their pits first, then the opponent's.
+    """
+    return position.pits(player) + position.pits(1 - player)
+
+
+class EndgameDatabase:
+    """
+    Read only access to a built endgame database file.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as db_file:
+            self._map = mmap.mmap(db_file.fileno(), 0, access=mmap.ACCESS_READ)
+        assert self._map[:len(MAGIC)] == MAGIC, f"{path} is not an endgame database"
+        assert self._map[len(MAGIC)] == VERSION, f"{path} has an unsupported version {self._map[len(MAGIC)]}"
+        self.max_stones = self._map[len(MAGIC) + 1]
+        self.values = memoryview(self._map)[HEADER_SIZE:].cast("b")
+        assert len(self.values) == positions_up_to(self.max_stones), f"{path} is truncated"
+
+    def covers(self, position: Position) -> bool:
+        return position.side_stones[0] + position.side_stones[1] <= self.max_stones
+
+    def value(self, position: Position, player: int) -> int:
+        """
+        How many more stones the player to move gets than their opponent from now on,
+        with perfect play from both sides. The position must be covered by the database.
+        """
+        return self.values[rank(mover_pits(position, player))]
+
+    def score(self, position: Position, player: int, current_player: int) -> int:
+        """
+        The final difference in stones between the player and their opponent, with perfect play.
+        """
+        value = self.value(position, current_player)
+        if player != current_player:
+            value = -value
+        return position.big_pit(player) - position.big_pit(1 - player) + value
+
+
+@lru_cache(maxsize=None)
+def default_database() -> Optional[EndgameDatabase]:
+    """
+    The database at ENDGAME_DB_PATH, or None if it was not built.
+    """
+    if not os.path.exists(DEFAULT_PATH):
+        logging.info(f"No endgame database at {DEFAULT_PATH}")
+        return None
+    return EndgameDatabase(DEFAULT_PATH)
+
+
+def build(max_stones: int) -> bytearray:
+    """
+    Solves every position with up to max_stones stones in the pits.
+    Moves never add stones to the pits, and a move that keeps all the stones in the pits
+    brings them closer to the mover's big pit, so positions are solved from the fewest
+    stones up, and positions with the same number of stones depth first.
+    """
+    assert max_stones < 128, "Values must fit in a signed byte"
+    values = [UNKNOWN] * positions_up_to(max_stones)
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20 * max_stones * ALL_PITS))
+
+    def solve(pits: List[int]) -> int:
+        index = rank(pits)
+        if values[index] != UNKNOWN:
+            return values[index]
+        own, other = sum(pits[:NUMBER_OF_PITS]), sum(pits[NUMBER_OF_PITS:])
+        if not own or not other:
+            # Game over, everyone collects the stones left in their pits
+            values[index] = own - other
+            return values[index]
+        position = Position(pits[:NUMBER_OF_PITS] + [0] + pits[NUMBER_OF_PITS:] + [0])
+        best = -ALL_PITS * max_stones
+        for pit in position.valid_moves(0):
+            extra_turn = position.apply(0, pit)
+            gained = position.cells[BIG_PIT[0]]
+            if extra_turn:
+                value = gained + solve(mover_pits(position, 0))
+            else:
+                value = gained - solve(mover_pits(position, 1))
+            position.undo()
+            best = max(best, value)
+        values[index] = best
+        return best
+
+    for stones in range(max_stones + 1):
+        for pits in pit_vectors(stones):
+            solve(pits)
+        logging.info(f"Solved the positions with {stones} stones")
+    return bytearray(value & 0xFF for value in values)
+
+
+def write(path: str, max_stones: int, values: bytearray):
+    with open(path, "wb") as db_file:
+        db_file.write(MAGIC + bytes([VERSION, max_stones]))
+        db_file.write(values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Mancala endgame database")
+    parser.add_argument("--stones", type=int, default=10, help="Maximum number of stones left in the pits")
+    parser.add_argument("--output", default=DEFAULT_PATH, help="Where to write the database")
+    args = parser.parse_args()
+    write(args.output, args.stones, build(args.stones))
+    print(f"Wrote {positions_up_to(args.stones)} positions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
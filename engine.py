@@ -0,0 +1,248 @@
+import random
+from typing import List, Optional
+
+STARTING_STONES = 6
+NUMBER_OF_PITS = 6
+NR_PLAYERS = 2
+
+# The board is a flat ring of 14 cells, counter-clockwise from player 0's first pit:
+# cells 0-5 are player 0's pits, 6 is player 0's big pit,
+# cells 7-12 are player 1's pits and 13 is player 1's big pit.
+NR_CELLS = NR_PLAYERS * (NUMBER_OF_PITS + 1)
+PIT_OFFSET = (0, NUMBER_OF_PITS + 1)
+BIG_PIT = (NUMBER_OF_PITS, NR_CELLS - 1)
+TOTAL_STONES = NR_PLAYERS * NUMBER_OF_PITS * STARTING_STONES
+
+# Zobrist keys: one random number per cell and stone count, the hash of a position is the xor
+# of the keys of all its cells. The generator is seeded so hashes are the same in every process.
+ZOBRIST_STONES = 256
+ZOBRIST_MASK = ZOBRIST_STONES - 1
+_zobrist_random = random.Random(0x6d616e63616c61)
+ZOBRIST = [[_zobrist_random.getrandbits(64) for _ in range(ZOBRIST_STONES)] for _ in range(NR_CELLS)]
+SIDE_TO_MOVE = [_zobrist_random.getrandbits(64) for _ in range(NR_PLAYERS)]
+
+
+class Position:
+    """
+    Compact board representation used by the game engine and the AI search.
+    All the stones are kept in one flat list of cells, moves are applied in place
+    and can be taken back with undo(), so searching needs no copies of the board.
+    The number of stones left in each player's pits and the Zobrist hash of the
+    cells are kept up to date on every move, which makes the game over check O(1)
+    and lets the search look positions up in a transposition table.
+    """
+    __slots__ = ("cells", "side_stones", "hash", "_history")
+
+    def __init__(self, cells: Optional[List[int]] = None):
+        if cells is None:
+            cells = ([STARTING_STONES] * NUMBER_OF_PITS + [0]) * NR_PLAYERS
+        self.set_cells(cells)
+
+    def set_cells(self, cells: List[int]):
+        """
+        Replaces all the stones of the position, forgetting the moves that can be undone.
+        """
+        assert len(cells) == NR_CELLS, f"A position needs {NR_CELLS} cells, got {len(cells)}"
+        self.cells = list(cells)
+        self.side_stones = [sum(self.pits(player)) for player in range(NR_PLAYERS)]
+        self.hash = self._full_hash()
+        self._history = []
+
+    def _full_hash(self) -> int:
+        zobrist_hash = 0
+        for cell, stones in enumerate(self.cells):
+            zobrist_hash ^= ZOBRIST[cell][stones & ZOBRIST_MASK]
+        return zobrist_hash
+
+    def key(self, player: int) -> int:
+        """
+        Hash of the position with the given player to move.
+        """
+        return self.hash ^ SIDE_TO_MOVE[player]
+
+    def pits(self, player: int) -> List[int]:
+        """
+        Returns a copy of the given player's pits.
+        """
+        offset = PIT_OFFSET[player]
+        return self.cells[offset:offset + NUMBER_OF_PITS]
+
+    def set_pits(self, player: int, pits: List[int]):
+        """
+        Overwrites the given player's pits.
+        """
+        assert len(pits) == NUMBER_OF_PITS, f"A player needs {NUMBER_OF_PITS} pits, got {len(pits)}"
+        offset = PIT_OFFSET[player]
+        self.cells[offset:offset + NUMBER_OF_PITS] = pits
+        self.side_stones[player] = sum(pits)
+        self.hash = self._full_hash()
+
+    def big_pit(self, player: int) -> int:
+        return self.cells[BIG_PIT[player]]
+
+    def set_big_pit(self, player: int, stones: int):
+        cell = BIG_PIT[player]
+        self.hash ^= ZOBRIST[cell][self.cells[cell] & ZOBRIST_MASK] ^ ZOBRIST[cell][stones & ZOBRIST_MASK]
+        self.cells[cell] = stones
+
+    def valid_moves(self, player: int) -> List[int]:
+        """
+        Returns the indexes of the player's pits that have stones in them.
+        """
+        offset = PIT_OFFSET[player]
+        cells = self.cells
+        return [pit for pit in range(NUMBER_OF_PITS) if cells[offset + pit]]
+
+    def ordered_moves(self, player: int) -> List[int]:
+        """
+        Returns the valid moves of the player, the ones that give an extra turn first.
+        Searching those first gives alpha-beta its cut-offs sooner.
+        """
+        offset = PIT_OFFSET[player]
+        cells = self.cells
+        extra_turns = []
+        others = []
+        for pit in range(NUMBER_OF_PITS):
+            stones = cells[offset + pit]
+            if stones:
+                if stones % (NR_CELLS - 1) == NUMBER_OF_PITS - pit:
+                    extra_turns.append(pit)
+                else:
+                    others.append(pit)
+        return extra_turns + others
+
+    def apply(self, player: int, pit: int) -> bool:
+        """
+        Sows the stones from the given pit of the player, in place.
+        The move must be valid, see valid_moves(). Where the stones go is looked up
+        in the precomputed sowing table instead of dropping them one by one.
+        :param player: The player that is making the move
+        :param pit: The pit from which the stones are moved
+        :return: True if the last stone landed in the player's big pit and the player goes again.
+        """
+        cells = self.cells
+        side_stones = self.side_stones
+        zobrist_hash = self.hash
+        self._history.append((cells[:], side_stones[:], zobrist_hash))
+        cell = PIT_OFFSET[player] + pit
+        stones = cells[cell]
+        table = SOWING[player][pit]
+        drops, last, side_deltas = table[stones] if stones < len(table) else sowing(player, pit, stones)
+        zobrist_hash ^= ZOBRIST[cell][stones & ZOBRIST_MASK] ^ ZOBRIST[cell][0]
+        cells[cell] = 0
+        for cell, added in drops:
+            keys = ZOBRIST[cell]
+            zobrist_hash ^= keys[cells[cell] & ZOBRIST_MASK] ^ keys[(cells[cell] + added) & ZOBRIST_MASK]
+            cells[cell] += added
+        side_stones[0] += side_deltas[0]
+        side_stones[1] += side_deltas[1]
+        own_big_pit = BIG_PIT[player]
+        if last == own_big_pit:
+            self.hash = zobrist_hash
+            return True
+        # Landed on own empty pit with last stone, steal the stones from the opposite player's pit
+        if cells[last] == 1 and PIT_OFFSET[player] <= last < own_big_pit:
+            opposite = NR_CELLS - 2 - last
+            stolen = cells[opposite]
+            side_stones[player] -= 1
+            side_stones[1 - player] -= stolen
+            keys = ZOBRIST[own_big_pit]
+            zobrist_hash ^= ZOBRIST[last][1] ^ ZOBRIST[last][0] ^ \
+                ZOBRIST[opposite][stolen & ZOBRIST_MASK] ^ ZOBRIST[opposite][0] ^ \
+                keys[cells[own_big_pit] & ZOBRIST_MASK] ^ keys[(cells[own_big_pit] + stolen + 1) & ZOBRIST_MASK]
+            cells[own_big_pit] += stolen + 1
+            cells[opposite] = 0
+            cells[last] = 0
+        self.hash = zobrist_hash
+        return False
+
+    def undo(self):
+        """
+        Takes back the last applied move.
+        """
+        self.cells[:], self.side_stones[:], self.hash = self._history.pop()
+
+    def is_terminal(self) -> bool:
+        """
+        Checks if one of the players has no stones left in their pits.
+        """
+        return not self.side_stones[0] or not self.side_stones[1]
+
+    def final_score(self, player: int) -> int:
+        """
+        The stones the player ends with once all remaining stones are collected.
+        """
+        return self.cells[BIG_PIT[player]] + self.side_stones[player]
+
+    def collect(self, player: int):
+        """
+        Moves all the stones left in the player's pits to their big pit.
+        """
+        self.set_big_pit(player, self.final_score(player))
+        self.set_pits(player, [0] * NUMBER_OF_PITS)
+
+    def validate(self, expected_stones: int = TOTAL_STONES):
+        """
+        Checks that no stones were created or lost by the moves.
+        Only meant for debugging, it walks the whole board.
+        """
+        assert sum(self.cells) == expected_stones, \
+            f"There was a problem in the stone moves! {expected_stones} expected stones on the board, " \
+            f"{sum(self.cells)} stones on board: {self.cells}"
+        assert self.side_stones == [sum(self.pits(player)) for player in range(NR_PLAYERS)], \
+            f"Stone counts {self.side_stones} are out of sync with the pits: {self.cells}"
+
+    def evaluate(self, player: int) -> int:
+        """
+        Evaluates the position for the given player: the difference between the big pits,
+        or the difference between the final scores if the game is over.
+        """
+        if self.is_terminal():
+            return self.final_score(player) - self.final_score(1 - player)
+        return self.cells[BIG_PIT[player]] - self.cells[BIG_PIT[1 - player]]
+
+    def copy(self) -> "Position":
+        return Position(self.cells)
+
+    def __getstate__(self):
+        return self.cells
+
+    def __setstate__(self, cells):
+        self.set_cells(cells)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Position) and self.cells == other.cells
+
+    def __repr__(self) -> str:
+        return f"Position({self.cells})"
+
+
+def sowing(player: int, pit: int, stones: int) -> tuple:
+    """
+    Works out where the stones sown from the player's pit end up, skipping the opponent's big pit.
+    Every full lap around the board drops one stone in each of the 13 cells, the rest
+    go one by one to the cells that follow the pit.
+    :return: The (cell, stones added) pairs, the cell of the last stone and the change
+    in the number of stones in each player's pits, counting the stones taken from the pit.
+    """
+    start = PIT_OFFSET[player] + pit
+    ring = [(start + step) % NR_CELLS for step in range(1, NR_CELLS + 1)]
+    ring.remove(BIG_PIT[1 - player])
+    laps, remainder = divmod(stones, len(ring))
+    added = {cell: laps for cell in ring} if laps else {}
+    for cell in ring[:remainder]:
+        added[cell] = added.get(cell, 0) + 1
+    last = ring[(stones - 1) % len(ring)]
+    side_deltas = [0] * NR_PLAYERS
+    side_deltas[player] -= stones
+    for cell, count in added.items():
+        for side in range(NR_PLAYERS):
+            if PIT_OFFSET[side] <= cell < BIG_PIT[side]:
+                side_deltas[side] += count
+    return tuple(added.items()), last, tuple(side_deltas)
+
+
+# SOWING[player][pit][stones] is the precomputed sowing() of every move of a real game
+SOWING = [[[sowing(player, pit, stones) if stones else None for stones in range(TOTAL_STONES + 1)]
+           for pit in range(NUMBER_OF_PITS)]
+          for player in range(NR_PLAYERS)]
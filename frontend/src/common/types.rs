@@ -49,6 +49,8 @@ pub enum Difficulty {
     Easy = 0,
     #[serde(rename = "1")]
     Hard = 1,
+    #[serde(rename = "2")]
+    Medium = 2,
 }
 
 impl From<Difficulty> for u32 {
@@ -56,6 +58,7 @@ impl From<Difficulty> for u32 {
         match difficulty {
             Difficulty::Easy => 0,
             Difficulty::Hard => 1,
+            Difficulty::Medium => 2,
         }
     }
 }
@@ -75,3 +78,34 @@ pub struct GameData {
     pub winner: Option<PlayerType>,
     pub players: HashMap<u32, Player>
 }
+
+#[derive(Serialize, Deserialize, Debug, Clone, PartialEq)]
+pub struct Move {
+    pub player: PlayerType,
+    pub pit: u32,
+    pub players: HashMap<u32, Player>,
+}
+
+#[derive(Serialize, Deserialize, Debug, Clone, PartialEq)]
+#[serde(rename_all = "snake_case")]
+pub struct TurnData {
+    pub session_id: Uuid,
+    pub difficulty: Difficulty,
+    pub turn: PlayerType,
+    pub winner: Option<PlayerType>,
+    pub players: HashMap<u32, Player>,
+    pub moves: Vec<Move>,
+}
+
+impl TurnData {
+    /// The game's state after the turn.
+    pub fn game_data(&self) -> GameData {
+        GameData {
+            session_id: self.session_id,
+            difficulty: self.difficulty.clone(),
+            turn: self.turn.clone(),
+            winner: self.winner.clone(),
+            players: self.players.clone(),
+        }
+    }
+}
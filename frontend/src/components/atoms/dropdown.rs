@@ -122,6 +122,7 @@ pub fn dropdown(_props: &Props) -> Html {
             let diff_str = diff_str.clone();
             let current_difficulty = match diff_str.as_str() {
                 "Easy" => Difficulty::Easy as u8,
+                "Medium" => Difficulty::Medium as u8,
                 "Hard" => Difficulty::Hard as u8,
                 _ => return,
             };
@@ -165,6 +166,7 @@ pub fn dropdown(_props: &Props) -> Html {
             let new_diff_str = match game_data.difficulty {
                 Difficulty::Hard => "Hard".to_owned(),
                 Difficulty::Easy => "Easy".to_owned(),
+                Difficulty::Medium => "Medium".to_owned(),
             };
             if *diff_str_clone != new_diff_str {
                 diff_str_clone.set(new_diff_str);
@@ -179,6 +181,7 @@ pub fn dropdown(_props: &Props) -> Html {
                 <button class="dropdown-button" onclick={toggle_dropdown}>{&*diff_str}<span class="arrow down"></span></button>
                 <ul class="dropdown-menu" style={dropdown_style}>
                     <MenuElement text={"Easy"} on_click={change_difficulty(Difficulty::Easy as u8)} />
+                    <MenuElement text={"Medium"} on_click={change_difficulty(Difficulty::Medium as u8)} />
                     <MenuElement text={"Hard"} on_click={change_difficulty(Difficulty::Hard as u8)} />
                 </ul>
             </div>
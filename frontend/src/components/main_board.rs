@@ -1,3 +1,5 @@
+use std::cell::RefCell;
+use std::rc::Rc;
 use std::time::Duration;
 use yew::prelude::*;
 use yew::{Html};
@@ -12,7 +14,10 @@ use gloo_timers::future::sleep;
 use crate::stores::state_store::{StateStore, update_game_data, fetch_game_data};
 use crate::components::atoms::pit::{ClickData, Pit};
 use crate::components::atoms::big_pit::BigPit;
-use crate::common::types::{BACKEND_URL, GameData, PlayerType};
+use crate::common::types::{BACKEND_URL, PlayerType, TurnData};
+
+// Pause before showing each of the AI's moves
+const AI_MOVE_DELAY: Duration = Duration::from_secs(1);
 
 #[derive(Properties, PartialEq, Clone)]
 pub struct Props {
@@ -23,6 +28,8 @@ pub struct Props {
 pub fn main_board(props: &Props) -> Html {
     let (store, dispatch) = use_store::<StateStore>();
     let fetched = use_state(|| false);
+    // Set while a turn is being played, its moves are shown one by one
+    let playing = use_mut_ref(|| false);
 
     {
         let fetched = fetched.clone();
@@ -48,23 +55,14 @@ pub fn main_board(props: &Props) -> Html {
     {
         let store = store.clone();
         let dispatch = dispatch.clone();
-        let force_update = use_state(|| 0);
+        let playing = playing.clone();
         use_effect(move || {
             if let Some(game_data) = &store.game_data {
                 let session_id = game_data.session_id;
-                if game_data.turn == PlayerType::Player2 {
-                    let dispatch = dispatch.clone();
-                    let force_update = force_update.clone();
-                    spawn_local(async move {
-                        sleep(Duration::from_secs(1)).await;
-                        // Make AI move
-                        match fetch_move(session_id, PlayerType::Player2, 0).await {
-                            Ok(data) => update_game_data(&dispatch, data),
-                            Err(err) => error!("Failed to fetch AI move: {}", err),
-                        }
-                        // Update the state to force re-run of effect
-                        force_update.set(*force_update + 1);
-                    });
+                // A game loaded while it was the AI's turn, let it play
+                if game_data.turn == PlayerType::Player2 && game_data.winner.is_none() && !*playing.borrow() {
+                    *playing.borrow_mut() = true;
+                    spawn_local(play_turn(dispatch.clone(), playing, session_id, None));
                 }
             }
             || ()
@@ -105,15 +103,13 @@ pub fn main_board(props: &Props) -> Html {
 
     let on_pit_clicked = {
         let dispatch = dispatch.clone();
+        let playing = playing.clone();
         Callback::from(move |data: ClickData| {
-            let dispatch = dispatch.clone();
             debug!("Pit clicked: {}", data.id);
-            spawn_local(async move {
-                match fetch_move(session_id, data.player_type, data.id).await {
-                    Ok(data) => update_game_data(&dispatch, data),
-                    Err(_) => error!("Failed to fetch move"),
-                }
-            });
+            if !*playing.borrow() {
+                *playing.borrow_mut() = true;
+                spawn_local(play_turn(dispatch.clone(), playing.clone(), session_id, Some(data.id)));
+            }
         })
     };
 
@@ -151,16 +147,43 @@ pub fn main_board(props: &Props) -> Html {
     }
 }
 
-async fn fetch_move(session_id: Uuid, player_type: PlayerType,  pit_id: u32) -> Result<GameData, Error> {
-    debug!("Fetching move...");
-    let url = format!("{}/select?userid={}&sessionid={}&pit={}", BACKEND_URL, player_type as u32, session_id, pit_id);
+/// Plays a turn and shows its moves one by one, then clears the playing flag set by the caller.
+async fn play_turn(dispatch: Dispatch<StateStore>, playing: Rc<RefCell<bool>>, session_id: Uuid, pit_id: Option<u32>) {
+    match fetch_turn(session_id, pit_id).await {
+        Ok(turn) => {
+            let game_data = turn.game_data();
+            for (index, played) in turn.moves.iter().enumerate() {
+                if played.player == PlayerType::Player2 {
+                    sleep(AI_MOVE_DELAY).await;
+                }
+                let mut shown = game_data.clone();
+                shown.players = played.players.clone();
+                if let Some(next) = turn.moves.get(index + 1) {
+                    shown.turn = next.player.clone();
+                    shown.winner = None;
+                }
+                update_game_data(&dispatch, shown);
+            }
+            update_game_data(&dispatch, game_data);
+        },
+        Err(err) => error!("Failed to play the turn: {}", err),
+    }
+    *playing.borrow_mut() = false;
+}
+
+async fn fetch_turn(session_id: Uuid, pit_id: Option<u32>) -> Result<TurnData, Error> {
+    debug!("Fetching turn...");
+    let mut url = format!("{}/turn?sessionid={}", BACKEND_URL, session_id);
+    if let Some(pit_id) = pit_id {
+        url.push_str(&format!("&pit={}", pit_id));
+    }
     let response = Request::get(&url)
         .send()
         .await
         .map_err(|err| anyhow::anyhow!("Request failed: {}", err))?;
 
     let data = response
-        .json::<GameData>()
+        .json::<TurnData>()
         .await
         .map_err(|err| anyhow::anyhow!("Failed to parse JSON: {}", err))?;
 
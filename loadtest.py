@@ -0,0 +1,208 @@
+"""
+Load test of the game's API: simulated players play whole games at once, to size a deployment.
+
+Each simulated player resets a new game at the given difficulty and plays random moves until the game
+is over, either with /api/select for the human's and the AI's moves, like the first frontend, or with
+/api/turn. By default the app runs in this process with the in-memory session store, so no Redis or
+server is needed, and the AI's moves use this machine's cores like a worker would. Give --url to load a
+running server instead. Every concurrency and difficulty given is run in turn, and the throughput and
+the latency percentiles of each route are reported for each, as a table and optionally as JSON:
+    python loadtest.py --games 200 --concurrency 1,8,32 --difficulty 0,1
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+import httpx
+
+logging.basicConfig(level=os.environ.get("LOGLEVEL", "WARNING"))
+
+GAMES = 100
+CONCURRENCY = "1,8,32"
+DIFFICULTY = "0,1"
+# A game ends in well under this many moves, a longer one means the API is broken
+MAX_REQUESTS_PER_GAME = 400
+
+
+def percentile(latencies: List[float], share: float) -> float:
+    """
+    The nearest rank percentile of the latencies, sorted.
+    """
+    if not latencies:
+        return 0.0
+    return latencies[min(len(latencies) - 1, max(0, round(share * len(latencies)) - 1))]
+
+
+class LoadStats:
+    """
+    The latencies and errors of the requests, by route.
+    """
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.games = 0
+
+    async def get(self, client: httpx.AsyncClient, route: str, **params) -> Optional[dict]:
+        """
+        Calls the route and records how long it took.
+        :return: The response's JSON, or None if the request failed
+        """
+        start = time.perf_counter()
+        try:
+            response = await client.get(route, params=params)
+        except httpx.HTTPError:
+            logging.warning(f"Request to {route} failed", exc_info=True)
+            response = None
+        self.latencies.setdefault(route, []).append(time.perf_counter() - start)
+        if response is None or response.status_code != 200:
+            self.errors[route] = self.errors.get(route, 0) + 1
+            return None
+        return response.json()
+
+    def report(self, seconds: float) -> dict:
+        requests = sum(len(latencies) for latencies in self.latencies.values())
+        routes = {}
+        for route, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            routes[route] = {
+                "requests": len(latencies),
+                "errors": self.errors.get(route, 0),
+                "mean": sum(latencies) / len(latencies),
+                "p50": percentile(latencies, 0.5),
+                "p99": percentile(latencies, 0.99),
+                "max": latencies[-1],
+            }
+        return {
+            "games": self.games,
+            "requests": requests,
+            "seconds": seconds,
+            "requests_per_second": requests / seconds if seconds else 0.0,
+            "games_per_second": self.games / seconds if seconds else 0.0,
+            "routes": routes,
+        }
+
+
+async def play_game(client: httpx.AsyncClient, stats: LoadStats, difficulty: int, api: str, rng: random.Random):
+    """
+    Plays one game of random moves against the AI.
+    """
+    state = await stats.get(client, "/api/")
+    if state is None:
+        return
+    sessionid = state["session_id"]
+    state = await stats.get(client, "/api/reset", sessionid=sessionid, difficulty=difficulty)
+    for _ in range(MAX_REQUESTS_PER_GAME):
+        if state is None:
+            return
+        if state["winner"] is not None:
+            stats.games += 1
+            return
+        pits = [pit for pit, stones in enumerate(state["players"]["0"]["pits"]) if stones]
+        # With no stones left the next request only ends the game
+        pit = rng.choice(pits) if pits else 0
+        if api == "turn":
+            state = await stats.get(client, "/api/turn", sessionid=sessionid, pit=pit)
+        elif state["turn"] == "0":
+            state = await stats.get(client, "/api/select", sessionid=sessionid, userid=0, pit=pit)
+        else:
+            state = await stats.get(client, "/api/select", sessionid=sessionid, userid=1, pit=0)
+    logging.warning(f"Game {sessionid} did not end after {MAX_REQUESTS_PER_GAME} requests")
+
+
+async def run_load(client: httpx.AsyncClient, games: int, concurrency: int, difficulty: int, api: str = "select",
+                   seed: int = 0) -> dict:
+    """
+    Plays the games with at most concurrency of them at once.
+    :return: The report of the requests, see LoadStats.report()
+    """
+    stats = LoadStats()
+    pending = iter(range(games))
+
+    async def simulated_player(index: int):
+        rng = random.Random(seed * 1000003 + index)
+        for _ in pending:
+            await play_game(client, stats, difficulty, api, rng)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(simulated_player(index) for index in range(concurrency)))
+    return stats.report(time.perf_counter() - start)
+
+
+@asynccontextmanager
+async def in_process_client():
+    """
+    A client of the app running in this process, with the in-memory session store.
+    """
+    # Even where the environment configures Redis, the in-process app keeps its sessions in memory
+    os.environ["SESSION_BACKEND"] = "memory"
+    import main
+    from move_cache import MoveCache
+
+    assert main.SESSION_BACKEND == "memory", "The app was imported with another session backend"
+
+    # Each run starts without the moves the AI found in the run before
+    main.app.move_cache = MoveCache()
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            yield client
+
+
+async def sweep(url: Optional[str], games: int, concurrencies: List[int], difficulties: List[int], api: str,
+                seed: int) -> List[dict]:
+    results = []
+    for difficulty in difficulties:
+        for concurrency in concurrencies:
+            if url is None:
+                client_context = in_process_client()
+            else:
+                limits = httpx.Limits(max_connections=concurrency)
+                client_context = httpx.AsyncClient(base_url=url, limits=limits, timeout=30)
+            async with client_context as client:
+                report = await run_load(client, games, concurrency, difficulty, api, seed)
+            results.append({"difficulty": difficulty, "concurrency": concurrency, "api": api, **report})
+    return results
+
+
+def print_results(results: List[dict]):
+    print(f"{'difficulty':>10} {'players':>7} {'route':<12} {'requests':>8} {'errors':>6} "
+          f"{'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for result in results:
+        for route, latency in result["routes"].items():
+            print(f"{result['difficulty']:>10} {result['concurrency']:>7} {route:<12} {latency['requests']:>8} "
+                  f"{latency['errors']:>6} {latency['requests'] / result['seconds']:>8.1f} "
+                  f"{latency['p50'] * 1000:>8.2f} {latency['p99'] * 1000:>8.2f}")
+        print(f"{result['difficulty']:>10} {result['concurrency']:>7} {'all':<12} {result['requests']:>8} "
+              f"{sum(latency['errors'] for latency in result['routes'].values()):>6} "
+              f"{result['requests_per_second']:>8.1f}   {result['games_per_second']:.1f} games/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Mancala API with simulated games")
+    parser.add_argument("--url", help="Server to load, by default the app runs in this process without Redis")
+    parser.add_argument("--games", type=int, default=GAMES, help="Games to play for each concurrency and difficulty")
+    parser.add_argument("--concurrency", default=CONCURRENCY, help="Games played at once, comma separated")
+    parser.add_argument("--difficulty", default=DIFFICULTY, help="Difficulties of the AI, comma separated")
+    parser.add_argument("--api", choices=("select", "turn"), default="select", help="Routes the games are played with")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the simulated players' moves")
+    parser.add_argument("--output", help="Where to write the results, as JSON")
+    args = parser.parse_args()
+    results = asyncio.run(sweep(args.url, args.games,
+                                [int(value) for value in args.concurrency.split(",")],
+                                [int(value) for value in args.difficulty.split(",")],
+                                args.api, args.seed))
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,99 @@
+import os
+import json
+import time
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request, status, Query, HTTPException
+from fastapi import FastAPI, Request, status, Query, HTTPException, WebSocket, WebSocketDisconnect, WebSocketException
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 
 from datetime import timedelta
+from typing import List, Optional, Tuple
 from uuid import uuid4
 import redis
-import pickle
+import redis.asyncio
 
 from human_player import HumanPlayer
 from random_player import RandomPlayer
 from minimax_player import MiniMaxPlayer
+from mcts_player import MctsPlayer, SessionTrees
 from board import Board, NO_WINNER
+from engine import Position
+from transposition import SessionTables
+from parallel_search import create_pool
+from tracing import search_trace, SearchTrace
+import session_codec
+from sessions import RedisSessionStore, MemorySessionStore, SessionCache
+from move_cache import MoveCache, RedisMoveStore
+from pondering import Ponderer, PONDER
+from search_scheduler import SearchScheduler
+import metrics
+from metrics import REGISTRY, METRICS, MetricsMiddleware
 
 REDIS_HOST = 'redis'
 REDIS_PORT = 6379
 REDIS_EXPIRATION_HOURS = 72
+# Connections shared by all the requests of a worker, a request waits up to REDIS_POOL_TIMEOUT seconds for one
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", "32"))
+REDIS_POOL_TIMEOUT = 2
+# Threads running the AI's moves, so that its searches don't block the event loop
+AI_THREADS = int(os.environ.get("AI_THREADS", str(os.cpu_count() or 1)))
+# A game played over a WebSocket is stored every this many turns, when it ends and when the socket closes
+WS_CHECKPOINT_TURNS = int(os.environ.get("WS_CHECKPOINT_TURNS", "5"))
+# Where to keep the sessions: "redis", or "memory" to play without Redis
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "redis")
 STATIC_DIR = Path(__file__).parent / "static"
 INDEX_HTML = STATIC_DIR / "index.html"
+AI_PLAYERS = {
+    0: RandomPlayer,
+    1: MiniMaxPlayer,
+    2: MctsPlayer,
+}
+
+if SESSION_BACKEND == "memory":
+    session_store = MemorySessionStore(timedelta(hours=REDIS_EXPIRATION_HOURS))
+else:
+    session_store = RedisSessionStore(redis.asyncio.Redis(connection_pool=redis.asyncio.BlockingConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_connect_timeout=1,
+        socket_timeout=1,
+        health_check_interval=30
+    )), timedelta(hours=REDIS_EXPIRATION_HOURS))
+# The sessions played on this worker are kept in memory, see sessions.py
+sessions = SessionCache(session_store, timedelta(hours=REDIS_EXPIRATION_HOURS))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    assert await sessions.ping()
+    await sessions.start()
+    app.move_executor = ThreadPoolExecutor(max_workers=AI_THREADS, thread_name_prefix="ai-move")
+    # The AI's worker processes live as long as the app, AI_WORKERS sets how many
+    app.search_pool = create_pool()
+    # With AI_PONDER=1 the AI searches while the human thinks, see pondering.py
+    app.ponderer = Ponderer() if PONDER else None
+    yield
+    if app.ponderer is not None:
+        app.ponderer.shutdown()
+    if app.search_pool is not None:
+        app.search_pool.shutdown()
+    app.move_executor.shutdown()
+    await sessions.stop()
+    await session_store.close()
 
-redis = redis.Redis(
-    host=REDIS_HOST,
-    port=REDIS_PORT,
-    socket_connect_timeout=1,
-    socket_timeout=1
-)
-assert redis.ping()
 
 app = FastAPI(
     title="Lucian's Mancala Game",
     description="A basic implementation of the Mancala game",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -46,166 +107,423 @@ app.add_middleware(
     allow_methods=["GET"],
     allow_headers=["*"],
 )
+if METRICS:
+    app.add_middleware(MetricsMiddleware)
 
-app.board = Board(nr_players=2)
-app.players = {
-    0: HumanPlayer(0, app.board),
-    1: RandomPlayer(1, app.board)
-}
-app.turn = 0
-app.winner = NO_WINNER
-app.difficulty = 0
+# The AI's transposition tables are kept in memory, per session, between the moves of a game.
+# They are only a cache: every request works on the state it loads for its own session.
+app.search_tables = SessionTables()
+# The same for the Monte Carlo AI's search trees
+app.search_trees = SessionTrees()
+# Limits the AI's searches running at once, they get less time when the server is busy
+app.search_scheduler = SearchScheduler()
+# The AI's moves are shared by all the sessions, and with Redis by all the workers, see move_cache.py.
+# They are looked up from the AI's threads, so the Redis tier has its own blocking client.
+if SESSION_BACKEND == "memory":
+    app.move_cache = MoveCache()
+else:
+    app.move_cache = MoveCache(store=RedisMoveStore(redis.Redis(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        socket_connect_timeout=1,
+        socket_timeout=1
+    )))
+
+def transposition_stats() -> dict:
+    """
+    The lookups of the tables the AI searches with: the search pool's workers' if there is a pool,
+    the sessions' otherwise.
+    """
+    pool = getattr(app, "search_pool", None)
+    return pool.stats() if pool is not None else app.search_tables.stats()
 
 
-def get_session_state(sessionid: str) -> dict:
+# Read from the counters the caches and the scheduler keep anyway, when /metrics is scraped
+REGISTRY.callback("mancala_sessions_cached", "Sessions in the worker's session cache", lambda: len(sessions))
+REGISTRY.callback("mancala_session_cache_lookups_total", "Session lookups, by whether the cache had the session",
+                  lambda: [({"result": "hit"}, sessions.hits), ({"result": "miss"}, sessions.misses)], "counter")
+REGISTRY.callback("mancala_move_cache_lookups_total", "Lookups of the AI's move cache, by where the move was found",
+                  lambda: [({"result": result}, app.move_cache.stats()[result])
+                           for result in ("local_hits", "store_hits", "misses")], "counter")
+REGISTRY.callback("mancala_move_cache_hit_rate", "Share of the AI's moves found in the move cache",
+                  lambda: app.move_cache.stats()["hit_rate"])
+REGISTRY.callback("mancala_transposition_lookups_total", "Lookups of the AI's transposition tables, by result",
+                  lambda: [({"result": "hit"}, transposition_stats()["hits"]),
+                           ({"result": "miss"}, transposition_stats()["misses"])], "counter")
+REGISTRY.callback("mancala_transposition_hit_rate", "Share of the transposition table lookups that found the position",
+                  lambda: transposition_stats()["hit_rate"])
+REGISTRY.callback("mancala_search_slots", "The AI's search slots, by state",
+                  lambda: [({"state": state}, app.search_scheduler.stats()[state])
+                           for state in ("slots", "running", "waiting")])
+REGISTRY.callback("mancala_searches_total", "The AI's searches, by how the scheduler admitted them",
+                  lambda: [({"outcome": outcome}, app.search_scheduler.stats()[outcome])
+                           for outcome in ("searches", "degraded", "fallbacks", "rejected", "background_skipped")],
+                  "counter")
+
+
+async def get_session_state(sessionid: str) -> dict:
     """
-    Get the session state from redis.
+    Get the session state from the session cache, or the session store behind it.
     :param sessionid: The session id
-    :return: The session state as a dictionary
+    :return: The session state as a dictionary, empty if there is no such session
     """
-    session_state = redis.get(sessionid)
-    if session_state:
-        return pickle.loads(session_state)
-    return {}
+    return await sessions.load(sessionid)
 
 
-def default_session_state(sessionid: str, difficulty: str) -> dict:
+def default_session_state(sessionid: str, difficulty: int) -> dict:
     """
-    Returns a default session state.
+    Returns the state of a new game, with a new board and players.
     """
-    ret = {
-        "session_id": sessionid,
-        "difficulty": difficulty,
-        "turn": "0",
-        "winner": None,
-        "board": app.board,
-        "players": {
-            0: app.players[0],
-            1: app.players[1]
+    return session_codec.new_session_state(sessionid, Position().cells, 0, NO_WINNER, difficulty,
+                                           [HumanPlayer, AI_PLAYERS[difficulty]])
+
+
+def players_response(board: Board) -> dict:
+    return {
+        0: {
+            "big_pit": board.players_data[0].big_pit,
+            "pits": board.players_data[0].pits
+        },
+        1: {
+            "big_pit": board.players_data[1].big_pit,
+            "pits": board.players_data[1].pits
         }
     }
-    return ret
 
 
-def generate_response(sessionid: str) -> dict:
-    session_state = get_session_state(sessionid)
+def generate_response(session_state: dict) -> dict:
     return {
-        "session_id": sessionid,
+        "session_id": session_state['session_id'],
         "difficulty": str(session_state['difficulty']),
         "turn": str(int(session_state['turn']) % 2),
         "winner": str(session_state['winner']) if session_state['winner'] is not None else None,
-        "players": {
-            0: {
-                "big_pit": session_state['board'].players_data[0].big_pit,
-                "pits": session_state['board'].players_data[0].pits
-            },
-            1: {
-                "big_pit": session_state['board'].players_data[1].big_pit,
-                "pits": session_state['board'].players_data[1].pits
-            }
-        }
+        "players": players_response(session_state['board'])
     }
 
 
+def timed_move(player) -> bool:
+    """
+    Makes the player's move and records how long it took and, for the minimax AI, how it was found.
+    :return: What the player's move() returned
+    """
+    start = time.perf_counter()
+    turn_passes = player.move()
+    metrics.MOVE_SECONDS.observe(time.perf_counter() - start, player=type(player).__name__)
+    if isinstance(player, MiniMaxPlayer):
+        metrics.AI_MOVES.inc(source=player.source)
+        if player.source == "search":
+            metrics.AI_NODES.observe(player.nodes)
+            metrics.AI_DEPTH.observe(player.depth_reached)
+            metrics.AI_CUTOFFS.observe(player.cutoffs)
+    return turn_passes
+
+
+def play_turn(session_state: dict, userid: int, pit: int, trace: bool) -> Optional[SearchTrace]:
+    """
+    Plays the user's turn on the session's board, or ends the game if it is over.
+    :return: The trace of the turn, if it was traced
+    """
+    with search_trace(trace) as move_trace:
+        if not session_state['board'].game_over():
+            if isinstance(session_state['players'][userid], HumanPlayer):
+                session_state['players'][userid].select_pit(pit)
+            if timed_move(session_state['players'][userid]):
+                session_state['turn'] = int(session_state['turn']) + 1
+        else:
+            session_state['winner'] = session_state['board'].finalize()
+    return move_trace
+
+
+def attach_search(session_state: dict, sessionid: str):
+    """
+    Gives the session's AI players the session's transposition table or search tree, and the app's
+    search pool, move cache and search scheduler.
+    """
+    for player in session_state['players'].values():
+        if isinstance(player, MiniMaxPlayer):
+            player.table = app.search_tables.get(sessionid)
+            player.pool = app.search_pool
+            player.move_cache = app.move_cache
+            player.scheduler = app.search_scheduler
+        elif isinstance(player, MctsPlayer):
+            player.tree = app.search_trees.get(sessionid)
+            player.scheduler = app.search_scheduler
+
+
+def start_pondering(sessionid: str, session_state: dict):
+    if app.ponderer is not None:
+        attach_search(session_state, sessionid)
+        app.ponderer.ponder(sessionid, session_state)
+
+
+def stop_pondering(sessionid: str):
+    if app.ponderer is not None:
+        app.ponderer.cancel(sessionid)
+
+
+def play_next_move(session_state: dict, pit: Optional[int]) -> Optional[dict]:
+    """
+    Plays the move of the player whose turn it is, the given pit for a human.
+    :param pit: The human's pit, or None if the human has not chosen one
+    :return: The player and the pit of the move, or None if no move was made because it is the human's turn
+    and they chose no pit or an empty one.
+    """
+    board = session_state['board']
+    player = session_state['players'][int(session_state['turn']) % 2]
+    if isinstance(player, HumanPlayer):
+        if pit is None:
+            return None
+        player.select_pit(pit)
+    board.last_move = None
+    if timed_move(player):
+        session_state['turn'] = int(session_state['turn']) + 1
+    if board.last_move is None:
+        return None
+    return {"player": str(board.last_move[0]), "pit": board.last_move[1]}
+
+
+def play_full_turn(session_state: dict, pit: Optional[int], trace: bool) -> Tuple[List[dict], Optional[SearchTrace]]:
+    """
+    Plays the human's move from the given pit, then the AI's replies until it is the human's turn again
+    or the game is over, in which case it is ended.
+    :param pit: The human's pit, or None to only play the AI's moves if it is their turn
+    :return: The moves made, each with the board after it, and the trace of the turn, if it was traced
+    """
+    board = session_state['board']
+    moves = []
+    with search_trace(trace) as move_trace:
+        while not board.game_over():
+            move = play_next_move(session_state, pit)
+            if move is None:
+                break
+            pit = None
+            move["players"] = players_response(board)
+            moves.append(move)
+        if board.game_over():
+            session_state['winner'] = board.finalize()
+    return moves, move_trace
+
+
 @app.get("/api/")
-def index(sessionid: str = Query(default="")):
+async def index(sessionid: str = Query(default="")):
     """
     Main index api call.
     :param sessionid: Session id to use in case of a continued game
     :return: The game's state
     """
-    if not sessionid:
-        print("Could not find previous session id, creating a new one")
-        sessionid = str(uuid4())
-        redis.setex(sessionid, timedelta(hours=REDIS_EXPIRATION_HOURS),
-                    pickle.dumps(default_session_state(sessionid, "0")))
-    else:
-        session_state = get_session_state(sessionid)
-        app.board = session_state['board']
-        app.players = session_state['players']
-        app.winner = session_state['winner']
-        app.turn = session_state['turn']
-        app.difficulty = session_state['difficulty']
-
-    response = {
-        "session_id": sessionid,
-        "difficulty": str(app.difficulty),
-        "turn": "0",
-        "winner": None,
-        "players": {
-            0: {
-                "big_pit": app.board.players_data[0].big_pit,
-                "pits": app.players[0].board.players_data[0].pits
-            },
-            1: {
-                "big_pit": app.board.players_data[1].big_pit,
-                "pits": app.players[1].board.players_data[1].pits
-            }
-        }
-    }
-    return response
+    session_state = await get_session_state(sessionid) if sessionid else {}
+    if not session_state:
+        if not sessionid:
+            print("Could not find previous session id, creating a new one")
+            sessionid = str(uuid4())
+        session_state = default_session_state(sessionid, 0)
+        await sessions.save(session_state)
+    start_pondering(sessionid, session_state)
+    return generate_response(session_state)
 
 
 @app.get("/api/select")
-def pit_selected(userid: int = Query(ge=0, le=1),
+async def pit_selected(userid: int = Query(ge=0, le=1),
                  pit: int = Query(ge=0, le=5),
-                 sessionid: str = Query(default="")):
+                 sessionid: str = Query(default=""),
+                 trace: bool = Query(default=False)):
     """
     Api call upon selecting a pit to play from. Called
     by clicking in the pit in the GUI
     :param userid: Which user made the choice
     :param pit: Chosen pit index from the user's pit list
     :param sessionid: Session id to use
+    :param trace: Whether to return a trace of the AI's search with the state, for debugging
     :return: The new game's state
     """
-    session_state = get_session_state(sessionid)
-    assert len(session_state), "Session not found!"
-    if not session_state['board'].game_over():
-        if isinstance(session_state['players'][userid], HumanPlayer):
-            session_state['players'][userid].select_pit(pit)
-        if session_state['players'][userid].move():
-            session_state['turn'] = int(session_state['turn']) + 1
+    session_state = await get_session_state(sessionid)
+    if not session_state:
+        raise HTTPException(status_code=404, detail="Session not found")
+    stop_pondering(sessionid)
+    attach_search(session_state, sessionid)
+    if isinstance(session_state['players'][userid], HumanPlayer):
+        move_trace = play_turn(session_state, userid, pit, trace)
     else:
-        session_state['winner'] = session_state['board'].winner
-    redis.setex(sessionid, timedelta(hours=REDIS_EXPIRATION_HOURS), pickle.dumps(session_state))
-    response = generate_response(sessionid)
+        move_trace = await asyncio.get_running_loop().run_in_executor(
+            app.move_executor, play_turn, session_state, userid, pit, trace)
+    await sessions.save(session_state)
+    start_pondering(sessionid, session_state)
+    response = generate_response(session_state)
+    if move_trace is not None:
+        response["trace"] = move_trace.records
+    return response
+
+
+@app.get("/api/turn")
+async def turn(pit: Optional[int] = Query(default=None, ge=0, le=5),
+               sessionid: str = Query(default=""),
+               trace: bool = Query(default=False)):
+    """
+    Api call that plays a whole turn: the human's move from the given pit and all the AI's
+    replies after it, including its extra turns.
+    :param pit: Chosen pit index from the human's pit list, leave out to only let the AI move if it is its turn
+    :param sessionid: Session id to use
+    :param trace: Whether to return a trace of the AI's search with the state, for debugging
+    :return: The new game's state, with the moves made in order, each with the board after it
+    """
+    session_state = await get_session_state(sessionid)
+    if not session_state:
+        raise HTTPException(status_code=404, detail="Session not found")
+    stop_pondering(sessionid)
+    attach_search(session_state, sessionid)
+    moves, move_trace = await asyncio.get_running_loop().run_in_executor(
+        app.move_executor, play_full_turn, session_state, pit, trace)
+    await sessions.save(session_state)
+    start_pondering(sessionid, session_state)
+    response = generate_response(session_state)
+    response["moves"] = moves
+    if move_trace is not None:
+        response["trace"] = move_trace.records
     return response
 
 
+@app.get("/api/stats")
+async def stats():
+    """
+    Statistics of the worker's caches and of its AI searches.
+    """
+    return {"move_cache": app.move_cache.stats(), "search_scheduler": app.search_scheduler.stats()}
+
+
 @app.get("/api/reset")
-def reset(sessionid: str = Query(default=""), difficulty: int = Query(ge=0, le=1)):
+async def reset(sessionid: str = Query(default=""), difficulty: int = Query(ge=0, le=2)):
     """
     Reset the game to it's initial state.
     :param sessionid: Session id to use
-    :param difficulty: Difficulty level of the AI (0 easy, 1 hard)
+    :param difficulty: Difficulty level of the AI (0 easy, 1 hard, 2 medium with Monte Carlo tree search)
     :return: New game's session state
     """
-    app.board.reset()
-    app.players = {
-        0: HumanPlayer(0, app.board),
-        # 1: RandomPlayer(1, app.board)
-    }
-    app.turn = 0
-    app.winner = NO_WINNER
-    app.difficulty = difficulty
-    if difficulty == 0:
-        app.players[1] = RandomPlayer(1, app.board)
-    else:
-        app.players[1] = MiniMaxPlayer(1, app.board)
-    session_state = default_session_state(sessionid, str(difficulty))
-    redis.setex(sessionid, timedelta(hours=REDIS_EXPIRATION_HOURS), pickle.dumps(session_state))
-    return generate_response(sessionid)
+    stop_pondering(sessionid)
+    session_state = default_session_state(sessionid, difficulty)
+    await sessions.save(session_state)
+    start_pondering(sessionid, session_state)
+    return generate_response(session_state)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """
+    The worker's metrics, in the Prometheus text format.
+    """
+    if not METRICS:
+        raise HTTPException(status_code=404, detail="Not found")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+def cell_changes(before: List[int], after: List[int]) -> List[List[int]]:
+    return [[cell, stones] for cell, (old, stones) in enumerate(zip(before, after)) if old != stones]
+
+
+async def push_turn(websocket: WebSocket, session_state: dict, pit: Optional[int]):
+    """
+    Plays a turn like play_full_turn(), but sends every move as soon as it is made.
+    """
+    board = session_state['board']
+    loop = asyncio.get_running_loop()
+    before = board.position.cells[:]
+    while not board.game_over():
+        if isinstance(session_state['players'][int(session_state['turn']) % 2], HumanPlayer):
+            move = play_next_move(session_state, pit)
+        else:
+            move = await loop.run_in_executor(app.move_executor, play_next_move, session_state, None)
+        if move is None:
+            break
+        # Like play_full_turn(), the pit is only for the turn's first move
+        pit = None
+        after = board.position.cells[:]
+        await websocket.send_json({"type": "move", **move, "changes": cell_changes(before, after),
+                                   "turn": str(int(session_state['turn']) % 2)})
+        before = after
+    if board.game_over():
+        session_state['winner'] = board.finalize()
+    await websocket.send_json({
+        "type": "turn_over",
+        "changes": cell_changes(before, board.position.cells),
+        "turn": str(int(session_state['turn']) % 2),
+        "winner": str(session_state['winner']) if session_state['winner'] is not None else None
+    })
+
+
+@app.websocket("/api/ws")
+async def game_channel(websocket: WebSocket, sessionid: str = Query(default="")):
+    """
+    A game played over a WebSocket. The session is kept in memory while the socket is open.
+    Messages are JSON objects with a "type":
+    - {"type": "turn", "pit": 0-5} plays the human's pit and the AI's replies, leave out the pit to
+      only let the AI play. Answered by a "move" message for each move made and then a "turn_over".
+    - {"type": "reset", "difficulty": 0-2} starts a new game. Answered by a "state".
+    The server sends:
+    - {"type": "state", ...} the whole game's state, as /api/ returns it, when connected and after a reset.
+    - {"type": "move", "player", "pit", "changes", "turn"} a move, with the cells it changed as
+      [cell, stones] pairs. Cells 0-5 are player 0's pits and 6 their big pit, 7-12 and 13 player 1's.
+    - {"type": "turn_over", "changes", "turn", "winner"} after the moves of a turn, with the stones
+      collected if the game ended.
+    - {"type": "error", "detail"} for a message that could not be played.
+    :param sessionid: Session id to use
+    """
+    session_state = await get_session_state(sessionid)
+    if not session_state:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Session not found")
+    attach_search(session_state, sessionid)
+    await websocket.accept()
+    metrics.WEBSOCKETS.inc()
+    await websocket.send_json({"type": "state", **generate_response(session_state)})
+    start_pondering(sessionid, session_state)
+    turns = 0
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                kind = message["type"]
+            except (ValueError, TypeError, KeyError):
+                await websocket.send_json({"type": "error", "detail": "Expected a JSON object with a type"})
+                continue
+            if kind == "turn":
+                pit = message.get("pit")
+                if pit is not None and (not isinstance(pit, int) or isinstance(pit, bool) or pit not in range(6)):
+                    await websocket.send_json({"type": "error", "detail": "The pit must be between 0 and 5"})
+                    continue
+                stop_pondering(sessionid)
+                await push_turn(websocket, session_state, pit)
+                start_pondering(sessionid, session_state)
+                turns += 1
+                if turns % WS_CHECKPOINT_TURNS == 0 or session_state['winner'] is not None:
+                    await sessions.save(session_state)
+            elif kind == "reset":
+                difficulty = message.get("difficulty")
+                if difficulty not in AI_PLAYERS:
+                    await websocket.send_json({"type": "error", "detail": "Unknown difficulty"})
+                    continue
+                stop_pondering(sessionid)
+                session_state = default_session_state(sessionid, difficulty)
+                attach_search(session_state, sessionid)
+                await sessions.save(session_state)
+                await websocket.send_json({"type": "state", **generate_response(session_state)})
+                start_pondering(sessionid, session_state)
+            else:
+                await websocket.send_json({"type": "error", "detail": f"Unknown message type {kind}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        metrics.WEBSOCKETS.dec()
+        stop_pondering(sessionid)
+        await sessions.save(session_state)
 
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", StaticFiles(directory=STATIC_DIR, check_dir=False), name="static")
 
 @app.get("/", include_in_schema=False)
-def frontend_index():
+async def frontend_index():
     return FileResponse(str(INDEX_HTML))
 
 # SPA fallback: serve index.html for any non-API, non-static routes
 @app.get("/{path:path}", include_in_schema=False)
-def spa_fallback(path: str):
+async def spa_fallback(path: str):
     # Let API routes behave normally
     if path.startswith("api"):
         raise HTTPException(status_code=404, detail="Not found")
@@ -0,0 +1,260 @@
+"""
+Monte Carlo tree search player, the AI of difficulty 2.
+
+The player grows a tree of the positions its moves lead to, picking the branch to explore with UCT: the
+share of the random games won from each move, plus a bonus for the moves tried least. The random games
+are played with the batch engine: each step picks a batch of leaves, with virtual losses so they differ,
+and plays a few random games from each of them in one vectorized playout. The search stops at its
+playout budget or its time budget, whichever comes first, and can be stopped from another thread, so
+its cost per request is capped. The move played is the one searched most. The tree of a session is kept
+between its moves, so the next search starts from the part of the tree the game went into.
+"""
+import os
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+import board
+from batch_engine import BatchPositions
+from engine import Position
+from player import IPlayer
+from search_scheduler import SearchScheduler
+
+logging.basicConfig(level=os.environ.get("LOGLEVEL", "WARNING"))
+
+# Random games per move
+MCTS_PLAYOUTS = int(os.environ.get("AI_MCTS_PLAYOUTS", "20000"))
+MCTS_TIME_BUDGET = float(os.environ.get("AI_MCTS_TIME_BUDGET_MS", "200")) / 1000
+# Leaves rolled out at once, and random games played from each of them
+MCTS_BATCH = 32
+MCTS_ROLLOUTS = 4
+# The weight of the UCT bonus of the moves tried least
+EXPLORATION = math.sqrt(2)
+# How many moves down the last search's tree the new position is looked for: the AI's reply,
+# then the human's move with a few extra turns
+REUSE_DEPTH = 6
+MAX_SESSION_TREES = 64
+
+
+class Node:
+    """
+    A position of the tree. Its visits are the random games played through it and its value the
+    games won in them by the player whose move led to it, a draw counting as half.
+    """
+    __slots__ = ("key", "player", "pit", "children", "untried", "visits", "value", "scores")
+
+    def __init__(self, position: Position, player: int, pit: Optional[int] = None):
+        """
+        :param player: The player to move in the position
+        :param pit: The move that led to the position
+        """
+        self.key = position.key(player)
+        self.player = player
+        self.pit = pit
+        self.children: List[Node] = []
+        self.untried = [] if position.is_terminal() else position.ordered_moves(player)[::-1]
+        self.visits = 0
+        self.value = 0.0
+        # The final scores of a finished game, which need no random games
+        self.scores = [position.final_score(0), position.final_score(1)] if position.is_terminal() else None
+
+    def select_child(self) -> "Node":
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.value / child.visits +
+                   EXPLORATION * math.sqrt(log_visits / child.visits))
+
+    def size(self) -> int:
+        return 1 + sum(child.size() for child in self.children)
+
+
+class SearchTree:
+    """
+    The tree of a session, kept between the AI's moves.
+    """
+
+    def __init__(self):
+        self.root: Optional[Node] = None
+        self.lock = threading.Lock()
+
+    def find(self, position: Position, player: int) -> Optional[Node]:
+        """
+        The node of the position with the player to move, if the last search's tree reached it.
+        """
+        level = [self.root] if self.root is not None else []
+        key = position.key(player)
+        for _ in range(REUSE_DEPTH + 1):
+            for node in level:
+                if node.key == key:
+                    return node
+            level = [child for node in level for child in node.children]
+        return None
+
+
+class SessionTrees:
+    """
+    Keeps a search tree per game session, like transposition.SessionTables.
+    Only the most recently used sessions keep their trees.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSION_TREES):
+        self.max_sessions = max_sessions
+        self.trees = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, sessionid: str) -> SearchTree:
+        with self.lock:
+            tree = self.trees.get(sessionid)
+            if tree is None:
+                tree = self.trees[sessionid] = SearchTree()
+                while len(self.trees) > self.max_sessions:
+                    self.trees.popitem(last=False)
+            else:
+                self.trees.move_to_end(sessionid)
+            return tree
+
+
+class MctsPlayer(IPlayer):
+    """
+    Implementation of the Player class for an AI that chooses its moves with Monte Carlo tree search.
+    """
+
+    def __init__(self, index: int, game_board: board.Board, playouts: int = MCTS_PLAYOUTS,
+                 time_budget: float = MCTS_TIME_BUDGET, batch: int = MCTS_BATCH, rollouts: int = MCTS_ROLLOUTS,
+                 tree: SearchTree = None, scheduler: SearchScheduler = None, seed: Optional[int] = None):
+        self.index = index
+        self.board = game_board
+        self.playouts = playouts
+        self.time_budget = time_budget
+        self.batch = batch
+        self.rollouts = rollouts
+        self.tree = tree
+        self.scheduler = scheduler
+        self.rng = np.random.default_rng(seed)
+        # Statistics of the last search
+        self.games = 0
+        self.reused = 0
+        self._deadline = None
+        logging.info(f"MCTS player {index} created")
+
+    def move(self) -> bool:
+        logging.info("MCTS player making a move")
+        return self.board.move(self.index, self.best_move())
+
+    def best_move(self) -> Optional[int]:
+        """
+        Searches from the board's position and returns the move searched most.
+        """
+        position = self.board.position.copy()
+        moves = position.ordered_moves(self.index)
+        if len(moves) <= 1:
+            return moves[0] if moves else None
+        tree = self.tree if self.tree is not None else SearchTree()
+        # Another request of the session searching at the same time gets a tree of its own
+        if not tree.lock.acquire(blocking=False):
+            tree = SearchTree()
+            tree.lock.acquire()
+        try:
+            root = tree.find(position, self.index) or Node(position, self.index)
+            tree.root = root
+            if self.scheduler is None:
+                self.search(root, position, self.time_budget)
+            else:
+                with self.scheduler.admit(self.time_budget) as time_budget:
+                    # Without a slot the AI still plays one batch of random games, it is cheap
+                    self.search(root, position, time_budget or 0.0)
+            best = max(root.children, key=lambda child: child.visits, default=None)
+        finally:
+            tree.lock.release()
+        return best.pit if best is not None else moves[0]
+
+    def search(self, root: Node, position: Position, time_budget: float):
+        """
+        Plays batches of random games from the leaves of the tree until the playout or the time budget
+        runs out, at least one batch.
+        """
+        self._deadline = time.perf_counter() + time_budget
+        self.reused = root.visits
+        self.games = 0
+        while True:
+            self.search_batch(root, position)
+            if self.games >= self.playouts or time.perf_counter() >= self._deadline or \
+                    (not root.untried and all(child.scores is not None for child in root.children)):
+                break
+        # Counting the nodes walks the whole tree, only done when it is logged
+        if logging.getLogger().isEnabledFor(logging.INFO):
+            logging.info("Searched %d random games, %d reused, the tree has %d nodes",
+                         self.games, self.reused, root.size())
+
+    def search_batch(self, root: Node, position: Position):
+        """
+        Picks a batch of leaves and plays random games from all of them at once.
+        Each leaf picked counts as lost games until its games are played, so the next one
+        is picked elsewhere.
+        """
+        paths = []
+        cells = []
+        players = []
+        for _ in range(self.batch):
+            path = self.select_leaf(root, position)
+            for node in path:
+                node.visits += self.rollouts
+            leaf = path[-1]
+            if leaf.scores is None:
+                cells += [position.cells[:]] * self.rollouts
+                players += [leaf.player] * self.rollouts
+            paths.append(path)
+            for _ in range(len(path) - 1):
+                position.undo()
+        if cells:
+            scores = BatchPositions(np.array(cells), np.array(players)).playout(self.rng)
+            # Player 0's points in the games of each leaf
+            leaf_points = self.points(scores).reshape(-1, self.rollouts).sum(axis=1)
+        row = 0
+        for path in paths:
+            leaf = path[-1]
+            if leaf.scores is not None:
+                points = self.rollouts * self.points(np.array([leaf.scores]))[0]
+            else:
+                points = leaf_points[row]
+                row += 1
+            for parent, node in zip(path, path[1:]):
+                node.value += points if parent.player == 0 else self.rollouts - points
+            self.games += self.rollouts
+
+    def select_leaf(self, root: Node, position: Position) -> List[Node]:
+        """
+        Goes down the tree with UCT and adds a node for a move not tried yet.
+        :return: The nodes from the root to the leaf, whose position is applied to the position
+        """
+        path = [root]
+        node = root
+        while not node.untried and node.children:
+            node = node.select_child()
+            position.apply(path[-1].player, node.pit)
+            path.append(node)
+        if node.untried:
+            pit = node.untried.pop()
+            next_player = node.player if position.apply(node.player, pit) else 1 - node.player
+            child = Node(position, next_player, pit)
+            node.children.append(child)
+            path.append(child)
+        return path
+
+    @staticmethod
+    def points(scores: np.ndarray) -> np.ndarray:
+        """
+        Player 0's points in each game of the (K, 2) final scores: 1 for a win, 0.5 for a draw.
+        """
+        return (scores[:, 0] > scores[:, 1]) + 0.5 * (scores[:, 0] == scores[:, 1])
+
+    def stop(self):
+        """
+        Ends the running search after its current batch, as if its time was up.
+        Can be called from another thread.
+        """
+        self._deadline = 0.0
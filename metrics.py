@@ -0,0 +1,215 @@
+"""
+Metrics of a worker, served at /metrics in the Prometheus text format.
+
+The metrics are kept in a small registry of counters, gauges and histograms with fixed buckets, so
+recording one costs a dictionary lookup and an addition under a lock. Values that are already counted
+elsewhere, like the hits of the caches, are read only when the metrics are collected. Set METRICS=0 to
+turn the endpoint and the request timing off.
+"""
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+METRICS = os.environ.get("METRICS", "1") == "1"
+
+# In seconds, from a cache hit to a search with a large time budget
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 4096)
+COUNT_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+DEPTH_BUCKETS = (1, 2, 4, 6, 8, 10, 12, 16, 24, 32, 64)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.values: Dict[Labels, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self.lock:
+            values = list(self.values.items())
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}" for labels, value in values]
+
+
+class Gauge(Counter):
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[_labels(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class CallbackGauge:
+    """
+    A gauge, or a counter, whose values are read when the metrics are collected.
+    The callback returns the value, or a list of (labels dict, value) pairs.
+    """
+
+    def __init__(self, name: str, description: str, callback: Callable, kind: str = "gauge"):
+        self.name = name
+        self.description = description
+        self.callback = callback
+        self.kind = kind
+
+    def samples(self) -> List[str]:
+        values = self.callback()
+        if not isinstance(values, list):
+            values = [({}, values)]
+        return [f"{self.name}{_format_labels(_labels(labels))} {_format_value(value)}" for labels, value in values]
+
+
+class Histogram:
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        # Per labels: the count of each bucket, the last one for the values above all buckets, and the sum
+        self.values: Dict[Labels, list] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _labels(labels)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        with self.lock:
+            values = [(labels, counts[:]) for labels, counts in self.values.items()]
+        samples = []
+        for labels, counts in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else _format_value(bound)
+                samples.append(f"{self.name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+            samples.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(counts[-1])}")
+            samples.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return samples
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        assert metric.name not in self.metrics, f"Metric {metric.name} registered twice"
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self.register(Counter(name, description))
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self.register(Gauge(name, description))
+
+    def histogram(self, name: str, description: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, buckets))
+
+    def callback(self, name: str, description: str, callback: Callable, kind: str = "gauge") -> CallbackGauge:
+        return self.register(CallbackGauge(name, description, callback, kind))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines += metric.samples()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram("mancala_request_duration_seconds", "Time to answer a request, by route")
+REDIS_SECONDS = REGISTRY.histogram("mancala_redis_duration_seconds", "Round trip time of the Redis commands")
+REDIS_ERRORS = REGISTRY.counter("mancala_redis_errors_total", "Redis commands that failed")
+SESSION_BYTES = REGISTRY.histogram("mancala_session_bytes", "Size of the stored sessions", SIZE_BUCKETS)
+SESSION_CODEC_SECONDS = REGISTRY.histogram("mancala_session_codec_duration_seconds",
+                                           "Time to encode or decode a session")
+MOVE_SECONDS = REGISTRY.histogram("mancala_move_duration_seconds", "Time to make a move, by kind of player")
+AI_MOVES = REGISTRY.counter("mancala_ai_moves_total", "Moves of the minimax AI, by where the move came from")
+AI_NODES = REGISTRY.histogram("mancala_ai_nodes", "Nodes visited by a search of the minimax AI", COUNT_BUCKETS)
+AI_CUTOFFS = REGISTRY.histogram("mancala_ai_cutoffs", "Alpha-beta cutoffs of a search of the minimax AI",
+                                COUNT_BUCKETS)
+AI_DEPTH = REGISTRY.histogram("mancala_ai_depth", "Depth reached by a search of the minimax AI", DEPTH_BUCKETS)
+WEBSOCKETS = REGISTRY.gauge("mancala_websockets", "Games played over an open WebSocket")
+
+
+class MetricsMiddleware:
+    """
+    Times the HTTP requests, by route template so that the number of labels stays small.
+    A plain ASGI middleware, which adds much less to a request than one based on BaseHTTPMiddleware.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", "other")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, route=route, method=scope["method"], status=status)
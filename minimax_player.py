@@ -1,25 +1,90 @@
 import os
+import time
 import logging
 
-from copy import deepcopy
 import board
+import tracing
 from player import IPlayer
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, SOLVED_DEPTH
+from endgame import EndgameDatabase, default_database
+from opening_book import OpeningBook, default_book
+from move_cache import MoveCache, CachedMove, position_key
+from search_scheduler import SearchScheduler
 
 logging.basicConfig(level=os.environ.get("LOGLEVEL", "WARNING"))
 
+# How long the AI may think about a single move, in seconds
+DEFAULT_TIME_BUDGET = float(os.environ.get("AI_TIME_BUDGET_MS", "50")) / 1000
+MAX_DEPTH = 64
+# How many nodes are searched between two checks of the clock
+NODES_BETWEEN_CLOCK_CHECKS = 256
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget for the move is used up.
+    """
+
 
 class MiniMaxPlayer(IPlayer):
     """
     Implementation of the Player class for a player that chooses
     the pits using the minimax algorithm with alpha-beta pruning.
+    The search is iteratively deepened until the time budget of the move is used up.
+    Searched positions are kept in a transposition table, which can be shared by all
+    the moves of a game session, see transposition.SessionTables.
+    With a search pool, the root moves are searched in parallel by worker processes,
+    unless the request is traced, see tracing.search_trace(). The workers then use their own
+    tables, shared by all the sessions, instead of the session's, see parallel_search.
+    Positions with few enough stones left are looked up in the endgame database, if one was built,
+    and the first replies of a game are played from the opening book.
+    With a move cache, positions that any session searched before are played without searching.
+    With a scheduler, the search gets less time when the server is busy, or none at all, see search_scheduler.
     """
 
-    def __init__(self, index: int, game_board: board.Board):
+    def __init__(self, index: int, game_board: board.Board,
+                 time_budget: float = DEFAULT_TIME_BUDGET, max_depth: int = MAX_DEPTH,
+                 table: TranspositionTable = None, endgame: EndgameDatabase = None,
+                 book: OpeningBook = None, pool=None, move_cache: MoveCache = None,
+                 scheduler: SearchScheduler = None):
         self.index = index
         self.board = game_board
         self.selected_pit = None
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.table = table
+        self.endgame = endgame
+        self.book = book
+        # A parallel_search.SearchPool to spread the search over several processes
+        self.pool = pool
+        self.move_cache = move_cache
+        self.scheduler = scheduler
+        # Statistics of the last search
+        self.nodes = 0
+        self.depth_reached = 0
+        self.cutoffs = 0
+        # Where the last move came from: "forced", "book", "cache", "endgame", "search" or "quick"
+        self.source = None
+        self._deadline = None
+        self._depth_cut = False
+        self._endgame = None
+        self._trace = None
         logging.info(f"Minimax player {index} created")
 
+    def __getstate__(self):
+        # The transposition table is a cache, the endgame database and the opening book
+        # are loaded from files, none of them is stored with the session
+        state = self.__dict__.copy()
+        state['table'] = None
+        state['endgame'] = None
+        state['book'] = None
+        state['pool'] = None
+        state['move_cache'] = None
+        state['scheduler'] = None
+        state['_endgame'] = None
+        state['_trace'] = None
+        return state
+
     def move(self) -> int:
         logging.info("Minimax player making a move")
         return self.board.move(self.index, self.best_move())
@@ -27,67 +92,264 @@ class MiniMaxPlayer(IPlayer):
     def best_move(self):
         """
         Find the best move for the current player.
-        Look at every available move and calculate the score for each one.
-        Choose the move with the highest score.
+        Search all the moves to depth 1, then 2 and so on until the time budget runs out,
+        and return the best move of the deepest search that finished. Each iteration
+        searches the moves in the order of the scores of the previous iteration, which
+        lets alpha-beta cut off much more of the tree.
+        The search works on a copy of the board's position, applying and
+        undoing moves in place instead of copying the board at every node.
+        A search that runs out of time leaves its copy half way, so it is dropped.
+        """
+        position = self.board.position.copy()
+        moves = position.ordered_moves(self.index)
+        if len(moves) <= 1:
+            self.source = "forced"
+            return moves[0] if moves else None
+        book = self.book if self.book is not None else default_book()
+        book_move = book.lookup(position, self.index) if book is not None else None
+        if book_move in moves:
+            logging.info("Best move from the opening book is %s", book_move)
+            self.source = "book"
+            return book_move
+        cache_key = None
+        if self.move_cache is not None:
+            cache_key = position_key(position, self.index, self.strength())
+            cached = self.move_cache.lookup(cache_key)
+            if cached is not None and cached.pit in moves:
+                logging.info("Best move from the move cache is %s, searched to depth %s", cached.pit, cached.depth)
+                trace = tracing.current()
+                if trace is not None:
+                    trace.record("cached_move", move=cached.pit, depth=cached.depth)
+                self.source = "cache"
+                return cached.pit
+        if self.scheduler is None:
+            return self.search(position, moves, self.time_budget, cache_key)
+        with self.scheduler.admit(self.time_budget) as time_budget:
+            if time_budget is None:
+                return self.quick_move(position, moves)
+            return self.search(position, moves, time_budget, cache_key)
+
+    def search(self, position, moves, time_budget: float, cache_key=None) -> int:
+        """
+        Searches the best move within the time budget, see best_move().
+        :param cache_key: The key to store the move in the move cache
+        """
+        self.start_search(time_budget)
+        if self._trace is not None:
+            self._trace.record("search", player=self.index, cells=position.cells[:], time_budget=time_budget)
+        if self._endgame is not None and self._endgame.covers(position):
+            self.source = "endgame"
+            return self.endgame_move(position, moves)
+        self.source = "search"
+        if self.pool is not None and self._trace is None:
+            best_move, self.depth_reached, self.nodes, self.cutoffs = \
+                self.pool.best_move(position, self.index, moves, time_budget, self.max_depth)
+        else:
+            best_move = self.iterative_deepening(position, moves)
+        if cache_key is not None:
+            self.move_cache.store_move(cache_key, CachedMove(best_move, self.depth_reached))
+        return best_move
+
+    def quick_move(self, position, moves) -> int:
+        """
+        The move with the best score one move ahead, for when there is no time to search.
+        The moves come extra turns first, so those win the ties.
+        """
+        self.depth_reached = 0
+        self.nodes = 0
+        self.cutoffs = 0
+        self.source = "quick"
+
+        def score(pit):
+            position.apply(self.index, pit)
+            value = position.evaluate(self.index)
+            position.undo()
+            return value
+        best_move = max(moves, key=score)
+        logging.info("No time to search, the quick move is %s", best_move)
+        return best_move
+
+    def strength(self) -> str:
+        """
+        The limits of the search, moves found with other limits are not as good.
+        """
+        return f"{type(self).__name__}:{round(self.time_budget * 1000)}:{self.max_depth}"
+
+    def iterative_deepening(self, position, moves) -> int:
+        """
+        Searches in this thread, see best_move().
+        """
+        best_move = moves[0]
+        for depth in range(1, self.max_depth + 1):
+            self._depth_cut = False
+            try:
+                values = self.search_root(position, moves, depth)
+            except SearchTimeout:
+                logging.info("Out of time at depth %s", depth)
+                break
+            moves.sort(key=lambda pit: values[pit], reverse=True)
+            best_move = moves[0]
+            self.depth_reached = depth
+            logging.info("Best move at depth %s is %s with value %s", depth, best_move, values[best_move])
+            if self._trace is not None:
+                self._trace.record("iteration", depth=depth, move=best_move, values=values, nodes=self.nodes)
+            if not self._depth_cut:
+                # The whole game tree was searched, going deeper won't change anything
+                break
+        return best_move
+
+    def stop(self):
+        """
+        Ends the running search at its next check of the clock, as if its time was up.
+        Can be called from another thread.
+        """
+        self._deadline = 0.0
+
+    def start_search(self, time_budget: float):
+        """
+        Resets the statistics and the clock for a new search.
+        """
+        self._endgame = self.endgame if self.endgame is not None else default_database()
+        self._trace = tracing.current()
+        if self.table is None:
+            self.table = TranspositionTable()
+        self.table.new_search()
+        self.nodes = 0
+        self.depth_reached = 0
+        self.cutoffs = 0
+        self._depth_cut = False
+        self._deadline = time.perf_counter() + time_budget
+
+    def score_move(self, position, pit, depth, time_budget: float):
+        """
+        Searches a single root move on its own, with a full alpha-beta window,
+        for searches that are split over several processes.
+        :return: The score and whether the depth cut the search short.
+        :raises SearchTimeout: If the time budget runs out first.
+        """
+        self.start_search(time_budget)
+        value = self.search_move(position, pit, depth, -1000, 1000)
+        return value, self._depth_cut
+
+    def endgame_move(self, position, moves):
+        """
+        Picks the move with the best perfect play score from the endgame database, no search needed.
+        """
+        def score(pit):
+            next_player = self.index if position.apply(self.index, pit) else 1 - self.index
+            value = self._endgame.score(position, self.index, next_player)
+            position.undo()
+            return value
+        best_move = max(moves, key=score)
+        logging.info("Best move from the endgame database is %s", best_move)
+        return best_move
+
+    def search_root(self, position, moves, depth) -> dict:
+        """
+        Searches every move from the root position to the given depth.
+        :return: The score of each move, by pit. Only the best move's score is exact,
+        the others are upper bounds, which is good enough to order them.
         """
         alpha = -1000
         beta = 1000
-        best_value = -1000
-        best_move = None
-        for pit in self.board.valid_pit_indexes(self.index):
-            new_board = deepcopy(self.board)
-            new_board.move(self.index, pit)
-            value = self.minimax(self.index, 1 - self.index, new_board, depth=2, maximizing=False, alpha=alpha, beta=beta)
-            logging.info(f"Analyzing pit {pit} with value {value}")
-            if value > best_value:
-                best_value = value
-                best_move = pit
-            alpha = max(alpha, best_value)
-        logging.info(f"Best move is {best_move} with value {best_value}")
-        return best_move
+        values = {}
+        for pit in moves:
+            values[pit] = self.search_move(position, pit, depth, alpha, beta)
+            alpha = max(alpha, values[pit])
+        return values
+
+    def search_move(self, position, pit, depth, alpha, beta) -> int:
+        """
+        Scores one of our moves from the root position by searching the position it leads to.
+        """
+        if position.apply(self.index, pit):
+            # Extra turn, we move again
+            value = self.minimax(self.index, self.index, position, depth - 1, alpha, beta)
+        else:
+            value = self.minimax(self.index, 1 - self.index, position, depth - 1, alpha, beta)
+        position.undo()
+        return value
 
-    def minimax(self, player_index, current_player_index, current_board, depth, maximizing, alpha, beta):
+    def minimax(self, player_index, current_player_index, position, depth, alpha, beta):
         """
         Calculate a score for this possible move using the minimax algorithm with alpha-beta pruning.
         Basically you go through every possible combination and then switch and chose
         the best one your opponent would choose. Depending on the depth you go down
         and chose best or worst move until you either reach max depth or a game over.
+        A move that ends in the mover's own big pit gives them another turn, so the next
+        ply is searched for the same player. Those moves are searched first.
         AB Pruning is an optimization that stops analyzing a move when at least one possibility has been found that
         proves the move to be worse than a previously examined move.
+        Positions that were already searched deep enough are answered from the transposition
+        table, and the best move stored for a position is tried first.
         :param player_index: The index of the player for which to calculate the score.
         :param current_player_index: The index of the player that is currently moving.
-        :param current_board: The board to calculate the score for.
+        :param position: The engine position to calculate the score for, restored before returning.
         :param depth: The depth to go down.
-        :param maximizing: Whether to maximize or minimize the score.
         :param alpha: The best score that the maximizing player can guarantee at this point or later.
         :param beta: The best score that the minimizing player can guarantee at this point or later.
         """
-        if depth == 0 or current_board.game_over():
-            return current_board.evaluate(player_index)
-
-        if maximizing:
-            best_value = -1000
-            for pit in current_board.valid_pit_indexes(current_player_index):
-                new_board = deepcopy(current_board)
-                new_board.move(current_player_index, pit)
-                value = self.minimax(player_index, 1 - current_player_index, new_board, depth - 1, False, alpha, beta)
-                best_value = max(best_value, value)
-                logging.debug(f"Analyzing pit {pit} with value {value}")
+        self.nodes += 1
+        if self.nodes % NODES_BETWEEN_CLOCK_CHECKS == 0 and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+        if position.is_terminal():
+            return position.evaluate(player_index)
+        if self._endgame is not None and self._endgame.covers(position):
+            return self._endgame.score(position, player_index, current_player_index)
+        if depth == 0:
+            self._depth_cut = True
+            return position.evaluate(player_index)
+
+        maximizing = current_player_index == player_index
+        key = position.key(current_player_index)
+        moves = position.ordered_moves(current_player_index)
+        entry = self.table.probe(key)
+        if entry is not None:
+            if entry.depth >= depth:
+                if entry.depth != SOLVED_DEPTH:
+                    self._depth_cut = True
+                if entry.bound == EXACT \
+                        or (entry.bound == LOWER_BOUND and entry.value >= beta) \
+                        or (entry.bound == UPPER_BOUND and entry.value <= alpha):
+                    return entry.value
+            if entry.move in moves:
+                moves.remove(entry.move)
+                moves.insert(0, entry.move)
+
+        original_alpha, original_beta = alpha, beta
+        outer_depth_cut = self._depth_cut
+        self._depth_cut = False
+        best_value = -1000 if maximizing else 1000
+        best_move = None
+        for pit in moves:
+            if position.apply(current_player_index, pit):
+                value = self.minimax(player_index, current_player_index, position, depth - 1, alpha, beta)
+            else:
+                value = self.minimax(player_index, 1 - current_player_index, position, depth - 1, alpha, beta)
+            position.undo()
+            if self._trace is not None:
+                self._trace.record("move", player=current_player_index, pit=pit, depth=depth, value=value)
+            if maximizing:
+                if value > best_value:
+                    best_value, best_move = value, pit
                 alpha = max(alpha, best_value)
-                if alpha >= beta:
-                    break
-            logging.debug(f"Best value for player {player_index} is {best_value}")
-            return best_value
-        else:
-            best_value = 1000
-            for pit in current_board.valid_pit_indexes(current_player_index):
-                new_board = deepcopy(current_board)
-                new_board.move(current_player_index, pit)
-                value = self.minimax(player_index, 1 - current_player_index, new_board, depth - 1, True, alpha, beta)
-                best_value = min(best_value, value)
-                logging.debug(f"Analyzing pit {pit} with value {value}")
+            else:
+                if value < best_value:
+                    best_value, best_move = value, pit
                 beta = min(beta, best_value)
-                if alpha >= beta:
-                    break
-            logging.debug(f"Best value for player {player_index} is {best_value}")
-            return best_value
+            if alpha >= beta:
+                self.cutoffs += 1
+                break
+        if self._trace is not None:
+            self._trace.record("node", player=current_player_index, depth=depth, value=best_value, move=best_move,
+                               cells=position.cells[:])
+
+        if best_value <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_value >= original_beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.table.store(key, depth if self._depth_cut else SOLVED_DEPTH, best_value, bound, best_move)
+        self._depth_cut = self._depth_cut or outer_depth_cut
+        return best_value
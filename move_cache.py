@@ -0,0 +1,142 @@
+"""
+The AI's best moves, shared by all the sessions of a worker and, through Redis, by all the workers.
+
+Many games reach the same positions, so a move the AI searched for one of them is played again in
+all the others without searching. The best move only depends on the stones in the small pits and on
+the side to move: the big pits add the same amount to every score of the search, so they can't change
+which move is best. Positions are stored from the side of the player to move, with the other player's
+pits turned around, so a position reached by either player has one key. The key also holds the
+strength of the search, as moves found with a smaller time budget or depth are not as good.
+"""
+import os
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from typing import NamedTuple, Optional
+
+import redis
+
+from engine import Position, PIT_OFFSET, NUMBER_OF_PITS
+from metrics import REDIS_SECONDS, REDIS_ERRORS
+
+logging.basicConfig(level=os.environ.get("LOGLEVEL", "WARNING"))
+
+# Number of positions a worker keeps in memory
+MOVE_CACHE_SIZE = int(os.environ.get("MOVE_CACHE_SIZE", "100000"))
+# Searches that did not reach this depth, for instance on an overloaded server, are not cached
+MIN_CACHED_DEPTH = 4
+REDIS_PREFIX = "mancala:move:"
+REDIS_EXPIRATION = timedelta(days=30)
+
+
+class CachedMove(NamedTuple):
+    pit: int
+    depth: int
+
+
+def position_key(position: Position, player: int, strength: str) -> str:
+    """
+    The key of the position for the player to move, see the module's documentation.
+    :param strength: The kind of player and its search limits
+    """
+    opponent = 1 - player
+    cells = position.cells
+    pits = cells[PIT_OFFSET[player]:PIT_OFFSET[player] + NUMBER_OF_PITS] + \
+        cells[PIT_OFFSET[opponent]:PIT_OFFSET[opponent] + NUMBER_OF_PITS]
+    return f"{strength}:{bytes(pits).hex()}"
+
+
+class RedisMoveStore:
+    """
+    The moves of all the workers, in Redis. It is used from the AI's threads, so it has its own,
+    blocking, client. A Redis that is down only makes the AI search more.
+    """
+
+    def __init__(self, client: redis.Redis, expiration: timedelta = REDIS_EXPIRATION):
+        self.client = client
+        self.expiration = expiration
+
+    def get(self, key: str) -> Optional[CachedMove]:
+        try:
+            with REDIS_SECONDS.time(command="get_move"):
+                data = self.client.get(REDIS_PREFIX + key)
+        except redis.RedisError:
+            REDIS_ERRORS.inc(command="get_move")
+            logging.warning("Could not read a cached move", exc_info=True)
+            return None
+        return CachedMove(data[0], data[1]) if data else None
+
+    def set(self, key: str, move: CachedMove):
+        try:
+            with REDIS_SECONDS.time(command="set_move"):
+                self.client.setex(REDIS_PREFIX + key, self.expiration, bytes(move))
+        except redis.RedisError:
+            REDIS_ERRORS.inc(command="set_move")
+            logging.warning("Could not store a cached move", exc_info=True)
+
+
+class MoveCache:
+    """
+    The best moves of the most recently searched positions, in front of an optional shared store.
+    Used from the AI's threads, so it is locked.
+    """
+
+    def __init__(self, capacity: int = MOVE_CACHE_SIZE, store: Optional[RedisMoveStore] = None):
+        self.capacity = capacity
+        self.store = store
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.local_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def lookup(self, key: str) -> Optional[CachedMove]:
+        with self.lock:
+            move = self.entries.get(key)
+            if move is not None:
+                self.entries.move_to_end(key)
+                self.local_hits += 1
+                return move
+        move = self.store.get(key) if self.store is not None else None
+        with self.lock:
+            if move is None:
+                self.misses += 1
+                return None
+            self.store_hits += 1
+            self._put(key, move)
+        return move
+
+    def store_move(self, key: str, move: CachedMove):
+        """
+        Keeps the move, unless the search that found it was too shallow or a deeper one is kept already.
+        """
+        if move.depth < MIN_CACHED_DEPTH:
+            return
+        with self.lock:
+            kept = self.entries.get(key)
+            if kept is not None and kept.depth >= move.depth:
+                return
+            self._put(key, move)
+        if self.store is not None:
+            self.store.set(key, move)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.local_hits + self.store_hits + self.misses
+            return {
+                "size": len(self.entries),
+                "local_hits": self.local_hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "hit_rate": (self.local_hits + self.store_hits) / lookups if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _put(self, key: str, move: CachedMove):
+        self.entries[key] = move
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
@@ -0,0 +1,131 @@
+"""
+Opening book: the AI's replies for the first turns of a game from the standard starting position.
+
+Every game starts from the same position, so the AI's first replies are searched once, offline and
+much deeper than there is time for during a game. The book follows every move of the opponent and
+the book's own reply for the player it was built for. Each entry is the Zobrist key of the position
+with the player to move and the pit to play, 9 bytes, sorted by key.
+
+Rebuild it after changing the engine's hashing with:
+    python opening_book.py --turns 2 --time 2 --output opening_book.bin
+"""
+import os
+import struct
+import logging
+import argparse
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+import board
+from engine import Position, SIDE_TO_MOVE, NR_PLAYERS
+
+logging.basicConfig(level=os.environ.get("LOGLEVEL", "WARNING"))
+
+MAGIC = b"MNCLBOOK"
+VERSION = 1
+# The key of the side to move is stored in the header, a book built with other Zobrist keys is ignored
+HEADER = struct.Struct("<8sBQ")
+RECORD = struct.Struct("<QB")
+DEFAULT_PATH = os.environ.get("OPENING_BOOK_PATH", str(Path(__file__).parent / "opening_book.bin"))
+
+
+class OpeningBook:
+    """
+    The book moves, by position key.
+    """
+
+    def __init__(self, moves: Dict[int, int]):
+        self.moves = moves
+
+    @classmethod
+    def load(cls, path: str) -> Optional["OpeningBook"]:
+        with open(path, "rb") as book_file:
+            data = book_file.read()
+        if len(data) < HEADER.size:
+            logging.warning(f"Ignoring the opening book {path}, it is truncated")
+            return None
+        magic, version, fingerprint = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION or fingerprint != SIDE_TO_MOVE[0]:
+            logging.warning(f"Ignoring the opening book {path}, it was built for another engine version")
+            return None
+        return cls(dict(RECORD.iter_unpack(data[HEADER.size:])))
+
+    def save(self, path: str):
+        with open(path, "wb") as book_file:
+            book_file.write(HEADER.pack(MAGIC, VERSION, SIDE_TO_MOVE[0]))
+            for key in sorted(self.moves):
+                book_file.write(RECORD.pack(key, self.moves[key]))
+
+    def lookup(self, position: Position, player: int) -> Optional[int]:
+        """
+        The book move of the player to move, or None if the position is not in the book.
+        """
+        return self.moves.get(position.key(player))
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+
+@lru_cache(maxsize=None)
+def default_book() -> Optional[OpeningBook]:
+    """
+    The book at OPENING_BOOK_PATH, or None if there is none.
+    """
+    if not os.path.exists(DEFAULT_PATH):
+        logging.info(f"No opening book at {DEFAULT_PATH}")
+        return None
+    return OpeningBook.load(DEFAULT_PATH)
+
+
+def build(turns: int, time_budget: float) -> OpeningBook:
+    """
+    Searches the book player's reply in every position reachable from the start in which
+    they have had fewer than the given number of turns, for both players.
+    """
+    from minimax_player import MiniMaxPlayer
+
+    moves = {}
+    for book_player in range(NR_PLAYERS):
+        search_board = board.Board(nr_players=2)
+        searcher = MiniMaxPlayer(book_player, search_board, time_budget=time_budget, book=OpeningBook({}))
+
+        def visit(position: Position, player: int, turns_played: int):
+            if position.is_terminal() or turns_played == turns:
+                return
+            if player == book_player:
+                key = position.key(player)
+                if key not in moves:
+                    search_board.position.set_cells(position.cells)
+                    moves[key] = searcher.best_move()
+                    logging.info(f"Book move for player {player} is {moves[key]}, "
+                                 f"depth {searcher.depth_reached}, {position}")
+                replies = [moves[key]]
+            else:
+                replies = position.valid_moves(player)
+            for pit in replies:
+                if position.apply(player, pit):
+                    visit(position, player, turns_played)
+                elif player == book_player:
+                    visit(position, 1 - player, turns_played + 1)
+                else:
+                    visit(position, 1 - player, turns_played)
+                position.undo()
+
+        visit(Position(), 0, 0)
+    return OpeningBook(moves)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Mancala opening book")
+    parser.add_argument("--turns", type=int, default=2, help="Number of turns of the book player to cover")
+    parser.add_argument("--time", type=float, default=2, help="Search time per position, in seconds")
+    parser.add_argument("--output", default=DEFAULT_PATH, help="Where to write the book")
+    args = parser.parse_args()
+    book = build(args.turns, args.time)
+    book.save(args.output)
+    print(f"Wrote {len(book)} positions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import List, Optional, Tuple
+
+import board
+from engine import Position
+from minimax_player import MiniMaxPlayer, SearchTimeout
+
+logging.basicConfig(level=os.environ.get("LOGLEVEL", "WARNING"))
+
+# Number of search processes, 0 or 1 searches in the request's own thread
+AI_WORKERS = int(os.environ.get("AI_WORKERS", "0"))
+
+# The searchers of a worker process, by player index. Their transposition tables live
+# as long as the worker, so every search the worker runs reuses the earlier ones, of any session.
+# The sessions' own tables are not sent to the workers, copying them for every root move would
+# cost more than the searches they save.
+_searchers = {}
+
+
+def _searcher(player: int) -> MiniMaxPlayer:
+    if player not in _searchers:
+        _searchers[player] = MiniMaxPlayer(player, board.Board(nr_players=2))
+    return _searchers[player]
+
+
+def _warm_up(_) -> int:
+    _searcher(0)
+    return os.getpid()
+
+
+def search_move(cells: List[int], player: int, pit: int, depth: int, deadline: float) \
+        -> Optional[Tuple[int, int, bool, int, int, int]]:
+    """
+    Runs in a worker process: scores one root move to the given depth.
+    :param deadline: When the search must be over, on the time.monotonic() clock, which is the same in all processes.
+    :return: The score, the number of nodes searched, whether the depth cut the search short, the number
+    of alpha-beta cutoffs and the hits and misses of the transposition table, or None if the time ran out first.
+    """
+    searcher = _searcher(player)
+    # The table is created by the worker's first search
+    hits, misses = (searcher.table.hits, searcher.table.misses) if searcher.table is not None else (0, 0)
+    try:
+        value, depth_cut = searcher.score_move(Position(cells), pit, depth, deadline - time.monotonic())
+    except SearchTimeout:
+        return None
+    table = searcher.table
+    return value, searcher.nodes, depth_cut, searcher.cutoffs, table.hits - hits, table.misses - misses
+
+
+class SearchPool:
+    """
+    A pool of worker processes that search the root moves of the AI in parallel.
+    Each iteration of the iterative deepening gives every root move to a worker, and
+    the next iteration starts when all of them finished. The pool is meant to live as
+    long as the app, see start() and shutdown().
+    The workers keep the transposition tables, see _searchers, and the pool counts their lookups.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.executor = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        # Spawned workers don't inherit the server's threads and sockets
+        self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        pids = set(self.executor.map(_warm_up, range(self.workers)))
+        logging.info(f"Started {len(pids)} search workers")
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def best_move(self, position: Position, player: int, moves: List[int], time_budget: float,
+                  max_depth: int) -> Tuple[int, int, int, int]:
+        """
+        Iteratively deepened search of the root moves, spread over the workers.
+        :return: The best move of the deepest iteration that finished, that depth and the numbers of nodes
+        searched and of cutoffs.
+        """
+        deadline = time.monotonic() + time_budget
+        best_move = moves[0]
+        depth_reached = 0
+        nodes = 0
+        cutoffs = 0
+        for depth in range(1, max_depth + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            futures = {pit: self.executor.submit(search_move, position.cells, player, pit, depth, deadline)
+                       for pit in moves}
+            done, not_done = wait(futures.values(), timeout=remaining)
+            results = {pit: future.result() for pit, future in futures.items() if future in done}
+            if not_done or None in results.values():
+                for future in not_done:
+                    future.cancel()
+                logging.info("Out of time at depth %s", depth)
+                break
+            nodes += sum(result[1] for result in results.values())
+            cutoffs += sum(result[3] for result in results.values())
+            with self.lock:
+                self.hits += sum(result[4] for result in results.values())
+                self.misses += sum(result[5] for result in results.values())
+            moves.sort(key=lambda pit: results[pit][0], reverse=True)
+            best_move = moves[0]
+            depth_reached = depth
+            logging.info("Best move at depth %s is %s with value %s", depth, best_move, results[best_move][0])
+            if not any(result[2] for result in results.values()):
+                # The whole game tree was searched, going deeper won't change anything
+                break
+        return best_move, depth_reached, nodes, cutoffs
+
+    def stats(self) -> dict:
+        """
+        The lookups of the workers' transposition tables in the iterations that finished, like SessionTables.stats().
+        """
+        with self.lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+
+def create_pool(workers: int = AI_WORKERS) -> Optional[SearchPool]:
+    """
+    Creates and starts the search pool, or returns None if the AI should search in process.
+    """
+    if workers <= 1:
+        return None
+    pool = SearchPool(workers)
+    pool.start()
+    return pool
@@ -0,0 +1,150 @@
+"""
+Pondering: the AI searches its replies to the human's possible moves while the human is thinking.
+
+After a state is sent and the human is to move, the AI's reply to each of the human's moves is searched
+in the background, with the same limits as the real search. The moves found go to the move cache and the
+searched positions to the session's transposition table, so when the human's move arrives the AI's reply
+is usually found without searching. Pondering is cancelled as soon as the session's next move arrives,
+and stops when the AI's search scheduler has no slot to spare for it.
+"""
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from board import Board
+from engine import Position
+from minimax_player import MiniMaxPlayer
+
+logging.basicConfig(level=os.environ.get("LOGLEVEL", "WARNING"))
+
+# Set AI_PONDER=1 to ponder
+PONDER = os.environ.get("AI_PONDER", "0") == "1"
+# Threads pondering for all the sessions of a worker
+PONDER_THREADS = int(os.environ.get("AI_PONDER_THREADS", "1"))
+
+
+class PonderSearcher(MiniMaxPlayer):
+    """
+    The searcher of a pondering job. A search it starts after the job was cancelled gets no time,
+    so it cannot undo the cancel and keep a slot the real move needs.
+    """
+
+    def __init__(self, ai: MiniMaxPlayer, cancelled: threading.Event):
+        super().__init__(ai.index, Board(nr_players=2), time_budget=ai.time_budget, max_depth=ai.max_depth,
+                         table=ai.table, endgame=ai.endgame, book=ai.book, move_cache=ai.move_cache)
+        self.cancelled = cancelled
+        # Held while the clock is set, so a cancel is never overwritten by the start of a search
+        self.clock_lock = threading.Lock()
+        self.ai_strength = ai.strength()
+
+    def start_search(self, time_budget: float):
+        with self.clock_lock:
+            super().start_search(0.0 if self.cancelled.is_set() else time_budget)
+
+    def stop(self):
+        with self.clock_lock:
+            super().stop()
+
+    def strength(self) -> str:
+        # The moves found are the AI's, cached with its limits
+        return self.ai_strength
+
+
+class PonderJob:
+    """
+    Searches the AI's reply to every move of the human, for one position of one session.
+    """
+
+    def __init__(self, cells: list, human: int, ai: MiniMaxPlayer):
+        self.cells = cells
+        self.human = human
+        self.cancelled = threading.Event()
+        # A searcher of its own, sharing the session's caches but not its board
+        self.searcher = PonderSearcher(ai, self.cancelled)
+        self.scheduler = ai.scheduler
+        self.pondered = 0
+
+    def run(self):
+        position = Position(self.cells)
+        for pit in position.ordered_moves(self.human):
+            if self.cancelled.is_set():
+                return
+            # After an extra turn or at the end of the game the AI has no reply to search yet
+            if not position.apply(self.human, pit) and not position.is_terminal():
+                self.searcher.board.position.set_cells(position.cells)
+                if not self._search():
+                    logging.info("No search slot to ponder")
+                    return
+                self.pondered += 1
+            position.undo()
+        logging.info(f"Pondered {self.pondered} replies")
+
+    def _search(self) -> bool:
+        if self.scheduler is None:
+            self.searcher.best_move()
+            return True
+        with self.scheduler.admit(self.searcher.time_budget, background=True) as time_budget:
+            if time_budget is None:
+                return False
+            self.searcher.best_move()
+            return True
+
+    def cancel(self):
+        self.cancelled.set()
+        self.searcher.stop()
+
+
+class Ponderer:
+    """
+    The pondering of a worker's sessions, at most one job per session.
+    """
+
+    def __init__(self, threads: int = PONDER_THREADS):
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="ai-ponder")
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def ponder(self, sessionid: str, session_state: dict):
+        """
+        Starts pondering for the session if the human is to move against a minimax AI.
+        """
+        if session_state['winner'] is not None or session_state['board'].game_over():
+            return
+        players = session_state['players']
+        human = int(session_state['turn']) % 2
+        ai = players[1 - human]
+        if not isinstance(ai, MiniMaxPlayer) or isinstance(players[human], MiniMaxPlayer):
+            return
+        job = PonderJob(session_state['board'].position.cells[:], human, ai)
+        with self.lock:
+            previous = self.jobs.get(sessionid)
+            self.jobs[sessionid] = job
+        if previous is not None:
+            previous.cancel()
+        future = self.executor.submit(job.run)
+        future.add_done_callback(lambda _: self._done(sessionid, job))
+
+    def cancel(self, sessionid: str):
+        """
+        Stops the session's pondering, what it found so far stays in the caches.
+        """
+        with self.lock:
+            job = self.jobs.pop(sessionid, None)
+        if job is not None:
+            job.cancel()
+
+    def shutdown(self):
+        with self.lock:
+            jobs, self.jobs = list(self.jobs.values()), {}
+        for job in jobs:
+            job.cancel()
+        self.executor.shutdown(cancel_futures=True)
+
+    def __len__(self) -> int:
+        return len(self.jobs)
+
+    def _done(self, sessionid: str, job: PonderJob):
+        with self.lock:
+            if self.jobs.get(sessionid) is job:
+                del self.jobs[sessionid]
@@ -0,0 +1,114 @@
+"""
+Admission control for the AI's searches, so that a busy server plays weaker moves instead of slower ones.
+
+The scheduler runs at most AI_SEARCH_SLOTS searches at once. A search that finds them all taken waits in
+a queue of at most AI_SEARCH_QUEUE searches, and the time it waited is taken from its time budget. When
+there are more searches than slots, each one also gets a share of its budget, slots / searches. A search
+left with less than MIN_SEARCH_TIME, or one that finds the queue full, is not run at all: the AI plays a
+quick one move look-ahead instead. Pondering only runs on slots nobody is waiting for.
+"""
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+logging.basicConfig(level=os.environ.get("LOGLEVEL", "WARNING"))
+
+# Searches running at once, one per core by default
+AI_SEARCH_SLOTS = int(os.environ.get("AI_SEARCH_SLOTS", str(os.cpu_count() or 1)))
+# Searches waiting for a slot, the searches beyond it play the quick move
+AI_SEARCH_QUEUE = int(os.environ.get("AI_SEARCH_QUEUE", str(4 * AI_SEARCH_SLOTS)))
+# Less time than this is not worth a search, in seconds
+MIN_SEARCH_TIME = 0.005
+
+
+class SearchScheduler:
+    """
+    Counts the running and waiting searches, and the times the searches were cut down:
+    degraded searches ran with less than their time budget, fallbacks and rejected searches
+    didn't run, the first ones for lack of time and the others because the queue was full.
+    """
+
+    def __init__(self, slots: int = AI_SEARCH_SLOTS, max_queue: int = AI_SEARCH_QUEUE):
+        self.slots = slots
+        self.max_queue = max_queue
+        self.condition = threading.Condition()
+        self.running = 0
+        self.waiting = 0
+        self.searches = 0
+        self.degraded = 0
+        self.fallbacks = 0
+        self.rejected = 0
+        self.background_skipped = 0
+
+    @contextmanager
+    def admit(self, time_budget: float, background: bool = False):
+        """
+        Holds a slot for the search run inside the block.
+        Yields the time the search may take, or None if it must not search.
+        :param background: Pondering, which never waits and only runs if no search is waiting
+        """
+        granted = self._acquire(time_budget, background)
+        try:
+            yield granted
+        finally:
+            if granted is not None:
+                with self.condition:
+                    self.running -= 1
+                    self.condition.notify()
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {
+                "slots": self.slots,
+                "running": self.running,
+                "waiting": self.waiting,
+                "searches": self.searches,
+                "degraded": self.degraded,
+                "fallbacks": self.fallbacks,
+                "rejected": self.rejected,
+                "background_skipped": self.background_skipped,
+            }
+
+    def _acquire(self, time_budget: float, background: bool) -> Optional[float]:
+        with self.condition:
+            if background:
+                if self.running >= self.slots or self.waiting:
+                    self.background_skipped += 1
+                    return None
+                self.running += 1
+                return time_budget
+            waited = 0.0
+            if self.running >= self.slots:
+                if self.waiting >= self.max_queue:
+                    self.rejected += 1
+                    logging.info("Search queue full, playing the quick move")
+                    return None
+                start = time.monotonic()
+                self.waiting += 1
+                try:
+                    while self.running >= self.slots:
+                        remaining = start + time_budget - time.monotonic()
+                        if remaining <= 0:
+                            self.fallbacks += 1
+                            return None
+                        self.condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+                waited = time.monotonic() - start
+            granted = time_budget - waited
+            searches = self.running + 1 + self.waiting
+            if searches > self.slots:
+                granted *= self.slots / searches
+            if granted < MIN_SEARCH_TIME:
+                self.fallbacks += 1
+                # Let the next waiting search have the slot this one doesn't take
+                self.condition.notify()
+                return None
+            if granted < time_budget:
+                self.degraded += 1
+            self.running += 1
+            self.searches += 1
+            return granted
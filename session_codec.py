@@ -0,0 +1,133 @@
+"""
+Binary encoding of the game sessions stored in Redis.
+
+A session is stored as a version byte followed by the 14 cells of the board, the turn, the winner,
+the difficulty and the kind of each player, 23 bytes in all. The player objects are created again
+when a session is loaded. Sessions stored by older versions as a pickle of the whole session
+dictionary are still read, so they keep working until they expire.
+"""
+import io
+import pickle
+import struct
+
+from board import Board, NO_WINNER
+from engine import NR_CELLS
+from human_player import HumanPlayer
+from random_player import RandomPlayer
+from minimax_player import MiniMaxPlayer
+from mcts_player import MctsPlayer
+
+VERSION = 1
+# version, cells, turn, winner (-1 for none), difficulty, player kinds
+SESSION = struct.Struct(f"<B{NR_CELLS}BIbB2B")
+NO_WINNER_CODE = -1
+PICKLE_PROTOCOL_MARKER = 0x80
+
+PLAYER_KINDS = {
+    0: HumanPlayer,
+    1: RandomPlayer,
+    2: MiniMaxPlayer,
+    3: MctsPlayer,
+}
+KIND_OF_PLAYER = {player_class: kind for kind, player_class in PLAYER_KINDS.items()}
+
+
+def encode(session_state: dict) -> bytes:
+    """
+    Encodes the contents of a session, everything but its id.
+    """
+    players = session_state['players']
+    winner = session_state['winner']
+    return SESSION.pack(
+        VERSION,
+        *session_state['board'].position.cells,
+        int(session_state['turn']),
+        NO_WINNER_CODE if winner is NO_WINNER else int(winner),
+        int(session_state['difficulty']),
+        *(KIND_OF_PLAYER[type(players[index])] for index in range(len(players))),
+    )
+
+
+def decode(data: bytes, sessionid: str) -> dict:
+    """
+    Decodes a session stored by encode(), or by the older versions that pickled it.
+    """
+    if data[0] == PICKLE_PROTOCOL_MARKER:
+        return _decode_legacy(data, sessionid)
+    version = data[0]
+    if version != VERSION:
+        raise ValueError(f"Unsupported session version {version}")
+    fields = SESSION.unpack(data)
+    cells = fields[1:1 + NR_CELLS]
+    turn, winner, difficulty, *kinds = fields[1 + NR_CELLS:]
+    return new_session_state(sessionid, list(cells), turn, None if winner == NO_WINNER_CODE else winner,
+                             difficulty, [PLAYER_KINDS[kind] for kind in kinds])
+
+
+def new_session_state(sessionid: str, cells: list, turn: int, winner, difficulty: int, player_classes: list) -> dict:
+    """
+    Creates the session dictionary, with a new board and new players on it.
+    """
+    board = Board(nr_players=len(player_classes))
+    board.position.set_cells(cells)
+    return {
+        "session_id": sessionid,
+        "difficulty": difficulty,
+        "turn": turn,
+        "winner": winner,
+        "board": board,
+        "players": {index: player_class(index, board) for index, player_class in enumerate(player_classes)},
+    }
+
+
+class _PickledObject:
+    """
+    Stands in for the classes of a legacy pickled session and keeps their raw state.
+    """
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            # Classes with __slots__ pickle a (dict, slots dict) pair
+            state = {**(state[0] or {}), **state[1]}
+        self.state = state
+
+
+_LEGACY_CLASSES = {
+    ("board", "Board"),
+    ("board", "PlayerData"),
+    ("engine", "Position"),
+    ("human_player", "HumanPlayer"),
+    ("random_player", "RandomPlayer"),
+    ("minimax_player", "MiniMaxPlayer"),
+}
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    """
+    Only loads the classes a session used to hold, as plain stand-ins that remember their name.
+    """
+
+    def find_class(self, module, name):
+        if (module, name) not in _LEGACY_CLASSES:
+            raise pickle.UnpicklingError(f"Unexpected {module}.{name} in a pickled session")
+        return type(name, (_PickledObject,), {})
+
+
+def _legacy_cells(board) -> list:
+    state = board.state
+    if "position" in state:
+        position_state = state["position"].state
+        return list(position_state if isinstance(position_state, list) else position_state["cells"])
+    cells = []
+    for player_data in state["players_data"]:
+        cells += player_data.state["pits"] + [player_data.state["big_pit"]]
+    return cells
+
+
+def _decode_legacy(data: bytes, sessionid: str) -> dict:
+    session_state = _LegacyUnpickler(io.BytesIO(data)).load()
+    players = session_state["players"]
+    player_classes = [PLAYER_KINDS[kind] for index in sorted(players) for kind, player_class in PLAYER_KINDS.items()
+                      if player_class.__name__ == type(players[index]).__name__]
+    return new_session_state(sessionid, _legacy_cells(session_state["board"]), int(session_state["turn"]),
+                             session_state["winner"], int(session_state["difficulty"]), player_classes)
@@ -0,0 +1,314 @@
+"""
+Where the game sessions are stored between requests.
+
+The sessions are kept in a SessionCache in the memory of each worker, in front of a store that
+persists them, Redis or the memory of the process. The cache writes its changes to the store in
+batches, a while after the requests that made them, so most turns make no round trip at all.
+Every batch also tells the other caches of the same store which sessions changed, and they drop
+their copies of them. Between two batches the other workers can still read an older state of a
+session, so several workers need a load balancer that sends all requests of a session to the
+same worker, by hashing the sessionid. Without one, set SESSION_FLUSH_INTERVAL to 0 to write
+every change through right away.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import suppress
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, Optional
+from uuid import uuid4
+
+import redis
+import redis.asyncio
+
+import session_codec
+from metrics import REDIS_SECONDS, REDIS_ERRORS, SESSION_BYTES, SESSION_CODEC_SECONDS
+
+logging.basicConfig(level=os.environ.get("LOGLEVEL", "WARNING"))
+
+# Number of sessions a worker keeps in memory
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", "10000"))
+# Seconds between the writes of the changed sessions to the store, 0 writes every change right away
+SESSION_FLUSH_INTERVAL = float(os.environ.get("SESSION_FLUSH_INTERVAL", "1"))
+INVALIDATION_CHANNEL = "mancala:sessions:changed"
+# How long the subscriber waits for a message before checking whether it should stop, in seconds
+SUBSCRIBER_POLL_INTERVAL = 1.0
+
+
+class RedisSessionStore:
+    """
+    Stores the encoded sessions in Redis, they expire when they are not played for a while.
+    """
+
+    def __init__(self, client: redis.asyncio.Redis, expiration: timedelta):
+        self.client = client
+        self.expiration = expiration
+        self.subscriber = None
+
+    async def ping(self) -> bool:
+        return await self.client.ping()
+
+    async def get(self, sessionid: str) -> Optional[bytes]:
+        """
+        Reads a session and restarts its expiration, in one round trip.
+        """
+        try:
+            with REDIS_SECONDS.time(command="getex"):
+                return await self.client.getex(sessionid, ex=self.expiration)
+        except redis.RedisError:
+            REDIS_ERRORS.inc(command="getex")
+            raise
+
+    async def set_many(self, sessions: Dict[str, bytes], sender: str):
+        """
+        Stores the sessions and announces them to the other caches, in one round trip.
+        """
+        async with self.client.pipeline(transaction=False) as pipeline:
+            for sessionid, data in sessions.items():
+                pipeline.setex(sessionid, self.expiration, data)
+            # As JSON, session ids come from the clients and can hold any character
+            pipeline.publish(INVALIDATION_CHANNEL, json.dumps([sender, *sessions]))
+            with REDIS_SECONDS.time(command="setex_batch"):
+                await pipeline.execute()
+
+    async def touch_many(self, sessionids: Iterable[str]):
+        """
+        Restarts the expiration of the sessions, in one round trip.
+        """
+        async with self.client.pipeline(transaction=False) as pipeline:
+            for sessionid in sessionids:
+                pipeline.expire(sessionid, self.expiration)
+            with REDIS_SECONDS.time(command="expire_batch"):
+                await pipeline.execute()
+
+    async def subscribe(self, callback: Callable[[str, Iterable[str]], None]):
+        """
+        Calls back with the sender and the sessionids of every batch stored by any cache.
+        """
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(INVALIDATION_CHANNEL)
+        self.subscriber = asyncio.create_task(self._listen(pubsub, callback))
+
+    async def unsubscribe(self, callback: Callable[[str, Iterable[str]], None]):
+        if self.subscriber is not None:
+            self.subscriber.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.subscriber
+            self.subscriber = None
+
+    async def close(self):
+        await self.client.aclose()
+
+    @staticmethod
+    async def _listen(pubsub, callback: Callable[[str, Iterable[str]], None]):
+        try:
+            while True:
+                try:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True,
+                                                       timeout=SUBSCRIBER_POLL_INTERVAL)
+                except redis.RedisError:
+                    logging.exception("Lost the session invalidations, reconnecting")
+                    await asyncio.sleep(SUBSCRIBER_POLL_INTERVAL)
+                    continue
+                if message is not None:
+                    sender, *sessionids = json.loads(message["data"])
+                    callback(sender, sessionids)
+        finally:
+            await pubsub.aclose()
+
+
+class MemorySessionStore:
+    """
+    Stores the encoded sessions in the memory of the process, for tests and local games without Redis.
+    """
+
+    def __init__(self, expiration: timedelta):
+        self.expiration = expiration
+        self.sessions = {}
+        self.subscribers = []
+
+    async def ping(self) -> bool:
+        return True
+
+    async def get(self, sessionid: str) -> Optional[bytes]:
+        data, expires = self.sessions.get(sessionid, (None, 0))
+        if expires < time.monotonic():
+            return None
+        self.sessions[sessionid] = (data, time.monotonic() + self.expiration.total_seconds())
+        return data
+
+    async def set_many(self, sessions: Dict[str, bytes], sender: str):
+        expires = time.monotonic() + self.expiration.total_seconds()
+        for sessionid, data in sessions.items():
+            self.sessions[sessionid] = (data, expires)
+        for callback in list(self.subscribers):
+            callback(sender, list(sessions))
+
+    async def touch_many(self, sessionids: Iterable[str]):
+        expires = time.monotonic() + self.expiration.total_seconds()
+        for sessionid in sessionids:
+            data, old_expires = self.sessions.get(sessionid, (None, 0))
+            if old_expires >= time.monotonic():
+                self.sessions[sessionid] = (data, expires)
+
+    async def subscribe(self, callback: Callable[[str, Iterable[str]], None]):
+        self.subscribers.append(callback)
+
+    async def unsubscribe(self, callback: Callable[[str, Iterable[str]], None]):
+        self.subscribers.remove(callback)
+
+    async def close(self):
+        pass
+
+
+class SessionCache:
+    """
+    The most recently played sessions of this worker, in front of the store that persists them.
+    Sessions are kept encoded, every request decodes its own copy of the state.
+    It is only used from the event loop, so its methods don't need a lock between their awaits.
+    """
+
+    def __init__(self, store, expiration: timedelta, capacity: int = SESSION_CACHE_SIZE,
+                 flush_interval: float = SESSION_FLUSH_INTERVAL):
+        self.store = store
+        self.expiration = expiration.total_seconds()
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        # Tells this cache's own batches apart from those of the other workers
+        self.name = uuid4().hex
+        self.entries = OrderedDict()
+        # The changes not written to the store yet, they are kept here even if evicted from the entries
+        self.dirty: Dict[str, bytes] = {}
+        # The sessions read from the cache since the last batch, whose expiration the store restarts with it
+        self.touched = set()
+        self.flusher = None
+        self.hits = 0
+        self.misses = 0
+
+    async def ping(self) -> bool:
+        return await self.store.ping()
+
+    async def start(self):
+        """
+        Starts listening to the other workers' changes and, for write-behind, the task writing the changes.
+        """
+        await self.store.subscribe(self._on_stored)
+        if self.flush_interval > 0:
+            self.flusher = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        """
+        Stops the tasks and writes the remaining changes.
+        """
+        if self.flusher is not None:
+            self.flusher.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.flusher
+            self.flusher = None
+        await self.store.unsubscribe(self._on_stored)
+        await self.flush()
+
+    async def load(self, sessionid: str) -> dict:
+        """
+        Loads a session.
+        :return: The session state, or an empty dictionary if there is no such session.
+        """
+        data = self._cached(sessionid)
+        if self.flush_interval <= 0 and self.touched:
+            await self._touch()
+        if data is None:
+            data = await self.store.get(sessionid)
+            newer = self.entries.get(sessionid)
+            if newer is not None:
+                # Saved while the store was being read
+                data = newer[0]
+            elif not data:
+                return {}
+            else:
+                self._put(sessionid, data)
+        with SESSION_CODEC_SECONDS.time(operation="decode"):
+            return session_codec.decode(data, sessionid)
+
+    async def save(self, session_state: dict):
+        sessionid = session_state['session_id']
+        with SESSION_CODEC_SECONDS.time(operation="encode"):
+            data = session_codec.encode(session_state)
+        SESSION_BYTES.observe(len(data))
+        self._put(sessionid, data)
+        if self.flush_interval > 0:
+            self.dirty[sessionid] = data
+        else:
+            await self.store.set_many({sessionid: data}, self.name)
+
+    async def flush(self):
+        """
+        Writes all the changed sessions to the store, in one batch.
+        """
+        dirty, self.dirty = self.dirty, {}
+        # Storing a session restarts its expiration anyway
+        self.touched.difference_update(dirty)
+        await self._touch()
+        if dirty:
+            try:
+                await self.store.set_many(dirty, self.name)
+            except redis.RedisError:
+                REDIS_ERRORS.inc(command="setex_batch")
+                logging.exception(f"Could not write {len(dirty)} sessions, retrying with the next batch")
+                self.dirty = {**dirty, **self.dirty}
+            except asyncio.CancelledError:
+                # Stopped while writing, stop() writes them again
+                self.dirty = {**dirty, **self.dirty}
+                raise
+
+    async def _touch(self):
+        """
+        Restarts the expiration of the sessions read from the cache, like GETEX does for those read from the store.
+        """
+        touched, self.touched = self.touched, set()
+        if touched:
+            try:
+                await self.store.touch_many(touched)
+            except redis.RedisError:
+                REDIS_ERRORS.inc(command="expire_batch")
+                logging.exception(f"Could not restart the expiration of {len(touched)} sessions")
+
+    def invalidate(self, sessionids: Iterable[str]):
+        """
+        Drops the sessions from the cache, the next load reads them from the store.
+        """
+        for sessionid in sessionids:
+            if sessionid not in self.dirty:
+                self.entries.pop(sessionid, None)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _cached(self, sessionid: str) -> Optional[bytes]:
+        entry = self.entries.get(sessionid)
+        if entry is not None and entry[1] >= time.monotonic():
+            # A session in use does not expire, here or in the store
+            self._put(sessionid, entry[0])
+            self.touched.add(sessionid)
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        # Evicted before it was written
+        return self.dirty.get(sessionid)
+
+    def _put(self, sessionid: str, data: bytes):
+        self.entries[sessionid] = (data, time.monotonic() + self.expiration)
+        self.entries.move_to_end(sessionid)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def _on_stored(self, sender: str, sessionids: Iterable[str]):
+        if sender != self.name:
+            self.invalidate(sessionids)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
@@ -0,0 +1,234 @@
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+os.environ["SESSION_BACKEND"] = "memory"
+
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import main
+from engine import Position, TOTAL_STONES, BIG_PIT
+
+
+def cells_of(response: dict) -> list:
+    cells = []
+    for player in ("0", "1"):
+        cells += response["players"][player]["pits"] + [response["players"][player]["big_pit"]]
+    return cells
+
+
+def successors(cells: list, player: int) -> list:
+    """
+    The boards after each valid move of the player.
+    """
+    position = Position(cells)
+    boards = []
+    for pit in position.valid_moves(player):
+        position.apply(player, pit)
+        boards.append(position.cells[:])
+        position.undo()
+    return boards
+
+
+class TestApi:
+
+    @pytest.fixture(scope='class')
+    def client(self):
+        with TestClient(main.app) as client:
+            yield client
+
+    def test_api_new_session(self, client):
+        response = client.get("/api/").json()
+        assert response["session_id"]
+        assert response["turn"] == "0"
+        assert response["winner"] is None
+        assert cells_of(response) == Position().cells
+
+    def test_api_continue_session(self, client):
+        sessionid = client.get("/api/").json()["session_id"]
+        client.get("/api/select", params={"userid": 0, "pit": 5, "sessionid": sessionid})
+        response = client.get("/api/", params={"sessionid": sessionid}).json()
+        assert response["session_id"] == sessionid
+        assert response["turn"] == "1"
+        assert response["players"]["0"]["pits"] == [6, 6, 6, 6, 6, 0]
+
+    def test_api_unknown_session(self, client):
+        response = client.get("/api/select", params={"userid": 0, "pit": 0, "sessionid": "unknown"})
+        assert response.status_code == 404
+
+    def test_api_reset_leaves_other_sessions(self, client):
+        first = client.get("/api/").json()["session_id"]
+        second = client.get("/api/").json()["session_id"]
+        client.get("/api/select", params={"userid": 0, "pit": 5, "sessionid": first})
+        client.get("/api/reset", params={"sessionid": second, "difficulty": 1})
+        response = client.get("/api/", params={"sessionid": first}).json()
+        assert response["difficulty"] == "0"
+        assert response["players"]["0"]["pits"] == [6, 6, 6, 6, 6, 0]
+
+    def test_api_concurrent_sessions(self, client):
+        """
+        Many games at once, each one must only ever see its own session's moves.
+        """
+        def play(seed: int):
+            rng = random.Random(seed)
+            sessionid = f"stress-{seed}"
+            response = client.get("/api/reset", params={"sessionid": sessionid, "difficulty": 0}).json()
+            cells = cells_of(response)
+            assert cells == Position().cells
+            for _ in range(200):
+                if response["winner"] is not None:
+                    break
+                player = int(response["turn"])
+                # The AI ignores the pit, and the game is finalized whatever the pit once it is over
+                pits = Position(cells).valid_moves(player) or [0]
+                response = client.get("/api/select", params={"userid": player, "pit": rng.choice(pits),
+                                                             "sessionid": sessionid}).json()
+                assert response["session_id"] == sessionid
+                new_cells = cells_of(response)
+                assert sum(new_cells) == TOTAL_STONES
+                if Position(cells).is_terminal():
+                    assert new_cells[BIG_PIT[0]] + new_cells[BIG_PIT[1]] == TOTAL_STONES
+                else:
+                    assert new_cells in successors(cells, player)
+                cells = new_cells
+            return response["winner"]
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            winners = list(executor.map(play, range(48)))
+        assert all(winner is not None for winner in winners)
+
+    def test_api_turn_extra_turn(self, client):
+        sessionid = client.get("/api/").json()["session_id"]
+        response = client.get("/api/turn", params={"pit": 0, "sessionid": sessionid}).json()
+        assert response["turn"] == "0"
+        assert [(move["player"], move["pit"]) for move in response["moves"]] == [("0", 0)]
+        assert response["players"]["0"]["pits"] == [0, 7, 7, 7, 7, 7]
+
+    def test_api_turn_with_replies(self, client):
+        sessionid = client.get("/api/").json()["session_id"]
+        response = client.get("/api/turn", params={"pit": 5, "sessionid": sessionid}).json()
+        moves = response["moves"]
+        assert (moves[0]["player"], moves[0]["pit"]) == ("0", 5)
+        assert len(moves) > 1 and all(move["player"] == "1" for move in moves[1:])
+        position = Position()
+        for move in moves:
+            position.apply(int(move["player"]), move["pit"])
+            assert cells_of(move) == position.cells
+        assert cells_of(response) == position.cells
+        assert response["turn"] == "0"
+        assert client.get("/api/", params={"sessionid": sessionid}).json() == \
+            {key: value for key, value in response.items() if key != "moves"}
+
+    def test_api_turn_empty_pit(self, client):
+        sessionid = client.get("/api/").json()["session_id"]
+        client.get("/api/turn", params={"pit": 0, "sessionid": sessionid})
+        response = client.get("/api/turn", params={"pit": 0, "sessionid": sessionid}).json()
+        assert response["moves"] == []
+        assert response["turn"] == "0"
+
+    def test_api_turn_only_ai(self, client):
+        sessionid = client.get("/api/").json()["session_id"]
+        client.get("/api/select", params={"userid": 0, "pit": 5, "sessionid": sessionid})
+        response = client.get("/api/turn", params={"sessionid": sessionid}).json()
+        assert response["moves"] and all(move["player"] == "1" for move in response["moves"])
+        assert response["turn"] == "0"
+        assert client.get("/api/turn", params={"sessionid": sessionid}).json()["moves"] == []
+
+    def test_api_turn_until_game_over(self, client):
+        sessionid = client.get("/api/").json()["session_id"]
+        response = client.get("/api/reset", params={"sessionid": sessionid, "difficulty": 1}).json()
+        rng = random.Random(1)
+        while response["winner"] is None:
+            pits = [pit for pit, stones in enumerate(response["players"]["0"]["pits"]) if stones]
+            response = client.get("/api/turn", params={"pit": rng.choice(pits), "sessionid": sessionid}).json()
+        assert response["players"]["0"]["big_pit"] + response["players"]["1"]["big_pit"] == TOTAL_STONES
+
+    def test_api_turn_mcts(self, client):
+        sessionid = client.get("/api/").json()["session_id"]
+        response = client.get("/api/reset", params={"sessionid": sessionid, "difficulty": 2}).json()
+        assert response["difficulty"] == "2"
+        response = client.get("/api/turn", params={"pit": 5, "sessionid": sessionid}).json()
+        assert [move["player"] for move in response["moves"]][:2] == ["0", "1"]
+        assert response["turn"] == "0"
+        assert main.app.search_trees.get(sessionid).root is not None
+
+    def test_api_reset_unknown_difficulty(self, client):
+        sessionid = client.get("/api/").json()["session_id"]
+        assert client.get("/api/reset", params={"sessionid": sessionid, "difficulty": 3}).status_code == 422
+
+    def test_api_turn_unknown_session(self, client):
+        assert client.get("/api/turn", params={"pit": 0, "sessionid": "unknown"}).status_code == 404
+
+    def test_api_ws_turn(self, client):
+        sessionid = client.get("/api/").json()["session_id"]
+        with client.websocket_connect(f"/api/ws?sessionid={sessionid}") as websocket:
+            state = websocket.receive_json()
+            assert state["type"] == "state"
+            cells = cells_of(state)
+            websocket.send_json({"type": "turn", "pit": 5})
+            messages = [websocket.receive_json()]
+            while messages[-1]["type"] != "turn_over":
+                messages.append(websocket.receive_json())
+        moves = messages[:-1]
+        assert (moves[0]["player"], moves[0]["pit"]) == ("0", 5)
+        assert len(moves) > 1 and all(move["player"] == "1" for move in moves[1:])
+        position = Position()
+        for move in moves + messages[-1:]:
+            if move["type"] == "move":
+                position.apply(int(move["player"]), move["pit"])
+            for cell, stones in move["changes"]:
+                cells[cell] = stones
+            assert cells == position.cells
+        assert messages[-1]["turn"] == "0"
+        assert cells_of(client.get("/api/", params={"sessionid": sessionid}).json()) == cells
+
+    def test_api_ws_checkpoints(self, client):
+        sessionid = client.get("/api/").json()["session_id"]
+        with client.websocket_connect(f"/api/ws?sessionid={sessionid}") as websocket:
+            websocket.receive_json()
+            websocket.send_json({"type": "turn", "pit": 0})
+            assert websocket.receive_json()["type"] == "move"
+            assert websocket.receive_json()["type"] == "turn_over"
+            # Not stored before a checkpoint
+            assert client.get("/api/", params={"sessionid": sessionid}).json()["players"]["0"]["pits"] == [6] * 6
+        assert client.get("/api/", params={"sessionid": sessionid}).json()["players"]["0"]["pits"] == [0] + [7] * 5
+
+    def test_api_ws_reset_and_errors(self, client):
+        sessionid = client.get("/api/").json()["session_id"]
+        with client.websocket_connect(f"/api/ws?sessionid={sessionid}") as websocket:
+            websocket.receive_json()
+            websocket.send_text("not json")
+            assert websocket.receive_json()["type"] == "error"
+            websocket.send_json({"type": "turn", "pit": 6})
+            assert websocket.receive_json()["type"] == "error"
+            websocket.send_json({"type": "reset", "difficulty": 1})
+            state = websocket.receive_json()
+            assert state["type"] == "state" and state["difficulty"] == "1"
+
+    def test_api_ws_pit_ignored_on_ai_turn(self, client):
+        sessionid = client.get("/api/").json()["session_id"]
+        client.get("/api/select", params={"sessionid": sessionid, "userid": 0, "pit": 1})
+        with client.websocket_connect(f"/api/ws?sessionid={sessionid}") as websocket:
+            assert websocket.receive_json()["turn"] == "1"
+            websocket.send_json({"type": "turn", "pit": 5})
+            messages = [websocket.receive_json()]
+            while messages[-1]["type"] != "turn_over":
+                messages.append(websocket.receive_json())
+        # Like /api/turn, only the AI plays and the pit is not played after its moves
+        assert messages[:-1] and all(move["player"] == "1" for move in messages[:-1])
+        assert messages[-1]["turn"] == "0"
+
+    def test_api_ws_rejects_bool_pit(self, client):
+        sessionid = client.get("/api/").json()["session_id"]
+        with client.websocket_connect(f"/api/ws?sessionid={sessionid}") as websocket:
+            websocket.receive_json()
+            websocket.send_json({"type": "turn", "pit": True})
+            assert websocket.receive_json()["type"] == "error"
+
+    def test_api_ws_unknown_session(self, client):
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect("/api/ws?sessionid=unknown"):
+                pass
@@ -0,0 +1,71 @@
+import math
+
+import pytest
+
+import arena
+from engine import TOTAL_STONES
+from minimax_player import MiniMaxPlayer
+from random_player import RandomPlayer
+
+
+def record(players, scores):
+    return {"players": players, "scores": scores, "moves": [10, 10], "seconds": [0.1, 0.001],
+            "slowest": [0.02, 0.0001], "commit": "abc"}
+
+
+class TestArena:
+
+    def test_parse_spec(self):
+        assert arena.parse_spec("random") == (RandomPlayer, {})
+        assert arena.parse_spec("minimax:time=0.02,depth=6") == (MiniMaxPlayer, {"time_budget": 0.02, "max_depth": 6})
+        with pytest.raises(ValueError):
+            arena.parse_spec("alphazero")
+        with pytest.raises(ValueError):
+            arena.parse_spec("minimax:nodes=100")
+
+    def test_play_game(self):
+        game = arena.play_game(("minimax:depth=2", "random"), seed=3)
+        assert sum(game["scores"]) == TOTAL_STONES
+        assert game["players"] == ["minimax:depth=2", "random"]
+        assert all(moves > 0 for moves in game["moves"])
+        assert game == {**arena.play_game(("minimax:depth=2", "random"), seed=3),
+                        "seconds": game["seconds"], "slowest": game["slowest"]}
+
+    def test_play_and_report(self, tmp_path):
+        output = str(tmp_path / "games.jsonl")
+        assert arena.play("minimax:depth=3", "random", games=4, output=output, workers=2) == 4
+        records = arena.load([output])
+        assert len(records) == 4
+        assert sorted(record["seed"] for record in records) == [0, 0, 1, 1]
+        summary = arena.report(records)
+        pairing = summary["pairings"][0]
+        assert pairing["players"] == ["minimax:depth=3", "random"]
+        assert pairing["wins"] + pairing["draws"] + pairing["losses"] == 4
+        assert set(summary["move_times"]) == {"minimax:depth=3", "random"}
+        assert arena.load([output], by_commit=True)[0]["players"][0].endswith("@" + records[0]["commit"])
+
+    def test_pairings_from_either_side(self):
+        results = arena.pairings([record(["b", "a"], [40, 32]), record(["a", "b"], [36, 36]),
+                                  record(["a", "b"], [50, 22])])
+        assert results == {("a", "b"): {"wins": 1, "draws": 1, "losses": 1}}
+
+    def test_wilson_interval(self):
+        low, high = arena.wilson_interval(0.5, 100)
+        assert low == pytest.approx(0.4038, abs=1e-4)
+        assert high == pytest.approx(0.5962, abs=1e-4)
+        assert arena.wilson_interval(1.0, 10)[1] == pytest.approx(1.0)
+
+    def test_elo(self):
+        assert arena.elo_difference(0.5) == 0
+        assert arena.elo_difference(0.75) == pytest.approx(190.8, abs=0.1)
+        assert arena.elo_difference(1.0) == math.inf
+        assert arena.finite(math.inf) is None
+
+    def test_fit_elo(self):
+        results = {("a", "b"): {"wins": 300, "draws": 0, "losses": 100},
+                   ("b", "c"): {"wins": 300, "draws": 0, "losses": 100},
+                   ("a", "c"): {"wins": 10, "draws": 0, "losses": 0}}
+        ratings = arena.fit_elo(results, anchor="c")
+        assert ratings["c"] == 0
+        assert ratings["b"] == pytest.approx(190, abs=15)
+        assert ratings["a"] == pytest.approx(380, abs=30)
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from batch_engine import BatchPositions, random_playouts
+from board import Board
+from engine import Position, TOTAL_STONES
+
+
+class TestBatchEngine:
+
+    def test_same_moves_as_board(self):
+        rng = np.random.default_rng(7)
+        batch = BatchPositions.repeat(Position(), 0, 300)
+        boards = [Board(nr_players=2) for _ in range(len(batch))]
+        players = [0] * len(batch)
+        captures = extra_turns = 0
+        while not batch.terminal().all():
+            active = ~batch.terminal()
+            pits = batch.random_moves(rng)
+            extra_turn = batch.apply(pits, active)
+            for row in np.flatnonzero(active):
+                stores = boards[row].position.cells[6] + boards[row].position.cells[13]
+                turn_passes = boards[row].move_from(players[row], int(pits[row]))
+                captures += boards[row].position.cells[6] + boards[row].position.cells[13] - stores > 1
+                assert extra_turn[row] == (not turn_passes)
+                extra_turns += not turn_passes
+                if turn_passes:
+                    players[row] = 1 - players[row]
+                assert batch.cells[row].tolist() == boards[row].position.cells
+                assert batch.players[row] == players[row]
+                assert batch.side_stones[row].tolist() == boards[row].position.side_stones
+        assert all(board.game_over() for board in boards)
+        assert captures and extra_turns
+        assert batch.final_scores().tolist() == [[board.position.final_score(player) for player in range(2)]
+                                                 for board in boards]
+
+    def test_inactive_rows_stay(self):
+        batch = BatchPositions(np.tile(Position().cells, (2, 1)), np.array([0, 1]))
+        extra_turn = batch.apply(np.array([0, 0]), np.array([True, False]))
+        assert extra_turn.tolist() == [True, False]
+        assert batch.cells[0].tolist() == [0, 7, 7, 7, 7, 7, 1, 6, 6, 6, 6, 6, 6, 0]
+        assert batch.cells[1].tolist() == Position().cells
+        assert batch.players.tolist() == [0, 1]
+
+    def test_empty_pit(self):
+        batch = BatchPositions.repeat(Position([0, 6, 6, 6, 6, 6, 6, 6, 6, 6, 6, 6, 6, 0]), 0, 1)
+        assert batch.valid_moves().tolist() == [[False, True, True, True, True, True]]
+        with pytest.raises(AssertionError):
+            batch.apply(np.array([0]))
+
+    def test_random_playouts(self):
+        scores = random_playouts(Position(), 0, 1000, np.random.default_rng(0))
+        assert scores.shape == (1000, 2)
+        assert (scores.sum(axis=1) == TOTAL_STONES).all()
+        # Random players win about as often on either side
+        assert 0.4 < (scores[:, 0] > scores[:, 1]).mean() < 0.6
+
+    def test_playout_of_finished_game(self):
+        cells = [0, 0, 0, 0, 0, 0, 40, 1, 2, 0, 0, 0, 0, 29]
+        assert random_playouts(Position(cells), 1, 3, np.random.default_rng(0)).tolist() == [[40, 32]] * 3
@@ -0,0 +1,50 @@
+import json
+
+import benchmark
+from benchmark import POSITIONS, perft, perft_board, compare
+from engine import Position
+
+
+class TestBenchmark:
+
+    def test_perft_start(self):
+        # The first move of pit 0 gives an extra turn, so there are 5 + 5 * 6 positions after two moves
+        assert [perft(Position(), 0, depth) for depth in range(1, 6)] == [6, 35, 190, 1056, 5882]
+
+    def test_perft_board_agrees(self):
+        for _, cells, player in POSITIONS:
+            assert perft_board(cells, player, 4) == perft(Position(cells), player, 4)
+
+    def test_perft_restores_position(self):
+        _, cells, player = POSITIONS[2]
+        position = Position(cells)
+        perft(position, player, 3)
+        assert position.cells == cells
+        assert position.hash == Position(cells).hash
+
+    def test_run(self):
+        results = benchmark.run(perft_depth=2, search_depth=2, repeat=1, playouts=100)
+        assert set(results["perft"]) == {name for name, _, _ in POSITIONS}
+        assert results["perft"]["start"]["nodes"] == 35
+        assert set(results["search"]["start"]) == {"1", "2"}
+        assert results["memory"]["start"]["peak_bytes"] > 0
+        assert compare(results, json.loads(json.dumps(results))) == []
+
+    def test_compare(self):
+        old = {"meta": {"commit": "old"},
+               "perft": {"start": {"nodes": 100, "seconds": 1.0, "nodes_per_second": 100.0}},
+               "search": {"start": {"1": {"seconds": 0.001, "nodes_per_second": 1000.0},
+                                    "8": {"seconds": 0.5, "nodes_per_second": 2000.0}}},
+               "memory": {"start": {"peak_bytes": 1000}}}
+        new = {"meta": {"commit": "new"},
+               "perft": {"start": {"nodes": 101, "seconds": 1.05, "nodes_per_second": 96.0}},
+               "search": {"start": {"1": {"seconds": 0.002, "nodes_per_second": 500.0},
+                                    "8": {"seconds": 0.7, "nodes_per_second": 1400.0}}},
+               "memory": {"start": {"peak_bytes": 2000}}}
+        regressions = compare(old, new)
+        assert [regression.split(":")[0] for regression in regressions] == [
+            "memory/start/peak_bytes",
+            "perft/start/nodes",
+            "search/start/8/nodes_per_second",
+            "search/start/8/seconds",
+        ]
@@ -1,3 +1,6 @@
+import pytest
+
+import board as board_module
 from board import Board, NO_WINNER
 
 
@@ -21,6 +24,16 @@ class TestBoard:
         assert board.players_data[1].big_pit == 0
         assert board.winner == NO_WINNER
 
+    def test_board_last_move(self):
+        board = Board(nr_players=2)
+        assert board.last_move is None
+        board.move(1, 3)
+        assert board.last_move == (1, 3)
+        board.move(1, 3)  # Empty pit, not a move
+        assert board.last_move == (1, 3)
+        board.reset()
+        assert board.last_move is None
+
     def test_board_move_last(self):
         board = Board(nr_players=2)
         board.move(0, 5)
@@ -76,3 +89,31 @@ class TestBoard:
         assert board.players_data[1].pits == [0, 0, 0, 0, 0, 0]
         assert board.players_data[1].big_pit == 34
         assert board.winner == 0
+
+    def test_board_winner_is_pure(self):
+        board = Board(nr_players=2)
+        board.players_data[0].pits = [0, 0, 0, 0, 0, 0]
+        board.players_data[0].big_pit = 30
+        board.players_data[1].pits = [1, 2, 3, 4, 5, 6]
+        board.players_data[1].big_pit = 21
+        assert board.game_over()
+        assert board.winner == 1
+        assert board.players_data[1].pits == [1, 2, 3, 4, 5, 6]
+        assert board.players_data[1].big_pit == 21
+
+    def test_board_finalize(self):
+        board = Board(nr_players=2)
+        assert board.finalize() == NO_WINNER
+        assert board.players_data[0].pits == [6, 6, 6, 6, 6, 6]
+        board.players_data[0].pits = [0, 0, 0, 0, 0, 0]
+        board.players_data[0].big_pit = 30
+        assert board.finalize() == 1
+        assert board.players_data[1].pits == [0, 0, 0, 0, 0, 0]
+        assert board.players_data[1].big_pit == 36
+
+    def test_board_validate_stones(self, monkeypatch):
+        monkeypatch.setattr(board_module, "VALIDATE_STONES", True)
+        board = Board(nr_players=2)
+        board.players_data[0].big_pit = 5
+        with pytest.raises(AssertionError):
+            board.winner
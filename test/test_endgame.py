@@ -0,0 +1,61 @@
+import pytest
+
+import endgame
+from board import Board
+from engine import Position
+from minimax_player import MiniMaxPlayer
+
+
+def exact_score(position, player, current_player):
+    if position.is_terminal():
+        return position.evaluate(player)
+    values = []
+    for pit in position.valid_moves(current_player):
+        next_player = current_player if position.apply(current_player, pit) else 1 - current_player
+        values.append(exact_score(position, player, next_player))
+        position.undo()
+    return max(values) if current_player == player else min(values)
+
+
+class TestEndgame:
+
+    @pytest.fixture(scope='class')
+    def database(self, tmp_path_factory):
+        path = str(tmp_path_factory.mktemp("endgame") / "endgame.db")
+        endgame.write(path, 4, endgame.build(4))
+        return endgame.EndgameDatabase(path)
+
+    def test_rank_unrank(self):
+        for index, pits in enumerate(pit for stones in range(3) for pit in endgame.pit_vectors(stones)):
+            assert endgame.rank(pits) == index
+            assert endgame.unrank(index) == pits
+
+    def test_database_size(self, database):
+        assert database.max_stones == 4
+        assert len(database.values) == endgame.positions_up_to(4)
+
+    @pytest.mark.parametrize("cells", [
+        [1, 0, 0, 0, 0, 1, 30, 0, 2, 0, 0, 0, 0, 38],
+        [0, 0, 0, 0, 2, 0, 20, 1, 0, 0, 0, 1, 0, 48],
+        [0, 3, 0, 0, 0, 0, 35, 0, 0, 0, 0, 0, 1, 33],
+    ])
+    def test_perfect_play_score(self, database, cells):
+        position = Position(cells)
+        for player in (0, 1):
+            for current_player in (0, 1):
+                assert database.score(position, player, current_player) == \
+                    exact_score(position, player, current_player)
+
+    def test_covers(self, database):
+        assert database.covers(Position([1, 0, 0, 0, 0, 1, 30, 0, 2, 0, 0, 0, 0, 38]))
+        assert not database.covers(Position())
+
+    def test_minimax_uses_database(self, database):
+        board = Board(nr_players=2)
+        board.players_data[0].pits = [0, 0, 0, 0, 0, 1]
+        board.players_data[0].big_pit = 36
+        board.players_data[1].pits = [2, 0, 0, 0, 0, 1]
+        board.players_data[1].big_pit = 32
+        player = MiniMaxPlayer(1, board, endgame=database)
+        assert player.best_move() == 5
+        assert player.nodes == 0
@@ -0,0 +1,98 @@
+import pickle
+
+from board import Board
+from engine import Position, SOWING, sowing
+from minimax_player import MiniMaxPlayer
+
+
+class TestPosition:
+
+    def test_position_init(self):
+        position = Position()
+        assert position.cells == [6, 6, 6, 6, 6, 6, 0, 6, 6, 6, 6, 6, 6, 0]
+        assert position.pits(1) == [6, 6, 6, 6, 6, 6]
+        assert position.big_pit(1) == 0
+
+    def test_apply_extra_turn(self):
+        position = Position()
+        assert position.apply(0, 0)
+        assert position.pits(0) == [0, 7, 7, 7, 7, 7]
+        assert position.big_pit(0) == 1
+
+    def test_apply_skips_opponent_big_pit(self):
+        position = Position([0, 0, 0, 0, 0, 14, 0, 0, 0, 0, 0, 0, 0, 5])
+        assert position.apply(0, 5)
+        assert position.cells == [1, 1, 1, 1, 1, 1, 2, 1, 1, 1, 1, 1, 1, 5]
+
+    def test_sowing_full_laps(self):
+        drops, last, side_deltas = sowing(1, 0, 27)
+        # Two full laps over the 13 cells, one more stone in the pit after the start
+        assert dict(drops) == {cell: 2 for cell in range(14) if cell != 6} | {8: 3}
+        assert last == 8
+        assert side_deltas == (12, -27 + 13)
+
+    def test_sowing_table_beyond_real_games(self):
+        position = Position([0, 0, 0, 0, 0, 100, 0, 0, 0, 0, 0, 0, 0, 0])
+        assert len(SOWING[0][5]) <= 100
+        position.apply(0, 5)
+        assert sum(position.cells) == 100
+        position.validate(100)
+
+    def test_apply_capture(self):
+        position = Position([1, 0, 8, 8, 8, 8, 2, 0, 8, 7, 7, 7, 7, 1])
+        assert not position.apply(0, 0)
+        assert position.pits(0) == [0, 0, 8, 8, 8, 8]
+        assert position.big_pit(0) == 10
+        assert position.pits(1) == [0, 8, 7, 7, 0, 7]
+
+    def test_ordered_moves(self):
+        position = Position([2, 6, 0, 3, 1, 14, 0, 6, 6, 6, 6, 6, 6, 0])
+        assert position.ordered_moves(0) == [3, 5, 0, 1, 4]
+
+    def test_apply_undo(self):
+        position = Position()
+        position.apply(0, 5)
+        position.apply(1, 2)
+        position.undo()
+        position.undo()
+        assert position == Position()
+
+    def test_side_stones(self):
+        position = Position([1, 0, 8, 8, 8, 8, 2, 0, 8, 7, 7, 7, 7, 1])
+        position.apply(0, 0)
+        assert position.side_stones == [32, 29]
+        position.apply(0, 5)
+        assert position.side_stones == [24, 27]
+        position.validate()
+        position.undo()
+        assert position.side_stones == [32, 29]
+
+    def test_terminal(self):
+        position = Position([0, 0, 0, 0, 0, 1, 37, 0, 0, 0, 0, 0, 1, 33])
+        assert not position.is_terminal()
+        position.apply(0, 5)
+        assert position.is_terminal()
+        assert position.final_score(1) == 34
+
+    def test_board_shares_position(self):
+        board = Board(nr_players=2)
+        board.players_data[1].pits = [0, 0, 0, 0, 0, 1]
+        assert board.position.pits(1) == [0, 0, 0, 0, 0, 1]
+        assert board.valid_pit_indexes(1) == [5]
+
+    def test_board_pickle(self):
+        board = Board(nr_players=2)
+        board.move(0, 3)
+        restored = pickle.loads(pickle.dumps(board))
+        assert restored.players_data[0].pits == board.players_data[0].pits
+        assert restored.players_data[1].pits == board.players_data[1].pits
+        restored.move(1, 0)
+        assert restored.players_data[1].pits[0] == 0
+
+    def test_minimax_leaves_board_untouched(self):
+        board = Board(nr_players=2)
+        board.move(0, 2)
+        before = board.position.cells[:]
+        player = MiniMaxPlayer(1, board)
+        assert player.best_move() in board.valid_pit_indexes(1)
+        assert board.position.cells == before
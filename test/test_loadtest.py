@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+os.environ["SESSION_BACKEND"] = "memory"
+
+from loadtest import percentile, run_load, in_process_client
+
+
+class TestLoadTest:
+
+    @pytest.fixture
+    def anyio_backend(self):
+        # The app's session cache runs on asyncio
+        return 'asyncio'
+
+    def test_percentile(self):
+        latencies = [float(value) for value in range(1, 101)]
+        assert percentile(latencies, 0.5) == 50
+        assert percentile(latencies, 0.99) == 99
+        assert percentile([3.0], 0.99) == 3
+        assert percentile([], 0.5) == 0
+
+    @pytest.mark.anyio
+    @pytest.mark.parametrize("api", ["select", "turn"])
+    async def test_games_against_random_player(self, api):
+        async with in_process_client() as client:
+            report = await run_load(client, games=4, concurrency=2, difficulty=0, api=api)
+        route = f"/api/{api}"
+        assert report["games"] == 4
+        assert set(report["routes"]) == {"/api/", "/api/reset", route}
+        assert report["routes"]["/api/reset"]["requests"] == 4
+        assert all(latency["errors"] == 0 for latency in report["routes"].values())
+        assert report["routes"][route]["p50"] <= report["routes"][route]["p99"] <= report["routes"][route]["max"]
+        assert report["requests_per_second"] > 0
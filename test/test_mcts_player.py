@@ -0,0 +1,76 @@
+import threading
+import time
+
+from board import Board
+from mcts_player import MctsPlayer, SearchTree, SessionTrees
+from search_scheduler import SearchScheduler
+
+# Only pit 5 wins with perfect play, pit 2 draws and pit 4 loses
+ENDGAME = [0, 0, 1, 0, 1, 2, 33, 1, 0, 1, 1, 0, 0, 32]
+
+
+def board_with(cells) -> Board:
+    board = Board(nr_players=2)
+    board.position.set_cells(cells)
+    return board
+
+
+class TestMctsPlayer:
+
+    def test_only_move(self):
+        board = board_with([0, 0, 0, 0, 0, 3, 30, 1, 2, 3, 4, 5, 6, 18])
+        player = MctsPlayer(0, board, seed=1)
+        assert player.best_move() == 5
+        assert player.games == 0
+
+    def test_finds_winning_move(self):
+        player = MctsPlayer(0, board_with(ENDGAME), playouts=4000, time_budget=10, seed=1)
+        assert player.best_move() == 5
+
+    def test_playout_budget(self):
+        player = MctsPlayer(1, Board(nr_players=2), playouts=1000, time_budget=10, batch=8, rollouts=4, seed=1)
+        player.best_move()
+        assert 1000 <= player.games < 1000 + 8 * 4
+
+    def test_time_budget(self):
+        player = MctsPlayer(1, Board(nr_players=2), playouts=10 ** 9, time_budget=0.05, seed=1)
+        start = time.perf_counter()
+        player.best_move()
+        assert time.perf_counter() - start < 0.5
+        assert player.games > 0
+
+    def test_stop(self):
+        player = MctsPlayer(1, Board(nr_players=2), playouts=10 ** 9, time_budget=60, seed=1)
+        threading.Timer(0.05, player.stop).start()
+        start = time.perf_counter()
+        assert player.best_move() in range(6)
+        assert time.perf_counter() - start < 1
+
+    def test_tree_reused_between_moves(self):
+        board = Board(nr_players=2)
+        tree = SearchTree()
+        player = MctsPlayer(1, board, playouts=3000, time_budget=10, tree=tree, seed=1)
+        board.move(0, 5)
+        while not board.move(1, player.best_move()):
+            pass
+        board.move(0, 4 if board.position.pits(0)[4] else board.position.valid_moves(0)[0])
+        player.best_move()
+        assert player.reused > 0
+        assert tree.root.key == board.position.key(1)
+
+    def test_without_search_slot(self):
+        scheduler = SearchScheduler(slots=1, max_queue=0)
+        board = Board(nr_players=2)
+        board.move(0, 5)
+        player = MctsPlayer(1, board, playouts=10 ** 9, time_budget=10, scheduler=scheduler, seed=1)
+        with scheduler.admit(1.0):
+            assert player.best_move() in board.position.valid_moves(1)
+        assert 0 < player.games <= player.batch * player.rollouts
+
+    def test_session_trees(self):
+        trees = SessionTrees(max_sessions=2)
+        first = trees.get("first")
+        assert trees.get("first") is first
+        trees.get("second")
+        trees.get("third")
+        assert trees.get("first") is not first
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+os.environ["SESSION_BACKEND"] = "memory"
+
+from fastapi.testclient import TestClient
+
+import main
+from metrics import Registry
+from parallel_search import SearchPool
+
+
+def sample(text: str, name: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(name + " "):
+            return float(line.split()[-1])
+    raise AssertionError(f"No sample {name}")
+
+
+class TestMetrics:
+
+    def test_counter_and_gauge(self):
+        registry = Registry()
+        moves = registry.counter("moves_total", "Moves")
+        sockets = registry.gauge("sockets", "Sockets")
+        moves.inc(source="book")
+        moves.inc(2, source="book")
+        moves.inc(source="search")
+        sockets.inc()
+        sockets.dec()
+        text = registry.render()
+        assert "# TYPE moves_total counter" in text
+        assert sample(text, 'moves_total{source="book"}') == 3
+        assert sample(text, 'moves_total{source="search"}') == 1
+        assert sample(text, "sockets") == 0
+
+    def test_histogram_buckets(self):
+        registry = Registry()
+        histogram = registry.histogram("latency_seconds", "Latency", (0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value, route="/api/")
+        text = registry.render()
+        assert sample(text, 'latency_seconds_bucket{route="/api/",le="0.1"}') == 2
+        assert sample(text, 'latency_seconds_bucket{route="/api/",le="1"}') == 3
+        assert sample(text, 'latency_seconds_bucket{route="/api/",le="+Inf"}') == 4
+        assert sample(text, 'latency_seconds_count{route="/api/"}') == 4
+        assert sample(text, 'latency_seconds_sum{route="/api/"}') == pytest.approx(2.65)
+
+    def test_callback(self):
+        registry = Registry()
+        registry.callback("lookups_total", "Lookups", lambda: [({"result": "hit"}, 3), ({"result": "miss"}, 1)],
+                          "counter")
+        registry.callback("size", "Size", lambda: 7)
+        text = registry.render()
+        assert sample(text, 'lookups_total{result="hit"}') == 3
+        assert sample(text, "size") == 7
+
+    def test_label_escaping(self):
+        registry = Registry()
+        registry.counter("errors_total", "Errors").inc(message='a "b"\n')
+        assert 'errors_total{message="a \\"b\\"\\n"} 1' in registry.render()
+
+    def test_duplicate_name(self):
+        registry = Registry()
+        registry.counter("moves_total", "Moves")
+        with pytest.raises(AssertionError):
+            registry.gauge("moves_total", "Moves")
+
+    def test_transposition_stats_of_search_pool(self, monkeypatch):
+        pool = SearchPool(workers=2)
+        pool.hits, pool.misses = 3, 1
+        monkeypatch.setattr(main.app, "search_pool", pool, raising=False)
+        text = main.REGISTRY.render()
+        assert sample(text, 'mancala_transposition_lookups_total{result="hit"}') == 3
+        assert sample(text, "mancala_transposition_hit_rate") == 0.75
+
+    def test_metrics_endpoint(self):
+        with TestClient(main.app) as client:
+            sessionid = client.get("/api/").json()["session_id"]
+            client.get("/api/reset", params={"sessionid": sessionid, "difficulty": 1})
+            client.get("/api/turn", params={"pit": 5, "sessionid": sessionid})
+            client.get("/api/turn", params={"pit": 5, "sessionid": "unknown"})
+            response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+        assert sample(text, 'mancala_request_duration_seconds_count{method="GET",route="/api/turn",status="200"}') >= 1
+        assert sample(text, 'mancala_request_duration_seconds_count{method="GET",route="/api/turn",status="404"}') >= 1
+        assert sample(text, 'mancala_move_duration_seconds_count{player="MiniMaxPlayer"}') >= 1
+        assert "mancala_ai_moves_total{source=" in text
+        assert sample(text, "mancala_sessions_cached") >= 1
+        assert sample(text, 'mancala_search_slots{state="running"}') == 0
+        assert 'mancala_move_cache_lookups_total{result="misses"}' in text
+        assert 'mancala_transposition_lookups_total{result="hit"}' in text
+        assert "mancala_transposition_hit_rate" in text
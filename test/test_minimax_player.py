@@ -0,0 +1,68 @@
+import pickle
+import time
+
+from board import Board
+from minimax_player import MiniMaxPlayer
+from opening_book import OpeningBook
+
+
+class TestMiniMaxPlayer:
+
+    def test_takes_the_capture(self):
+        board = Board(nr_players=2)
+        board.players_data[1].pits = [0, 0, 0, 0, 1, 0]
+        board.players_data[1].big_pit = 30
+        board.players_data[0].pits = [9, 1, 1, 1, 1, 1]
+        board.players_data[0].big_pit = 27
+        player = MiniMaxPlayer(1, board, time_budget=1, max_depth=4)
+        assert player.best_move() == 4
+
+    def test_respects_time_budget(self):
+        board = Board(nr_players=2)
+        player = MiniMaxPlayer(1, board, time_budget=0.02)
+        start = time.perf_counter()
+        assert player.best_move() in range(6)
+        assert time.perf_counter() - start < 0.5
+        assert player.depth_reached >= 1
+
+    def test_deepens_with_time(self):
+        board = Board(nr_players=2)
+        player = MiniMaxPlayer(1, board, time_budget=10, max_depth=5)
+        player.best_move()
+        assert player.depth_reached == 5
+
+    def test_stops_when_game_is_solved(self):
+        board = Board(nr_players=2)
+        board.players_data[1].pits = [0, 0, 0, 1, 1, 0]
+        board.players_data[0].pits = [1, 0, 0, 0, 0, 0]
+        player = MiniMaxPlayer(1, board, time_budget=10)
+        player.best_move()
+        assert player.depth_reached < 10
+
+    def test_table_is_reused_between_moves(self):
+        board = Board(nr_players=2)
+        board.move(0, 3)
+        player = MiniMaxPlayer(1, board, time_budget=10, max_depth=4, book=OpeningBook({}))
+        player.best_move()
+        first_search_nodes = player.nodes
+        assert len(player.table) > 0
+        player.best_move()
+        assert player.nodes < first_search_nodes
+
+    def test_table_is_not_pickled(self):
+        board = Board(nr_players=2)
+        player = MiniMaxPlayer(1, board, time_budget=10, max_depth=2)
+        player.best_move()
+        assert pickle.loads(pickle.dumps(player)).table is None
+
+    def test_extra_turn_is_searched_for_the_same_player(self):
+        board = Board(nr_players=2)
+        board.players_data[1].pits = [0, 0, 0, 1, 0, 1]
+        board.players_data[1].big_pit = 29
+        board.players_data[0].pits = [0, 10, 0, 0, 0, 1]
+        board.players_data[0].big_pit = 30
+        player = MiniMaxPlayer(1, board, time_budget=10, max_depth=2)
+        player.best_move()
+        values = player.search_root(board.position.copy(), [5, 3], 2)
+        # Pit 5 ends in the big pit, then pit 3 captures the 10 stones and ends the game
+        assert values[5] == (29 + 1 + 11) - (30 + 1)
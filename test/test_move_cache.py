@@ -0,0 +1,100 @@
+import redis
+
+from board import Board
+from engine import Position
+from minimax_player import MiniMaxPlayer
+from move_cache import MoveCache, CachedMove, RedisMoveStore, position_key, MIN_CACHED_DEPTH
+from opening_book import OpeningBook
+
+
+class DictStore:
+
+    def __init__(self):
+        self.moves = {}
+
+    def get(self, key):
+        return self.moves.get(key)
+
+    def set(self, key, move):
+        self.moves[key] = move
+
+
+class UnavailableRedis:
+
+    def get(self, key):
+        raise redis.ConnectionError()
+
+    def setex(self, key, expiration, value):
+        raise redis.ConnectionError()
+
+
+class TestMoveCache:
+
+    def test_key_ignores_big_pits(self):
+        first = Position([1, 2, 3, 4, 5, 6, 10, 6, 5, 4, 3, 2, 1, 20])
+        second = Position([1, 2, 3, 4, 5, 6, 20, 6, 5, 4, 3, 2, 1, 10])
+        assert position_key(first, 0, "s") == position_key(second, 0, "s")
+
+    def test_key_same_for_both_sides(self):
+        position = Position([1, 2, 3, 4, 5, 6, 10, 6, 5, 4, 3, 2, 1, 20])
+        mirrored = Position([6, 5, 4, 3, 2, 1, 20, 1, 2, 3, 4, 5, 6, 10])
+        assert position_key(position, 0, "s") == position_key(mirrored, 1, "s")
+        assert position_key(position, 0, "s") != position_key(position, 1, "s")
+
+    def test_key_has_strength(self):
+        assert position_key(Position(), 0, "a") != position_key(Position(), 0, "b")
+
+    def test_lookup_and_stats(self):
+        cache = MoveCache()
+        assert cache.lookup("k") is None
+        cache.store_move("k", CachedMove(3, MIN_CACHED_DEPTH))
+        assert cache.lookup("k") == CachedMove(3, MIN_CACHED_DEPTH)
+        assert cache.stats() == {"size": 1, "local_hits": 1, "store_hits": 0, "misses": 1, "hit_rate": 0.5}
+
+    def test_shallow_searches_not_kept(self):
+        cache = MoveCache()
+        cache.store_move("k", CachedMove(3, MIN_CACHED_DEPTH - 1))
+        assert cache.lookup("k") is None
+
+    def test_deeper_search_kept(self):
+        cache = MoveCache()
+        cache.store_move("k", CachedMove(3, 8))
+        cache.store_move("k", CachedMove(1, 6))
+        assert cache.lookup("k").pit == 3
+        cache.store_move("k", CachedMove(2, 9))
+        assert cache.lookup("k").pit == 2
+
+    def test_least_recently_used_evicted(self):
+        cache = MoveCache(capacity=2)
+        cache.store_move("a", CachedMove(0, 8))
+        cache.store_move("b", CachedMove(1, 8))
+        cache.lookup("a")
+        cache.store_move("c", CachedMove(2, 8))
+        assert list(cache.entries) == ["a", "c"]
+
+    def test_shared_store(self):
+        store = DictStore()
+        MoveCache(store=store).store_move("k", CachedMove(4, 8))
+        cache = MoveCache(store=store)
+        assert cache.lookup("k").pit == 4
+        assert cache.lookup("k").pit == 4
+        assert (cache.store_hits, cache.local_hits) == (1, 1)
+
+    def test_redis_unavailable(self):
+        cache = MoveCache(store=RedisMoveStore(UnavailableRedis()))
+        cache.store_move("k", CachedMove(4, 8))
+        assert MoveCache(store=RedisMoveStore(UnavailableRedis())).lookup("k") is None
+
+    def test_minimax_plays_cached_move(self):
+        cache = MoveCache()
+        board = Board(nr_players=2)
+        board.move(0, 5)
+        player = MiniMaxPlayer(1, board, time_budget=10, max_depth=MIN_CACHED_DEPTH, book=OpeningBook({}),
+                               move_cache=cache)
+        best_move = player.best_move()
+        assert cache.misses == 1 and len(cache) == 1
+        other = MiniMaxPlayer(1, board, time_budget=10, max_depth=MIN_CACHED_DEPTH, book=OpeningBook({}),
+                              move_cache=cache)
+        assert other.best_move() == best_move
+        assert other.nodes == 0
+        assert cache.local_hits == 1
@@ -0,0 +1,46 @@
+from board import Board
+from engine import Position
+from minimax_player import MiniMaxPlayer
+from opening_book import OpeningBook, default_book
+
+
+class TestOpeningBook:
+
+    def test_save_and_load(self, tmp_path):
+        position = Position()
+        position.apply(0, 2)
+        book = OpeningBook({position.key(1): 4})
+        book.save(str(tmp_path / "book.bin"))
+        loaded = OpeningBook.load(str(tmp_path / "book.bin"))
+        assert len(loaded) == 1
+        assert loaded.lookup(position, 1) == 4
+        assert loaded.lookup(position, 0) is None
+        assert loaded.lookup(Position(), 1) is None
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / "book.bin"
+        path.write_bytes(b"not a book at all")
+        assert OpeningBook.load(str(path)) is None
+        path.write_bytes(b"short")
+        assert OpeningBook.load(str(path)) is None
+
+    def test_minimax_plays_book_move(self):
+        board = Board(nr_players=2)
+        board.move(0, 5)
+        player = MiniMaxPlayer(1, board, book=OpeningBook({board.position.key(1): 3}))
+        assert player.best_move() == 3
+        assert player.nodes == 0
+
+    def test_minimax_ignores_invalid_book_move(self):
+        board = Board(nr_players=2)
+        board.players_data[1].pits = [6, 6, 6, 0, 6, 6]
+        player = MiniMaxPlayer(1, board, time_budget=0.01, book=OpeningBook({board.position.key(1): 3}))
+        assert player.best_move() != 3
+
+    def test_default_book_covers_first_reply(self):
+        book = default_book()
+        assert book is not None
+        for pit in range(6):
+            position = Position()
+            if not position.apply(0, pit):
+                assert book.lookup(position, 1) in position.valid_moves(1)
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+os.environ["SESSION_BACKEND"] = "memory"
+
+import main
+import metrics
+from board import Board
+from minimax_player import MiniMaxPlayer
+from opening_book import OpeningBook
+from parallel_search import SearchPool, create_pool
+
+
+class TestParallelSearch:
+
+    @pytest.fixture(scope='class')
+    def pool(self):
+        pool = SearchPool(workers=2)
+        pool.start()
+        yield pool
+        pool.shutdown()
+
+    def test_no_pool_for_single_worker(self):
+        assert create_pool(workers=1) is None
+
+    def test_same_move_as_sequential_search(self, pool):
+        board = Board(nr_players=2)
+        board.move(0, 4)
+        sequential = MiniMaxPlayer(1, board, time_budget=30, max_depth=4, book=OpeningBook({}))
+        parallel = MiniMaxPlayer(1, board, time_budget=30, max_depth=4, book=OpeningBook({}), pool=pool)
+        assert parallel.best_move() == sequential.best_move()
+        assert parallel.depth_reached == 4
+        assert parallel.nodes > 0
+        assert parallel.cutoffs > 0
+        assert pool.stats()["hits"] > 0
+
+    def test_cutoffs_recorded(self, pool, monkeypatch):
+        monkeypatch.setattr(metrics, "AI_CUTOFFS", metrics.Registry().histogram("cutoffs", "Cutoffs"))
+        board = Board(nr_players=2)
+        board.move(0, 4)
+        player = MiniMaxPlayer(1, board, time_budget=30, max_depth=4, book=OpeningBook({}), pool=pool)
+        main.timed_move(player)
+        assert player.source == "search"
+        (counts,) = metrics.AI_CUTOFFS.values.values()
+        assert counts[-1] == player.cutoffs > 0
+
+    def test_respects_time_budget(self, pool):
+        board = Board(nr_players=2)
+        board.move(0, 4)
+        player = MiniMaxPlayer(1, board, time_budget=0.05, book=OpeningBook({}), pool=pool)
+        assert player.best_move() in board.valid_pit_indexes(1)
+        assert 0 < player.depth_reached < 64
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import session_codec
+from board import Board
+from engine import Position
+from human_player import HumanPlayer
+from minimax_player import MiniMaxPlayer
+from move_cache import MoveCache, MIN_CACHED_DEPTH
+from opening_book import OpeningBook
+from pondering import PonderJob, Ponderer
+from random_player import RandomPlayer
+from transposition import TranspositionTable
+
+
+def ai_player(board: Board, cache: MoveCache) -> MiniMaxPlayer:
+    return MiniMaxPlayer(1, board, time_budget=10, max_depth=MIN_CACHED_DEPTH, table=TranspositionTable(),
+                         book=OpeningBook({}), move_cache=cache)
+
+
+class TestPondering:
+
+    def test_ponder_job_searches_replies(self):
+        cache = MoveCache()
+        board = Board(nr_players=2)
+        job = PonderJob(board.position.cells[:], 0, ai_player(board, cache))
+        job.run()
+        # Pit 0 gives the human an extra turn, the AI has no reply to it yet
+        assert job.pondered == 5
+        assert len(cache) == 5
+
+    def test_reply_found_without_searching(self):
+        cache = MoveCache()
+        board = Board(nr_players=2)
+        ai = ai_player(board, cache)
+        PonderJob(board.position.cells[:], 0, ai).run()
+        board.move(0, 3)
+        ai.best_move()
+        assert ai.nodes == 0
+        assert cache.local_hits == 1
+
+    def test_cancelled_job(self):
+        cache = MoveCache()
+        board = Board(nr_players=2)
+        job = PonderJob(board.position.cells[:], 0, ai_player(board, cache))
+        job.cancel()
+        job.run()
+        assert job.pondered == 0
+
+    def test_search_started_after_cancel_gets_no_time(self):
+        board = Board(nr_players=2)
+        ai = ai_player(board, MoveCache())
+        job = PonderJob(board.position.cells[:], 0, ai)
+        job.cancel()
+        job.searcher.start_search(60)
+        assert job.searcher._deadline <= time.perf_counter()
+        assert job.searcher.strength() == ai.strength()
+
+    def test_stop_ends_search(self):
+        board = Board(nr_players=2)
+        board.move(0, 5)
+        ai = MiniMaxPlayer(1, board, time_budget=60, book=OpeningBook({}))
+        search = threading.Thread(target=ai.best_move)
+        search.start()
+        time.sleep(0.05)
+        ai.stop()
+        search.join(timeout=5)
+        assert not search.is_alive()
+
+    def test_ponderer_only_against_minimax(self):
+        ponderer = Ponderer()
+        session_state = session_codec.new_session_state("s", Position().cells, 0, None, 0,
+                                                        [HumanPlayer, RandomPlayer])
+        ponderer.ponder("s", session_state)
+        assert len(ponderer) == 0
+        session_state = session_codec.new_session_state("s", Position().cells, 1, None, 1,
+                                                        [HumanPlayer, MiniMaxPlayer])
+        # The AI's turn
+        ponderer.ponder("s", session_state)
+        assert len(ponderer) == 0
+        ponderer.shutdown()
+
+    def test_ponderer_runs_and_cancels(self):
+        ponderer = Ponderer()
+        cache = MoveCache()
+        session_state = session_codec.new_session_state("s", Position().cells, 0, None, 1,
+                                                        [HumanPlayer, MiniMaxPlayer])
+        session_state['players'][1].move_cache = cache
+        ponderer.ponder("s", session_state)
+        ponderer.cancel("s")
+        assert len(ponderer) == 0
+        ponderer.ponder("s", session_state)
+        ponderer.shutdown()
+        assert len(ponderer) == 0
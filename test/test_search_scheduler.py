@@ -0,0 +1,94 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from board import Board
+from engine import Position
+from minimax_player import MiniMaxPlayer
+from opening_book import OpeningBook
+from search_scheduler import SearchScheduler, MIN_SEARCH_TIME
+
+
+class TestSearchScheduler:
+
+    def test_full_budget_when_idle(self):
+        scheduler = SearchScheduler(slots=2)
+        with scheduler.admit(0.05) as time_budget:
+            assert time_budget == 0.05
+            assert scheduler.stats()["running"] == 1
+        stats = scheduler.stats()
+        assert (stats["running"], stats["searches"], stats["degraded"]) == (0, 1, 0)
+
+    def test_waiting_search_gets_less_time(self):
+        scheduler = SearchScheduler(slots=1)
+        granted = []
+
+        def search():
+            with scheduler.admit(1.0) as time_budget:
+                granted.append(time_budget)
+
+        with scheduler.admit(1.0):
+            waiting = threading.Thread(target=search)
+            waiting.start()
+            while scheduler.stats()["waiting"] == 0:
+                time.sleep(0.001)
+            time.sleep(0.05)
+        waiting.join()
+        assert MIN_SEARCH_TIME < granted[0] < 0.96
+        assert scheduler.stats()["degraded"] == 1
+
+    def test_wait_longer_than_budget(self):
+        scheduler = SearchScheduler(slots=1)
+        with scheduler.admit(1.0):
+            with scheduler.admit(0.02) as time_budget:
+                assert time_budget is None
+        assert scheduler.stats()["fallbacks"] == 1
+
+    def test_queue_full(self):
+        scheduler = SearchScheduler(slots=1, max_queue=0)
+        with scheduler.admit(1.0):
+            with scheduler.admit(1.0) as time_budget:
+                assert time_budget is None
+        assert scheduler.stats()["rejected"] == 1
+
+    def test_background_only_on_spare_slot(self):
+        scheduler = SearchScheduler(slots=1)
+        with scheduler.admit(1.0, background=True) as time_budget:
+            assert time_budget == 1.0
+            with scheduler.admit(1.0, background=True) as time_budget:
+                assert time_budget is None
+        assert scheduler.stats()["background_skipped"] == 1
+
+    def test_quick_move_without_slot(self):
+        scheduler = SearchScheduler(slots=1, max_queue=0)
+        board = Board(nr_players=2)
+        board.move(0, 5)
+        player = MiniMaxPlayer(1, board, book=OpeningBook({}), scheduler=scheduler)
+        with scheduler.admit(1.0):
+            move = player.best_move()
+        assert player.nodes == 0
+
+        def score(pit):
+            position = Position(board.position.cells)
+            position.apply(1, pit)
+            return position.evaluate(1)
+        assert score(move) == max(score(pit) for pit in board.position.valid_moves(1))
+
+    def test_searches_finish_within_budget_under_load(self):
+        scheduler = SearchScheduler(slots=2, max_queue=4)
+        time_budget = 0.05
+
+        def search(_):
+            board = Board(nr_players=2)
+            board.move(0, 5)
+            player = MiniMaxPlayer(1, board, time_budget=time_budget, book=OpeningBook({}), scheduler=scheduler)
+            start = time.monotonic()
+            player.best_move()
+            return time.monotonic() - start
+
+        with ThreadPoolExecutor(max_workers=12) as executor:
+            durations = list(executor.map(search, range(24)))
+        stats = scheduler.stats()
+        assert max(durations) < time_budget + 0.25
+        assert stats["running"] == stats["waiting"] == 0
+        assert stats["degraded"] + stats["fallbacks"] + stats["rejected"] > 0
@@ -0,0 +1,82 @@
+import base64
+import pickle
+
+import pytest
+
+import session_codec
+from board import Board
+from human_player import HumanPlayer
+from mcts_player import MctsPlayer
+from minimax_player import MiniMaxPlayer
+from random_player import RandomPlayer
+
+# A session pickled by the version that stored the whole session dictionary:
+# human against minimax, after the human played pits 2 and 4.
+LEGACY_SESSION = base64.b64decode(
+    "gASVZwEAAAAAAAB9lCiMCnNlc3Npb25faWSUjAZsZWdhY3mUjApkaWZmaWN1bHR5lIwBMZSMBHR1cm6USwGMBndpbm5lcpROjAVib2Fy"
+    "ZJRoB4wFQm9hcmSUk5QpgZR9lCiMCm5yX3BsYXllcnOUSwKMDHBsYXllcnNfZGF0YZRdlChoB4wKUGxheWVyRGF0YZSTlCmBlH2UKIwH"
+    "YmlnX3BpdJRLAowEcGl0c5RdlChLBksGSwBLB0sASwhldWJoECmBlH2UKGgTSwBoFF2UKEsISwhLB0sHSwdLBmV1YmV1YowHcGxheWVy"
+    "c5R9lChLAIwMaHVtYW5fcGxheWVylIwLSHVtYW5QbGF5ZXKUk5QpgZR9lCiMDHNlbGVjdGVkX3BpdJRLBIwFaW5kZXiUSwBoB2gKdWJL"
+    "AYwObWluaW1heF9wbGF5ZXKUjA1NaW5pTWF4UGxheWVylJOUKYGUfZQoaCFLAWgHaApoIE51YnV1Lg=="
+)
+
+
+def session_state(board, players, turn=0, winner=None, difficulty=0):
+    return {"session_id": "session", "difficulty": difficulty, "turn": turn, "winner": winner,
+            "board": board, "players": players}
+
+
+class TestSessionCodec:
+
+    def test_round_trip(self):
+        board = Board(nr_players=2)
+        board.move(0, 4)
+        players = {0: HumanPlayer(0, board), 1: MiniMaxPlayer(1, board)}
+        data = session_codec.encode(session_state(board, players, turn=1, difficulty="1"))
+        assert len(data) == 23
+        decoded = session_codec.decode(data, "session")
+        assert decoded["session_id"] == "session"
+        assert decoded["board"].position.cells == board.position.cells
+        assert (decoded["turn"], decoded["winner"], decoded["difficulty"]) == (1, None, 1)
+        assert isinstance(decoded["players"][0], HumanPlayer)
+        assert isinstance(decoded["players"][1], MiniMaxPlayer)
+        assert decoded["players"][1].board is decoded["board"]
+
+    def test_round_trip_winner(self):
+        board = Board(nr_players=2)
+        players = {0: HumanPlayer(0, board), 1: RandomPlayer(1, board)}
+        decoded = session_codec.decode(session_codec.encode(session_state(board, players, winner=0)), "session")
+        assert decoded["winner"] == 0
+        assert isinstance(decoded["players"][1], RandomPlayer)
+
+    def test_round_trip_mcts(self):
+        board = Board(nr_players=2)
+        players = {0: HumanPlayer(0, board), 1: MctsPlayer(1, board)}
+        decoded = session_codec.decode(session_codec.encode(session_state(board, players, difficulty=2)), "session")
+        assert decoded["difficulty"] == 2
+        assert isinstance(decoded["players"][1], MctsPlayer)
+
+    def test_decode_legacy_pickle(self):
+        decoded = session_codec.decode(LEGACY_SESSION, "legacy")
+        assert decoded["board"].players_data[0].pits == [6, 6, 0, 7, 0, 8]
+        assert decoded["board"].players_data[0].big_pit == 2
+        assert decoded["board"].players_data[1].pits == [8, 8, 7, 7, 7, 6]
+        assert (decoded["turn"], decoded["winner"], decoded["difficulty"]) == (1, None, 1)
+        assert isinstance(decoded["players"][0], HumanPlayer)
+        assert isinstance(decoded["players"][1], MiniMaxPlayer)
+
+    def test_decode_pickle_of_current_classes(self):
+        board = Board(nr_players=2)
+        board.move(0, 1)
+        players = {0: HumanPlayer(0, board), 1: RandomPlayer(1, board)}
+        decoded = session_codec.decode(pickle.dumps(session_state(board, players, turn="0", difficulty="0")), "s")
+        assert decoded["board"].position.cells == board.position.cells
+        assert isinstance(decoded["players"][1], RandomPlayer)
+
+    def test_legacy_pickle_only_loads_session_classes(self):
+        with pytest.raises(pickle.UnpicklingError):
+            session_codec.decode(pickle.dumps({"players": {0: ValueError("not a player")}}), "s")
+
+    def test_unknown_version(self):
+        with pytest.raises(ValueError):
+            session_codec.decode(b"\x07" + bytes(22), "s")
@@ -0,0 +1,234 @@
+import asyncio
+import json
+from datetime import timedelta
+
+import pytest
+import redis
+
+import session_codec
+from engine import Position
+from human_player import HumanPlayer
+from random_player import RandomPlayer
+from sessions import MemorySessionStore, RedisSessionStore, SessionCache
+
+EXPIRATION = timedelta(hours=1)
+
+
+def session(sessionid: str, turn: int = 0) -> dict:
+    return session_codec.new_session_state(sessionid, Position().cells, turn, None, 0, [HumanPlayer, RandomPlayer])
+
+
+class CountingStore(MemorySessionStore):
+
+    def __init__(self):
+        super().__init__(EXPIRATION)
+        self.gets = 0
+        self.batches = []
+        self.touches = []
+
+    async def get(self, sessionid):
+        self.gets += 1
+        return await super().get(sessionid)
+
+    async def set_many(self, sessions, sender):
+        self.batches.append(sorted(sessions))
+        await super().set_many(sessions, sender)
+
+    async def touch_many(self, sessionids):
+        self.touches.append(sorted(sessionids))
+        await super().touch_many(sessionids)
+
+
+class TestSessionCache:
+
+    @pytest.fixture(scope='class')
+    def anyio_backend(self):
+        # The cache runs its tasks on the server's asyncio event loop
+        return 'asyncio'
+
+    @pytest.fixture(scope='function')
+    def store(self):
+        return CountingStore()
+
+    @pytest.mark.anyio
+    async def test_sessions_missing(self, store):
+        cache = SessionCache(store, EXPIRATION, flush_interval=0)
+        assert await cache.load("missing") == {}
+
+    @pytest.mark.anyio
+    async def test_sessions_cached_after_save(self, store):
+        cache = SessionCache(store, EXPIRATION, flush_interval=0)
+        await cache.save(session("a", turn=3))
+        assert (await cache.load("a"))["turn"] == 3
+        assert (await cache.load("a"))["turn"] == 3
+        assert store.gets == 0
+        assert cache.hits == 2
+
+    @pytest.mark.anyio
+    async def test_sessions_loaded_once_from_store(self, store):
+        await SessionCache(store, EXPIRATION, flush_interval=0).save(session("a", turn=3))
+        cache = SessionCache(store, EXPIRATION, flush_interval=0)
+        assert (await cache.load("a"))["turn"] == 3
+        assert (await cache.load("a"))["turn"] == 3
+        assert store.gets == 1
+
+    @pytest.mark.anyio
+    async def test_sessions_copy_per_load(self, store):
+        cache = SessionCache(store, EXPIRATION, flush_interval=0)
+        await cache.save(session("a"))
+        (await cache.load("a"))["board"].position.set_pits(0, [0] * 6)
+        assert (await cache.load("a"))["board"].players_data[0].pits == [6] * 6
+
+    @pytest.mark.anyio
+    async def test_sessions_least_recently_used_evicted(self, store):
+        cache = SessionCache(store, EXPIRATION, capacity=2, flush_interval=0)
+        await cache.save(session("a"))
+        await cache.save(session("b"))
+        await cache.load("a")
+        await cache.save(session("c"))
+        assert list(cache.entries) == ["a", "c"]
+        assert await cache.load("b")
+        assert store.gets == 1
+
+    @pytest.mark.anyio
+    async def test_sessions_expire(self, store):
+        cache = SessionCache(store, timedelta(seconds=-1), flush_interval=0)
+        await cache.save(session("a"))
+        await cache.load("a")
+        assert cache.hits == 0
+        assert store.gets == 1
+
+    @pytest.mark.anyio
+    async def test_sessions_write_through(self, store):
+        cache = SessionCache(store, EXPIRATION, flush_interval=0)
+        await cache.save(session("a"))
+        await cache.save(session("b"))
+        assert store.batches == [["a"], ["b"]]
+
+    @pytest.mark.anyio
+    async def test_sessions_write_behind_batches(self, store):
+        cache = SessionCache(store, EXPIRATION, flush_interval=60)
+        await cache.save(session("a", turn=1))
+        await cache.save(session("b"))
+        await cache.save(session("a", turn=2))
+        assert store.batches == []
+        await cache.flush()
+        assert store.batches == [["a", "b"]]
+        await cache.flush()
+        assert store.batches == [["a", "b"]]
+        assert session_codec.decode(await store.get("a"), "a")["turn"] == 2
+
+    @pytest.mark.anyio
+    async def test_sessions_hits_restart_expiration(self, store):
+        cache = SessionCache(store, EXPIRATION, flush_interval=60)
+        await cache.save(session("a"))
+        await cache.save(session("b"))
+        await cache.flush()
+        expires = cache.entries["a"][1]
+        await cache.load("a")
+        assert cache.entries["a"][1] > expires
+        await cache.save(session("b"))
+        await cache.flush()
+        # b was stored again, which restarts its expiration anyway
+        assert store.touches == [["a"]]
+        await cache.flush()
+        assert store.touches == [["a"]]
+
+    @pytest.mark.anyio
+    async def test_sessions_hits_restart_expiration_write_through(self, store):
+        cache = SessionCache(store, EXPIRATION, flush_interval=0)
+        await cache.save(session("a"))
+        await cache.load("a")
+        assert store.touches == [["a"]]
+
+    @pytest.mark.anyio
+    async def test_sessions_evicted_before_flush(self, store):
+        cache = SessionCache(store, EXPIRATION, capacity=1, flush_interval=60)
+        await cache.save(session("a", turn=5))
+        await cache.save(session("b"))
+        assert (await cache.load("a"))["turn"] == 5
+        assert store.gets == 0
+
+    @pytest.mark.anyio
+    async def test_sessions_flushed_on_stop(self, store):
+        cache = SessionCache(store, EXPIRATION, flush_interval=60)
+        await cache.start()
+        await cache.save(session("a"))
+        await cache.stop()
+        assert store.batches == [["a"]]
+
+    @pytest.mark.anyio
+    async def test_sessions_flush_retried(self, store):
+        cache = SessionCache(store, EXPIRATION, flush_interval=60)
+        await cache.save(session("a"))
+
+        async def unavailable(sessions, sender):
+            raise redis.ConnectionError()
+
+        store.set_many, set_many = unavailable, store.set_many
+        await cache.flush()
+        store.set_many = set_many
+        await cache.flush()
+        assert store.batches == [["a"]]
+
+    @pytest.mark.anyio
+    async def test_redis_invalidation_keeps_session_ids(self):
+        published = []
+
+        class Pipeline:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc_info):
+                pass
+
+            def setex(self, *args):
+                pass
+
+            def publish(self, channel, message):
+                published.append(message)
+
+            async def execute(self):
+                pass
+
+        class PubSub:
+            async def get_message(self, ignore_subscribe_messages, timeout):
+                if published:
+                    return {"data": published.pop().encode()}
+                await asyncio.sleep(timeout)
+
+            async def aclose(self):
+                pass
+
+        class Client:
+            def pipeline(self, transaction):
+                return Pipeline()
+
+        received = []
+        store = RedisSessionStore(Client(), EXPIRATION)
+        await store.set_many({"a b": b"", "c": b""}, "sender")
+        assert json.loads(published[0]) == ["sender", "a b", "c"]
+        listener = asyncio.create_task(store._listen(PubSub(), lambda *changes: received.append(changes)))
+        while not received:
+            await asyncio.sleep(0)
+        listener.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await listener
+        assert received == [("sender", ["a b", "c"])]
+
+    @pytest.mark.anyio
+    async def test_sessions_invalidated_by_other_worker(self, store):
+        first = SessionCache(store, EXPIRATION, flush_interval=60)
+        second = SessionCache(store, EXPIRATION, flush_interval=60)
+        await first.start()
+        await second.start()
+        await first.save(session("a", turn=1))
+        await first.flush()
+        assert (await second.load("a"))["turn"] == 1
+        await second.save(session("a", turn=2))
+        await second.flush()
+        assert "a" not in first.entries
+        assert (await first.load("a"))["turn"] == 2
+        assert "a" in second.entries
+        await first.stop()
+        await second.stop()
@@ -0,0 +1,34 @@
+from board import Board
+from minimax_player import MiniMaxPlayer
+from opening_book import OpeningBook
+from tracing import search_trace, current
+
+
+class TestTracing:
+
+    def test_not_traced_by_default(self):
+        assert current() is None
+        with search_trace(False) as trace:
+            assert trace is None
+            assert current() is None
+
+    def test_traces_search(self):
+        board = Board(nr_players=2)
+        board.move(0, 4)
+        player = MiniMaxPlayer(1, board, time_budget=10, max_depth=2, book=OpeningBook({}))
+        with search_trace() as trace:
+            player.best_move()
+        assert current() is None
+        events = [record["event"] for record in trace.records]
+        assert events[0] == "search"
+        assert events.count("iteration") == 2
+        assert "node" in events and "move" in events
+
+    def test_trace_is_bounded(self):
+        board = Board(nr_players=2)
+        board.move(0, 4)
+        player = MiniMaxPlayer(1, board, time_budget=10, max_depth=4, book=OpeningBook({}))
+        with search_trace(max_records=10) as trace:
+            player.best_move()
+        assert len(trace.records) == 10
+        assert trace.dropped > 0
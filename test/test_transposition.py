@@ -0,0 +1,52 @@
+from engine import Position
+from transposition import TranspositionTable, SessionTables, EXACT, LOWER_BOUND
+
+
+class TestTranspositionTable:
+
+    def test_store_and_probe(self):
+        table = TranspositionTable(capacity=16)
+        key = Position().key(0)
+        assert table.probe(key) is None
+        table.store(key, 3, 5, EXACT, 2)
+        entry = table.probe(key)
+        assert (entry.depth, entry.value, entry.bound, entry.move) == (3, 5, EXACT, 2)
+
+    def test_side_to_move_changes_key(self):
+        position = Position()
+        assert position.key(0) != position.key(1)
+
+    def test_keeps_deeper_entry_in_same_search(self):
+        table = TranspositionTable(capacity=1)
+        table.store(1, 5, 10, EXACT, 0)
+        table.store(2, 3, 20, LOWER_BOUND, 1)
+        assert table.probe(1).value == 10
+        assert table.probe(2) is None
+
+    def test_replaces_entries_of_earlier_searches(self):
+        table = TranspositionTable(capacity=1)
+        table.store(1, 5, 10, EXACT, 0)
+        table.new_search()
+        table.store(2, 3, 20, LOWER_BOUND, 1)
+        assert table.probe(1) is None
+        assert table.probe(2).value == 20
+
+    def test_session_tables_are_bounded(self):
+        tables = SessionTables(max_sessions=2, capacity=16)
+        first = tables.get("a")
+        tables.get("b")
+        assert tables.get("a") is first
+        tables.get("c")
+        assert "b" not in tables.tables
+        assert len(tables.tables) == 2
+
+    def test_session_tables_stats_keep_dropped_tables(self):
+        tables = SessionTables(max_sessions=1, capacity=16)
+        table = tables.get("a")
+        table.store(1, 3, 5, EXACT, 2)
+        table.probe(1)
+        table.probe(2)
+        tables.get("b").probe(3)
+        stats = tables.stats()
+        assert (stats["sessions"], stats["hits"], stats["misses"]) == (1, 1, 2)
+        assert stats["hit_rate"] == 1 / 3
@@ -0,0 +1,57 @@
+"""
+Search tracing: structured records of what the engine and the AI did, for one request at a time.
+
+Tracing is off unless a request turns it on with search_trace(). The code that records only
+checks current() once per search and then one `is not None` per record, so it costs next to
+nothing for the games that are not traced.
+"""
+import contextvars
+from contextlib import contextmanager
+from typing import List, Optional
+
+# Traces stop recording after this many records, a deep search visits millions of nodes
+MAX_RECORDS = 10000
+
+_current_trace = contextvars.ContextVar("search_trace", default=None)
+
+
+class SearchTrace:
+    """
+    The records of one traced request, each one a dict with the event name and its fields.
+    """
+
+    def __init__(self, max_records: int = MAX_RECORDS):
+        self.max_records = max_records
+        self.records: List[dict] = []
+        self.dropped = 0
+
+    def record(self, event: str, **fields):
+        if len(self.records) < self.max_records:
+            fields["event"] = event
+            self.records.append(fields)
+        else:
+            self.dropped += 1
+
+
+def current() -> Optional[SearchTrace]:
+    """
+    The trace of the running request, or None if it is not traced.
+    """
+    return _current_trace.get()
+
+
+@contextmanager
+def search_trace(enabled: bool = True, max_records: int = MAX_RECORDS):
+    """
+    Traces the code run inside the block, if enabled.
+    Yields the trace, or None when tracing is not enabled.
+    """
+    if not enabled:
+        yield None
+        return
+    trace = SearchTrace(max_records)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
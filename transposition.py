@@ -0,0 +1,122 @@
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+# What the stored value of an entry means
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Depth stored for subtrees that were searched to the end of the game,
+# their value holds for any depth.
+SOLVED_DEPTH = 1 << 16
+
+DEFAULT_CAPACITY = 1 << 15
+MAX_SESSION_TABLES = 64
+
+
+class Entry(NamedTuple):
+    key: int
+    depth: int
+    value: int
+    bound: int
+    move: Optional[int]
+    generation: int
+
+
+class TranspositionTable:
+    """
+    Fixed size table of searched positions, indexed by their Zobrist key.
+    Each slot keeps a single entry. A new entry replaces the old one if the old one
+    is from an earlier search, or if the new one was searched at least as deep.
+    Values are from the point of view of the player the table searches for, so a
+    table must not be shared between players.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        assert capacity > 0 and capacity & (capacity - 1) == 0, "The capacity must be a power of two"
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.entries = [None] * capacity
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def new_search(self):
+        """
+        Starts a new search. Entries of the earlier searches are kept, but are replaced first.
+        """
+        self.generation += 1
+
+    def probe(self, key: int) -> Optional[Entry]:
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key: int, depth: int, value: int, bound: int, move: Optional[int]):
+        index = key & self.mask
+        old = self.entries[index]
+        if old is None or old.generation != self.generation or depth >= old.depth:
+            self.entries[index] = Entry(key, depth, value, bound, move, self.generation)
+
+    def clear(self):
+        self.entries = [None] * self.capacity
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return sum(entry is not None for entry in self.entries)
+
+
+class SessionTables:
+    """
+    Keeps a transposition table per game session, so that the AI reuses the work of
+    its earlier moves. Only the most recently used sessions keep their tables.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSION_TABLES, capacity: int = DEFAULT_CAPACITY):
+        self.max_sessions = max_sessions
+        self.capacity = capacity
+        self.tables = OrderedDict()
+        self.lock = threading.Lock()
+        # Lookups of the tables that were dropped, so the totals never go down
+        self.dropped_hits = 0
+        self.dropped_misses = 0
+
+    def get(self, sessionid: str) -> TranspositionTable:
+        with self.lock:
+            table = self.tables.get(sessionid)
+            if table is None:
+                table = self.tables[sessionid] = TranspositionTable(self.capacity)
+                while len(self.tables) > self.max_sessions:
+                    self._drop(self.tables.popitem(last=False)[1])
+            else:
+                self.tables.move_to_end(sessionid)
+            return table
+
+    def discard(self, sessionid: str):
+        with self.lock:
+            table = self.tables.pop(sessionid, None)
+            if table is not None:
+                self._drop(table)
+
+    def _drop(self, table: TranspositionTable):
+        self.dropped_hits += table.hits
+        self.dropped_misses += table.misses
+
+    def stats(self) -> dict:
+        """
+        The lookups of all the sessions' tables since the start.
+        """
+        with self.lock:
+            hits = self.dropped_hits + sum(table.hits for table in self.tables.values())
+            misses = self.dropped_misses + sum(table.misses for table in self.tables.values())
+        return {
+            "sessions": len(self.tables),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }